@@ -1,5 +1,9 @@
 import os
 import configparser
+import functools
+from collections import ChainMap
+from types import MappingProxyType
+from typing import Dict, Mapping
 
 
 def get_ansible_config_filepath() -> str:
@@ -21,14 +25,64 @@ def get_ansible_config_filepath() -> str:
         return ""
 
 
-def get_dict_of_ansible_config_options() -> dict:
+class AnsibleConfig:
+    """Read-only view of the sections of the ansible.cfg file"""
+
+    DEFAULTS_SECTION = 'defaults'
+    CONNECTION_SECTION_SUFFIX = '_connection'
+
+    def __init__(self, sections: Dict[str, Dict[str, str]]):
+        self.sections = MappingProxyType({
+            section: MappingProxyType(dict(options)) for section, options in sections.items()
+        })
+        self._connection_options: Dict[str, Mapping[str, str]] = {}
+
+    def connection_options(self, connection_plugin: str) -> Mapping[str, str]:
+        """Options of the connection plugin with section aware precedence
+
+        Options from the plugin section, e.g. [ssh_connection] for ssh, take
+        precedence over the [defaults] section, which takes precedence over
+        the remaining sections. Sections of other connection plugins, e.g.
+        [paramiko_connection], are not read.
+
+        :param connection_plugin: Name of the ansible connection plugin
+        :type connection_plugin: str
+
+        :return: Read-only mapping of option names to their values
+        :rtype: Mapping
+        """
+        if connection_plugin not in self._connection_options:
+            ordered_sections = [connection_plugin + self.CONNECTION_SECTION_SUFFIX,
+                                self.DEFAULTS_SECTION]
+            ordered_sections.extend(
+                section for section in self.sections if section not in ordered_sections
+                and not section.endswith(self.CONNECTION_SECTION_SUFFIX))
+            # Chained sections are only read, so read-only mappings can be chained
+            self._connection_options[connection_plugin] = ChainMap(*[  # type: ignore
+                self.sections[section] for section in ordered_sections
+                if section in self.sections
+            ])
+        return self._connection_options[connection_plugin]
+
+
+@functools.lru_cache(maxsize=None)
+def load_ansible_config() -> AnsibleConfig:
+    """Find and parse the ansible.cfg file, only once per process"""
     config_filepath = get_ansible_config_filepath()
     if config_filepath == "":
-        return {}
+        return AnsibleConfig({})
     config = configparser.ConfigParser()
     config.read(config_filepath)
-    config_dictionary = {}
-    for section in config.sections():
-        for option in config.options(section):
-            config_dictionary[option] = config.get(section, option)
+    return AnsibleConfig({
+        # Values are read raw, like in ansible, e.g. control_path = %(directory)s/%%h-%%r
+        section: {option: config.get(section, option, raw=True)
+                  for option in config.options(section)}
+        for section in config.sections()
+    })
+
+
+def get_dict_of_ansible_config_options() -> dict:
+    config_dictionary: Dict[str, str] = {}
+    for section_options in load_ansible_config().sections.values():
+        config_dictionary.update(section_options)
     return config_dictionary
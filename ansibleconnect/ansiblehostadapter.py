@@ -1,21 +1,107 @@
-from ansible.inventory.host import Host  # type: ignore
+from collections import ChainMap
+from typing import Hashable, Mapping, Optional
 
-from ansibleconnect.connections import CONNECTION_COMMAND2CLASS_MAP
-from ansibleconnect.ansible_config_adapter import get_dict_of_ansible_config_options
+from ansibleconnect.connections import CONNECTION_COMMAND2CLASS_MAP, SHARED_CONTROL_PATH
+from ansibleconnect.ansible_config_adapter import load_ansible_config
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.vault import DecryptedVariables
+
+
+def host_connection_plugin(ansible_host: SnapshotHost) -> str:
+    """Connection plugin of the host, set by ansible_connection"""
+    return ansible_host.get_connection_vars().get('ansible_connection', 'ssh')
+
+
+def is_connection_supported(ansible_host: SnapshotHost) -> bool:
+    """Whether the host's connection plugin has a connection command, e.g. local has not"""
+    return host_connection_plugin(ansible_host) in CONNECTION_COMMAND2CLASS_MAP
 
 
 class AnsibleHostAdapter:
-    def __init__(self, ansible_host: Host):
+    def __init__(self, ansible_host: SnapshotHost, default_variables: Optional[Mapping] = None,
+                 share_bastions: bool = False, renderer=None, decryptor=None):
+        """
+        :param renderer: Renderer of connection commands shared by the hosts of the run,
+                         the command is built from scratch if None
+        :type renderer: ConnectionCommandRenderer
+        :param decryptor: Decryptor of vault values shared by the hosts of the run,
+                          reading vault values raises VaultError if None
+        :type decryptor: VaultDecryptor
+        """
         self._host = ansible_host
-        self._connection_plugin = ansible_host.vars.get('ansible_connection', 'ssh')
-        self.host_variables = ansible_host.vars
-        self.host_variables.update(get_dict_of_ansible_config_options())
+        # Vault values are decrypted only when the connection command reads them
+        self._variables = DecryptedVariables(ansible_host.get_connection_vars(), decryptor)
+        self._share_bastions = share_bastions
+        self._renderer = renderer
+        self._connection_plugin = host_connection_plugin(ansible_host)
+        self._default_variables = dict(default_variables or {})
+        # Seconds the pane waits before connecting, set by the launch scheduler
+        self.launch_delay = 0.0
+        # Inventory variables take precedence over the shared ansible.cfg options,
+        # default variables are used only when neither of them sets the variable
+        self.host_variables = ChainMap(
+            self._variables,  # type: ignore
+            load_ansible_config().connection_options(self._connection_plugin),  # type: ignore
+            self._default_variables)
+
+    @property
+    def connection(self):
+        connection = CONNECTION_COMMAND2CLASS_MAP[self._connection_plugin](self._host.name,
+                                                                           self.host_variables)
+        if self._share_bastions:
+            connection.share_bastion_connection(SHARED_CONTROL_PATH)
+        return connection
 
     @property
     def connection_command(self):
-        return str(
-            CONNECTION_COMMAND2CLASS_MAP[self._connection_plugin](self._host.name, self._host.vars))
+        if self._renderer is not None:
+            return self._renderer.render(self)
+        return str(self.connection)
+
+    @property
+    def inventory_variables(self) -> Mapping:
+        """Variables of the host set in the inventory, without ansible.cfg options"""
+        return self._variables
+
+    def connection_profile(self) -> Optional[Hashable]:
+        """Variables which the connection command depends on, apart from the host's address
+
+        Options of ansible.cfg are left out, as they are the same for all hosts.
+
+        :return: Profile shared by hosts with the same connection command template,
+                 None if the variables are not hashable
+        :rtype: tuple
+        """
+        host_vars = self._variables
+        connection_class = CONNECTION_COMMAND2CLASS_MAP[self._connection_plugin]
+        profile = (self._connection_plugin, self._share_bastions,
+                   tuple(sorted(self._default_variables.items())),
+                   tuple(sorted((key, host_vars[key])
+                                for key in connection_class.PROFILE_KEYS.intersection(host_vars))),
+                   tuple(key in host_vars for key in connection_class.SSH_HOST_KEYS))
+        try:
+            hash(profile)
+        except TypeError:
+            return None
+        return profile
+
+    def connection_template(self):
+        """Template of the connection command, the same for hosts with the same profile"""
+        template = self.connection.template()
+        # Address set by the shared ansible.cfg options or default variables is the same
+        # for all the hosts, otherwise it is read from each host's inventory variables
+        for key in CONNECTION_COMMAND2CLASS_MAP[self._connection_plugin].SSH_HOST_KEYS:
+            if key in self._host.get_connection_vars():
+                template.host_key = key
+                break
+            if key in self.host_variables:
+                break
+        return template
 
     @property
     def host_name(self):
         return self._host.name
+
+    def get_variable(self, key: str, default=None):
+        """Value of the host variable, magic variables like group_names included"""
+        return self._host.get_vars().get(key, default)
@@ -0,0 +1,59 @@
+import time
+from typing import Dict, Hashable, List, TextIO
+
+from ansibleconnect.connections import ConnectionTemplate
+
+
+class ConnectionCommandRenderer:
+    """Renders connection commands of hosts from templates shared by connection profiles
+
+    Hosts with the same connection variables (user, key, ssh arguments, port...),
+    differing only in their address, share a connection profile. Template of the
+    command is built once per profile and only the address is filled in per host.
+    """
+
+    def __init__(self):
+        self._templates: Dict[Hashable, ConnectionTemplate] = {}
+        self.rendered_count = 0
+        self.uncached_count = 0
+        self.elapsed = 0.0
+
+    @property
+    def profiles_count(self) -> int:
+        return len(self._templates)
+
+    @property
+    def cache_hits(self) -> int:
+        return self.rendered_count - self.profiles_count - self.uncached_count
+
+    def render(self, host) -> str:
+        """Connection command of the host
+
+        :param host: Host to connect with
+        :type host: AnsibleHostAdapter
+        """
+        start = time.perf_counter()
+        profile = host.connection_profile()
+        if profile is None:
+            # Variables which are not hashable, e.g. lists, cannot identify a profile
+            self.uncached_count += 1
+            command = str(host.connection)
+        else:
+            template = self._templates.get(profile)
+            if template is None:
+                template = host.connection_template()
+                self._templates[profile] = template
+            command = template.render(host.host_name, host.inventory_variables)
+        self.rendered_count += 1
+        self.elapsed += time.perf_counter() - start
+        return command
+
+    def render_all(self, hosts: list) -> List[str]:
+        return [self.render(host) for host in hosts]
+
+    def report(self, output: TextIO) -> None:
+        print("commands: {} rendered from {} templates, {} template cache hits, "
+              "{} uncached in {:.1f} ms".format(self.rendered_count, self.profiles_count,
+                                                self.cache_hits, self.uncached_count,
+                                                self.elapsed * 1000),
+              file=output)
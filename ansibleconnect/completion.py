@@ -0,0 +1,210 @@
+"""Shell completion of ansibleconnect arguments
+
+Completions are answered from the completion indexes saved together with
+cached inventory snapshots, neither ansible nor the inventory itself is loaded.
+"""
+import os
+import shlex
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from ansibleconnect.completionindex import CompletionIndex
+from ansibleconnect.inventorycache import get_completion_index_filepath, \
+    get_inventory_fingerprint, \
+    load_completion_index
+
+INVENTORY_FLAGS = ('-i', '--inventory')
+GROUPS_FLAGS = ('-g', '--groups')
+HOSTS_FLAGS = ('--hosts',)
+VARIABLES_FLAGS = ('-vars', '--variables', '-novars', '--no-variables')
+# Default COMP_WORDBREAKS of bash, which splits words on them
+DEFAULT_WORDBREAKS = '"\'><=;|&(:'
+# Inventory is refreshed in the background at most once in this many seconds
+REFRESH_INTERVAL = 60
+PROGRAM_NAME = 'ansibleconnect'
+USAGE = """usage: ansibleconnect-complete LINE [WORDBREAKS]
+       ansibleconnect-complete --bash
+
+Print completions of -g, --hosts and -vars arguments in the ansibleconnect command LINE,
+typed up to the cursor. Enable them in bash with: source <(ansibleconnect-complete --bash)"""
+
+BASH_COMPLETION_SCRIPT = """_ansibleconnect_complete() {
+    local IFS=$'\\n'
+    COMPREPLY=($(ansibleconnect-complete "${COMP_LINE:0:COMP_POINT}" "$COMP_WORDBREAKS"))
+}
+complete -o bashdefault -o default -F _ansibleconnect_complete ansibleconnect
+"""
+
+
+def split_command_line(line: str) -> List[str]:
+    """Split the command line typed so far into words, the last one is completed
+
+    :param line: Command line up to the cursor
+    :type line: str
+
+    :return: Words of the ansibleconnect command, without the preceding ones,
+             e.g. of source <(ansibleconnect ...
+    :rtype: list
+    """
+    words: List[str] = []
+    # Word which is being typed may have an unterminated quote
+    for closing_quote in ('', '"', "'"):
+        try:
+            words = shlex.split(line + closing_quote)
+            break
+        except ValueError:
+            continue
+    if not line or line[-1].isspace():
+        words.append('')
+    for index in range(len(words) - 2, -1, -1):
+        if words[index].endswith(PROGRAM_NAME):
+            return words[index + 1:]
+    return words[1:]
+
+
+def get_inventory_sources(words: List[str]) -> List[str]:
+    sources = []
+    for index, word in enumerate(words[:-1]):
+        if word in INVENTORY_FLAGS and index + 1 < len(words) - 1:
+            sources.append(words[index + 1])
+        elif word.startswith('--inventory='):
+            sources.append(word[len('--inventory='):])
+        elif word.startswith('-i') and len(word) > 2 and not word.startswith('-i='):
+            sources.append(word[2:])
+    return [os.path.expanduser(source) for source in sources]
+
+
+def _refresh_in_background(inventory_source: str) -> None:
+    # Marker keeps every TAB pressed during a long refresh from starting another one
+    marker_filepath = get_completion_index_filepath(inventory_source) + '.refresh'
+    try:
+        if time.time() - os.stat(marker_filepath).st_mtime < REFRESH_INTERVAL:
+            return
+    except OSError:
+        pass
+    try:
+        os.makedirs(os.path.dirname(marker_filepath), mode=0o700, exist_ok=True)
+        with open(marker_filepath, 'w'):
+            pass
+    except OSError:
+        return
+    # Imported only here, as it takes longer than answering a completion
+    from ansibleconnect.inventoryadapter import refresh_in_background
+    refresh_in_background(inventory_source)
+
+
+def load_completion_indexes(inventory_sources: List[str],
+                            refresh: bool = True) -> CompletionIndex:
+    """Merged completion index of the inventory sources
+
+    Index of a source which files changed since it was built is still used,
+    while the source is refreshed in the background for the next completions.
+
+    :param inventory_sources: Inventory paths as passed to ansibleconnect
+    :type inventory_sources: list
+    :param refresh: Refresh missing or stale indexes in the background
+    :type refresh: bool
+    """
+    indexes = []
+    for source in inventory_sources:
+        fingerprint, index = load_completion_index(source)
+        if index is not None:
+            indexes.append(index)
+        if refresh and fingerprint != get_inventory_fingerprint(source):
+            _refresh_in_background(source)
+    return CompletionIndex.merge(indexes)
+
+
+def _split_last(value: str, separators: str) -> Tuple[str, str]:
+    """Split value into the part before the last separator, included, and the rest"""
+    split_index = max(value.rfind(separator) for separator in separators) + 1
+    return value[:split_index], value[split_index:]
+
+
+def _complete_pattern(value: str, index: CompletionIndex) -> List[str]:
+    head, tail = _split_last(value, ':,')
+    operator = tail[:1] if tail[:1] in ('!', '&') else ''
+    head, tail = head + operator, tail[len(operator):]
+    if tail.startswith('~'):
+        # Regular expressions are not completed
+        return []
+    return [head + name for name in index.groups + index.hosts if name.startswith(tail)]
+
+
+def _complete_hosts(value: str, index: CompletionIndex) -> List[str]:
+    head, tail = _split_last(value, ',')
+    return [head + name for name in index.hosts if name.startswith(tail)]
+
+
+def _complete_variables(value: str, index: CompletionIndex) -> List[str]:
+    head, tail = _split_last(value, ',')
+    if ':' not in tail:
+        return [head + key for key in index.variables if key.startswith(tail)]
+    key, value_prefix = tail.split(':', 1)
+    return ['{}{}:{}'.format(head, key, variable_value)
+            for variable_value in index.variables.get(key, [])
+            if variable_value.startswith(value_prefix)]
+
+
+def complete(words: List[str], index: Optional[CompletionIndex] = None) -> List[str]:
+    """Completions of the last word of the ansibleconnect command
+
+    :param words: Words of the command typed so far, the last one is completed
+    :type words: list
+    :param index: Index completions are looked up in, loaded for the inventory
+                  sources given in words if None
+    :type index: CompletionIndex
+
+    :return: Words which the last word can be completed to
+    :rtype: list
+    """
+    if not words:
+        return []
+    current_word = words[-1]
+    previous_word = words[-2] if len(words) > 1 else ''
+    flag, prefix = previous_word, ''
+    if '=' in current_word and current_word.startswith('--'):
+        flag, current_word = current_word.split('=', 1)
+        prefix = flag + '='
+    completers = [(GROUPS_FLAGS, _complete_pattern), (HOSTS_FLAGS, _complete_hosts),
+                  (VARIABLES_FLAGS, _complete_variables)]
+    for flags, completer in completers:
+        if flag in flags:
+            if index is None:
+                index = load_completion_indexes(get_inventory_sources(words))
+            return [prefix + completion for completion in completer(current_word, index)]
+    return []
+
+
+def strip_wordbreaks(current_word: str, completions: List[str], wordbreaks: str) -> List[str]:
+    """Strip the part of the word which bash does not treat as the completed word
+
+    Bash completes only the part of the word after its last COMP_WORDBREAKS
+    character, e.g. after the colon in group1:group2.
+    """
+    head, _ = _split_last(current_word, wordbreaks)
+    return [completion[len(head):] for completion in completions]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Print completions of the command line given as the first argument, one per line
+
+    Argument parsing is kept minimal, as it runs on every TAB pressed:
+    ansibleconnect-complete LINE [WORDBREAKS] or ansibleconnect-complete --bash
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(USAGE, file=sys.stderr)
+        exit(0 if argv else 2)
+    if argv[0] == '--bash':
+        print(BASH_COMPLETION_SCRIPT, end='')
+        return
+    words = split_command_line(argv[0])
+    wordbreaks = argv[1] if len(argv) > 1 else DEFAULT_WORDBREAKS
+    for completion in strip_wordbreaks(words[-1] if words else '', complete(words), wordbreaks):
+        print(completion)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Set
+
+# Variables with more distinct values, e.g. addresses, are completed by their names only
+MAX_VALUES_PER_VARIABLE = 100
+
+
+def _can_be_typed(value) -> bool:
+    # -vars compares the typed values with string values only and splits them on , and :
+    return isinstance(value, str) and ',' not in value and ':' not in value
+
+
+class CompletionIndex:
+    """Group names, host names and variables of an inventory, for completing arguments
+
+    Index is small compared to the inventory snapshot and is read without
+    anything else of ansibleconnect, so that completions are answered fast.
+    """
+
+    def __init__(self, groups: List[str], hosts: List[str], variables: Dict[str, List[str]]):
+        self.groups = groups
+        self.hosts = hosts
+        # Variable names mapped to their distinct values, as they are typed in -vars
+        self.variables = variables
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'CompletionIndex':
+        """Build the index of the inventory
+
+        :param snapshot: Resolved hosts and groups of the inventory
+        :type snapshot: InventorySnapshot
+        """
+        variable_values: Dict[str, Set[str]] = {}
+        for host in snapshot.hosts.values():
+            for key, value in host.vars.items():
+                values = variable_values.setdefault(key, set())
+                if _can_be_typed(value) and len(values) <= MAX_VALUES_PER_VARIABLE:
+                    values.add(value)
+        return cls(sorted(snapshot.groups), sorted(snapshot.hosts), {
+            key: sorted(values) if len(values) <= MAX_VALUES_PER_VARIABLE else []
+            for key, values in sorted(variable_values.items())})
+
+    @classmethod
+    def merge(cls, indexes: Iterable['CompletionIndex']) -> 'CompletionIndex':
+        """Combine indexes of several inventory sources"""
+        groups: Set[str] = set()
+        hosts: Set[str] = set()
+        variable_values: Dict[str, Set[str]] = {}
+        for index in indexes:
+            groups.update(index.groups)
+            hosts.update(index.hosts)
+            for key, values in index.variables.items():
+                variable_values.setdefault(key, set()).update(values)
+        return cls(sorted(groups), sorted(hosts),
+                   {key: sorted(values) for key, values in sorted(variable_values.items())})
+
+    @classmethod
+    def from_dict(cls, index_dict: dict) -> 'CompletionIndex':
+        return cls(index_dict['groups'], index_dict['hosts'], index_dict['variables'])
+
+    def to_dict(self) -> dict:
+        return {'groups': self.groups, 'hosts': self.hosts, 'variables': self.variables}
@@ -1,21 +1,77 @@
+import re
+import shlex
+from typing import Mapping, Optional, Tuple
+
+from ansibleconnect.sshproxy import DEFAULT_CONTROL_PERSIST, \
+    Bastion, \
+    find_proxy_option, \
+    parse_bastion, \
+    replace_proxy_option
+
 ANSIBLE_NULL_VALUE = 'null'
+DEFAULT_PORT = 22
+# ControlPath shared by ansibleconnect's pre-warmed master connections and the panes,
+# escaped like the control_path option of ansible.cfg
+SHARED_CONTROL_PATH = '~/.ssh/ansibleconnect-%%C'
+DEFAULT_CONTROL_PATH_DIR = '~/.ansible/cp'
+SSH_PROXY_OPTION_RE = re.compile(r'Proxy(Command|Jump)|(^|\s)-J\s')
 
 
-def get_first_from_list_or_default(dictionary: dict, key_list: list, default_val=None):
+def get_first_from_list_or_default(dictionary: Mapping, key_list: list, default_val=None):
     for key in key_list:
         if key in dictionary:
             return dictionary[key]
     return default_val
 
 
+class ConnectionTemplate:
+    """Connection command without the host's address, shared by hosts of the same profile"""
+
+    def __init__(self, prefix: str, user: str, host: Optional[str]):
+        self.prefix = prefix
+        self.user = user
+        self.host = host
+        # Inventory variable holding the address of each host, None if all the hosts
+        # have the same address (or none), e.g. set in ansible.cfg
+        self.host_key: Optional[str] = None
+
+    def render(self, host_name: str, inventory_variables: Mapping) -> str:
+        """Command connecting with the host
+
+        :param host_name: Inventory name of the host
+        :type host_name: str
+        :param inventory_variables: Inventory variables of the host
+        :type inventory_variables: Mapping
+        """
+        host = inventory_variables[self.host_key] if self.host_key else self.host
+        if host:
+            return '{}{}@{}'.format(self.prefix, self.user, host)
+        # This case is useful when ssh connection information is held in
+        # config file like ~/.ssh/config instead of the inventory file
+        return self.prefix + host_name
+
+
 class ConnectionCommand:
-    def __init__(self, host_name, host_variables: dict):
+    def __init__(self, host_name, host_variables: Mapping):
         self.host_name = host_name
         self.host = host_variables.get('ansible_host', None)
         self.user = host_variables.get('ansible_user', 'root')
         self.port = host_variables.get('ansible_port', 22)
         self.password = host_variables.get('ansible_password', None)
 
+    def get_address(self) -> Tuple[str, int]:
+        """Host name or address and port which the connection is made to"""
+        return self.host or self.host_name, int(self.port or DEFAULT_PORT)
+
+    def uses_proxy(self) -> bool:
+        return False
+
+    def get_bastion(self) -> Optional[Bastion]:
+        return None
+
+    def share_bastion_connection(self, control_path: str) -> None:
+        """Make the connection reuse the shared master connection to its bastion"""
+
 
 class SSHConnectionCommand(ConnectionCommand):
     # Order in these key lists is important as the first found in the dict will be returned
@@ -31,8 +87,18 @@ class SSHConnectionCommand(ConnectionCommand):
     SSH_USER_KEYS = ['ansible_ssh_user', 'ansible_user', 'remote_user']
     SSH_ARGS_KEYS = ['ansible_ssh_args', 'ssh_args']
     SSH_EXECUTABLE_KEYS = ['ansible_ssh_executable', 'ssh_executable']
+    SSH_CONTROL_PATH_KEYS = ['ansible_control_path', 'control_path']
+    SSH_CONTROL_PATH_DIR_KEYS = ['ansible_control_path_dir', 'control_path_dir']
+    SSH_COMMON_ARGS_KEY = 'ansible_ssh_common_args'
+    SSH_EXTRA_ARGS_KEY = 'ansible_ssh_extra_args'
+    # Variables which the command depends on, apart from the address of the host
+    PROFILE_KEYS = frozenset(SSH_HOST_KEY_CHECKING_KEYS + SSH_PASSWORD_KEYS + SSH_PORT_KEYS
+                             + SSH_PRIVATE_KEY_FILE_KEYS + SSH_USER_KEYS + SSH_ARGS_KEYS
+                             + SSH_EXECUTABLE_KEYS + SSH_CONTROL_PATH_KEYS
+                             + SSH_CONTROL_PATH_DIR_KEYS
+                             + [SSH_COMMON_ARGS_KEY, SSH_EXTRA_ARGS_KEY])
 
-    def __init__(self, host_name, host_variables: dict):
+    def __init__(self, host_name, host_variables: Mapping):
         super().__init__(host_name, host_variables)
         self.host = get_first_from_list_or_default(host_variables, self.SSH_HOST_KEYS, None)
         self.host_key_checking = get_first_from_list_or_default(host_variables,
@@ -47,21 +113,37 @@ class SSHConnectionCommand(ConnectionCommand):
         self.ssh_args = get_first_from_list_or_default(host_variables, self.SSH_ARGS_KEYS,
                                                        '-C -o ControlMaster=auto'
                                                        ' -o ControlPersist=60s')
-        self.ssh_common_args = host_variables.get('ansible_ssh_common_args', '')
-        self.ssh_extra_args = host_variables.get('ansible_ssh_extra_args', '')
+        self.ssh_common_args = host_variables.get(self.SSH_COMMON_ARGS_KEY, '')
+        self.ssh_extra_args = host_variables.get(self.SSH_EXTRA_ARGS_KEY, '')
         self.ssh_executable = get_first_from_list_or_default(host_variables,
                                                              self.SSH_EXECUTABLE_KEYS, 'ssh')
+        self.control_path = self._expand_control_path(
+            get_first_from_list_or_default(host_variables, self.SSH_CONTROL_PATH_KEYS, None),
+            get_first_from_list_or_default(host_variables, self.SSH_CONTROL_PATH_DIR_KEYS,
+                                           DEFAULT_CONTROL_PATH_DIR))
+        self.bastion_control_path: Optional[str] = None
 
-    def _get_user_and_hostname(self):
-        if self.host:
-            user_and_hostname = '{user}@{host}'.format(user=self.user, host=self.host)
-        else:
-            # This case is useful when ssh connection information is held in
-            # config file like ~/.ssh/config instead of the inventory file
-            user_and_hostname = self.host_name
-        return user_and_hostname
+    @staticmethod
+    def _expand_control_path(control_path, control_path_dir):
+        if not control_path:
+            return None
+        # Same expansion as in ansible, e.g. %(directory)s/%%h-%%r
+        try:
+            return control_path % {'directory': control_path_dir}
+        except (KeyError, TypeError, ValueError):
+            return control_path
 
     def _get_ssh_options(self):
+        ssh_options = self._get_host_ssh_options()
+        if self.bastion_control_path:
+            proxy_option = find_proxy_option(ssh_options)
+            bastion = parse_bastion(proxy_option) if proxy_option else None
+            if proxy_option and bastion:
+                ssh_options = replace_proxy_option(
+                    ssh_options, proxy_option, bastion.proxy_command(self.bastion_control_path))
+        return ssh_options
+
+    def _get_host_ssh_options(self):
         ssh_options = ' '.join([self.ssh_args, self.ssh_extra_args, self.ssh_common_args])
         if self.ssh_private_key_file:
             ssh_options += ' -i {}'.format(self.ssh_private_key_file)
@@ -69,21 +151,93 @@ class SSHConnectionCommand(ConnectionCommand):
             ssh_options += ' -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no'
         if self.port:
             ssh_options += ' -p {}'.format(self.port)
+        if self.control_path:
+            ssh_options += ' -o ControlPath={}'.format(self.control_path)
         return ssh_options
 
-    def __str__(self):
+    def uses_proxy(self) -> bool:
+        # Hosts behind a jump host are not reachable directly
+        return SSH_PROXY_OPTION_RE.search(self._get_ssh_options()) is not None
+
+    def get_bastion(self) -> Optional[Bastion]:
+        """Jump host of the connection, None if there is none or it cannot be shared"""
+        proxy_option = find_proxy_option(self._get_host_ssh_options())
+        return parse_bastion(proxy_option) if proxy_option else None
+
+    def share_bastion_connection(self, control_path: str) -> None:
+        self.bastion_control_path = control_path
+
+    def _has_password(self) -> bool:
+        return bool(self.password) and self.password != ANSIBLE_NULL_VALUE
+
+    def _format_template(self, ssh_options: str) -> ConnectionTemplate:
         ssh_command = ''
-        if self.password and self.password != ANSIBLE_NULL_VALUE:
+        if self._has_password():
             ssh_command += 'sshpass -p "{}"'.format(self.password)
 
-        ssh_command += ' {ssh_exec} {ssh_options} {user_and_hostname}'.format(
+        ssh_command += ' {ssh_exec} {ssh_options} '.format(
             ssh_exec=self.ssh_executable,
-            ssh_options=self._get_ssh_options(),
-            user_and_hostname=self._get_user_and_hostname()
+            ssh_options=ssh_options
         )
-        return ssh_command
+        return ConnectionTemplate(ssh_command, self.user, self.host)
+
+    def _format_command(self, ssh_options: str) -> str:
+        return self._format_template(ssh_options).render(self.host_name, {})
+
+    def template(self) -> ConnectionTemplate:
+        """Command of the connection to which only the host's address is added
+
+        The template is the same for all hosts with the same PROFILE_KEYS variables
+        and the same SSH_HOST_KEYS variables defined.
+        """
+        return self._format_template(self._get_ssh_options())
+
+    def master_connection_command(self, timeout: int,
+                                  control_persist: Optional[int] = None) -> str:
+        """Command starting a background multiplexing master connection to the host
+
+        Options of the host come first, so ControlMaster and ControlPersist
+        added here are used only when the host does not set them.
+
+        :param control_persist: Seconds the connection stays open without clients,
+                                taking precedence over the host's ControlPersist if given
+        :type control_persist: int
+        """
+        ssh_options = self._get_ssh_options()
+        if control_persist is not None:
+            # ssh uses the first value of an option, e.g. not the 60s of the default ssh_args
+            ssh_options = '-o ControlPersist={}s {}'.format(control_persist, ssh_options)
+        ssh_options += ' -o ControlMaster=auto -o ControlPersist={}s -o ConnectTimeout={}'.format(
+            DEFAULT_CONTROL_PERSIST, timeout)
+        if not self._has_password():
+            # Prompts for passwords or passphrases would block with nobody to answer them
+            ssh_options += ' -o BatchMode=yes'
+        return self._format_command(ssh_options + ' -f -N')
+
+    def remote_command(self, command: str, timeout: int) -> str:
+        """Command running the shell command on the host, without a terminal
+
+        :param command: Shell command run on the host
+        :type command: str
+        :param timeout: Seconds after which connecting to the host fails
+        :type timeout: int
+        """
+        ssh_options = self._get_ssh_options() + ' -T -o ConnectTimeout={}'.format(timeout)
+        if not self._has_password():
+            # Prompts for passwords or passphrases would block with nobody to answer them
+            ssh_options += ' -o BatchMode=yes'
+        return '{} {}'.format(self._format_command(ssh_options), shlex.quote(command))
+
+    def __str__(self):
+        return self._format_command(self._get_ssh_options())
 
 
 CONNECTION_COMMAND2CLASS_MAP = {
     'ssh': SSHConnectionCommand
 }
+
+# Variables which connection commands read, they are also inherited by hosts from
+# their groups and from group_vars and host_vars files when the inventory is parsed
+CONNECTION_VARIABLES = frozenset(
+    ['ansible_connection', 'ansible_host', 'ansible_user', 'ansible_port', 'ansible_password']
+    + SSHConnectionCommand.SSH_HOST_KEYS).union(SSHConnectionCommand.PROFILE_KEYS)
@@ -0,0 +1,348 @@
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ansibleconnect.ansible_config_adapter import get_ansible_config_filepath, \
+    load_ansible_config
+from ansibleconnect.incrementalinventory import IncrementalInventory
+from ansibleconnect.inventoryadapter import SOURCE_CACHED, \
+    SOURCE_PARSED, \
+    InventoryAdapter, \
+    InventorySourceError, \
+    SourceLoadResult, \
+    load_inventory_sources, \
+    report_source_results
+from ansibleconnect.inventorycache import get_cache_dir, get_inventory_fingerprint
+from ansibleconnect.main import connect
+from ansibleconnect.parser import parse_arguments
+from ansibleconnect.timings import StageTimings
+from ansibleconnect.tmuxlayout import get_terminal_size
+
+logger = logging.getLogger(__name__)
+
+SOCKET_FILENAME = 'ansibleconnect.sock'
+# Environment of the client which the created tmux script depends on
+CLIENT_ENVIRONMENT = ('TMUX', 'SSH_AUTH_SOCK', 'COLUMNS', 'LINES', 'ANSIBLE_CONFIG',
+                      'ANSIBLE_VAULT_PASSWORD_FILE', 'ANSIBLE_VAULT_IDENTITY_LIST')
+CLIENT_TIMEOUT = 300
+
+
+class DaemonError(Exception):
+    pass
+
+
+def get_socket_path() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_FILENAME)
+    return os.path.join(get_cache_dir(), SOCKET_FILENAME)
+
+
+class HotInventory:
+    """Inventory of the sources kept loaded, reloaded when their files change
+
+    Changes are found by comparing fingerprints of the inventory files (their
+    modification times and sizes), the same ones which the inventory cache uses.
+    Inventory directories are reloaded incrementally, parsing only the changed files.
+    """
+
+    def __init__(self, sources: List[str], use_cache: bool, source_timeout: Optional[float],
+                 config_filepath: Optional[str] = None):
+        """
+        :param config_filepath: ansible.cfg of the clients of the inventory, which changes
+                                are watched as well, the one found by ansible if None
+        :type config_filepath: str
+        """
+        self.sources = sources
+        self.use_cache = use_cache
+        self.source_timeout = source_timeout
+        self.config_filepath = config_filepath
+        self.inventory: Optional[InventoryAdapter] = None
+        self._fingerprints: Optional[List[str]] = None
+        self._incremental_sources = {source: IncrementalInventory(source)
+                                     for source in sources if os.path.isdir(source)}
+
+    def _get_fingerprints(self) -> List[str]:
+        return [get_inventory_fingerprint(source, self.config_filepath)
+                for source in self.sources]
+
+    def is_outdated(self) -> bool:
+        return self.inventory is None or self._fingerprints != self._get_fingerprints()
+
+    def _load_sources(self, refresh_cache: bool) -> List[SourceLoadResult]:
+        other_sources = [source for source in self.sources
+                         if source not in self._incremental_sources]
+        other_results = {}
+        if other_sources:
+            other_results = dict(zip(other_sources, load_inventory_sources(
+                other_sources, self.use_cache, refresh_cache, self.source_timeout)))
+        results = []
+        for source in self.sources:
+            if source in other_results:
+                results.append(other_results[source])
+                continue
+            incremental_inventory = self._incremental_sources[source]
+            update = incremental_inventory.update(reparse_all=refresh_cache)
+            logger.debug("Inventory %s updated in %.0f ms, %d files parsed, %d removed",
+                         source, update.elapsed * 1000, len(update.parsed_files),
+                         len(update.removed_files))
+            results.append(SourceLoadResult(source, SOURCE_PARSED, update.elapsed,
+                                            incremental_inventory.snapshot))
+        return results
+
+    def reload(self, refresh_cache: bool = False) -> InventoryAdapter:
+        # Taken before the sources are loaded, so that changes made meanwhile are not missed
+        fingerprints = self._get_fingerprints()
+        inventory = InventoryAdapter(self.sources, source_results=self._load_sources(
+            refresh_cache))
+        self.inventory = inventory
+        # Stale or skipped sources are loaded again on the next check
+        loaded = all(result.status in (SOURCE_PARSED, SOURCE_CACHED)
+                     for result in inventory.source_results)
+        self._fingerprints = fingerprints if loaded else None
+        return inventory
+
+
+@contextmanager
+def _working_directory(cwd: str) -> Iterator[None]:
+    original_cwd = os.getcwd()
+    os.chdir(cwd)
+    try:
+        yield
+    finally:
+        os.chdir(original_cwd)
+
+
+@contextmanager
+def _client_environment(environment: Dict[str, str]) -> Iterator[None]:
+    original_environment = {name: os.environ.get(name) for name in CLIENT_ENVIRONMENT}
+    for name in CLIENT_ENVIRONMENT:
+        os.environ.pop(name, None)
+        if name in environment:
+            os.environ[name] = environment[name]
+    try:
+        yield
+    finally:
+        for name, value in original_environment.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+
+def _exit_code(error: SystemExit) -> int:
+    if error.code is None or isinstance(error.code, int):
+        return error.code or 0
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+class InventoryDaemon:
+    """Runs ansibleconnect for clients with inventories kept loaded between the runs"""
+
+    def __init__(self) -> None:
+        self._inventories: Dict[Tuple, HotInventory] = {}
+        # Requests are redirecting the process' standard streams and environment,
+        # so they are run one at a time, and never during a reload by the watcher
+        self._lock = threading.Lock()
+
+    def _get_hot_inventory(self, args) -> HotInventory:
+        # Clients in other projects may use other ansible.cfg files for the same sources
+        config_filepath = os.path.abspath(get_ansible_config_filepath() or os.devnull)
+        key = (tuple(args.inventory), not args.no_cache, args.source_timeout, config_filepath)
+        if key not in self._inventories:
+            self._inventories[key] = HotInventory(list(args.inventory), not args.no_cache,
+                                                  args.source_timeout, config_filepath)
+        return self._inventories[key]
+
+    def _connect(self, argv: List[str], cwd: str) -> None:
+        # ansible.cfg of the client's working directory or ANSIBLE_CONFIG is read again,
+        # also picking up its changes
+        load_ansible_config.cache_clear()
+        args = parse_arguments(argv)
+        # Relative paths are relative to the working directory of the client
+        args.inventory = [os.path.join(cwd, source) if os.path.exists(os.path.join(cwd, source))
+                          else source for source in args.inventory]
+        hot_inventory = self._get_hot_inventory(args)
+        inventory = hot_inventory.inventory
+        timings = StageTimings(measure_imports=args.timings)
+        if inventory is None or args.refresh_cache or hot_inventory.is_outdated():
+            with timings.stage('inventory_load') as stage:
+                try:
+                    inventory = hot_inventory.reload(args.refresh_cache)
+                except InventorySourceError as error:
+                    print("echo '{}'".format(error))
+                    exit(1)
+                stage.hosts_count = inventory.hosts_count
+            if len(args.inventory) > 1:
+                report_source_results(inventory.source_results, sys.stderr)
+        connect(args, inventory, timings)
+
+    def handle_request(self, request: dict) -> dict:
+        """Run ansibleconnect with arguments of the request and return its output
+
+        :param request: Dictionary with the command line arguments ('argv'), working
+                        directory ('cwd') and environment ('environment') of the client
+        :type request: dict
+
+        :return: Dictionary with the output ('stdout', 'stderr') and 'exit_code' of the run
+        :rtype: dict
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        # Relative paths, e.g. of ansible.cfg or vault password files, are relative to the
+        # working directory of the client, the process' one is changed for the request
+        with self._lock, _client_environment(request.get('environment', {})), \
+                _working_directory(request.get('cwd', os.getcwd())), \
+                redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                self._connect(request['argv'], request.get('cwd', os.getcwd()))
+                exit_code = 0
+            except SystemExit as error:
+                exit_code = _exit_code(error)
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(),
+                'exit_code': exit_code}
+
+    def reload_outdated(self) -> None:
+        with self._lock:
+            for hot_inventory in self._inventories.values():
+                try:
+                    if hot_inventory.is_outdated():
+                        hot_inventory.reload()
+                except Exception as error:
+                    logger.warning("Reloading inventory %s failed: %s",
+                                   ', '.join(hot_inventory.sources), error)
+
+    def watch(self, poll_interval: float, stop: threading.Event) -> None:
+        # Inventories are reloaded as soon as their files change, instead of
+        # in the next request, which would have to wait for them
+        while not stop.wait(poll_interval):
+            self.reload_outdated()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request_line = self.rfile.readline()
+        if not request_line:
+            # Connection only checking whether the daemon is listening
+            return
+        try:
+            request = json.loads(request_line.decode())
+        except ValueError as error:
+            response = {'stdout': '', 'stderr': 'Invalid request: {}\n'.format(error),
+                        'exit_code': 1}
+        else:
+            response = self.server.inventory_daemon.handle_request(request)  # type: ignore
+        try:
+            self.wfile.write((json.dumps(response) + '\n').encode())
+        except OSError as error:
+            logger.warning("Response could not be sent to the client: %s", error)
+
+
+def _is_listening(socket_path: str) -> bool:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        client.close()
+    return True
+
+
+def _stop_on_signal(signal_number, frame):
+    raise KeyboardInterrupt
+
+
+def serve(socket_path: Optional[str] = None, poll_interval: float = 2.0) -> None:
+    """Serve client runs over a Unix socket until interrupted
+
+    :param socket_path: Path of the Unix socket, None uses the default path
+    :type socket_path: str
+    :param poll_interval: Seconds between checks of the inventory files for changes
+    :type poll_interval: float
+    """
+    socket_path = socket_path or get_socket_path()
+    if _is_listening(socket_path):
+        raise DaemonError('Daemon is already listening on {}'.format(socket_path))
+    if os.path.exists(socket_path):
+        # Left behind by a daemon which did not exit cleanly
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path), mode=0o700, exist_ok=True)
+    inventory_daemon = InventoryDaemon()
+    stop = threading.Event()
+    watcher = threading.Thread(target=inventory_daemon.watch, args=(poll_interval, stop),
+                               daemon=True)
+    # Ansible wraps the standard streams when it is imported, which fails for
+    # the streams redirected during a request, so it is imported up front
+    import ansible.inventory.manager  # type: ignore # noqa: F401
+
+    old_umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(old_umask)
+    server.inventory_daemon = inventory_daemon  # type: ignore
+    if threading.current_thread() is threading.main_thread():
+        # Socket is removed when the daemon is stopped with kill as well
+        signal.signal(signal.SIGTERM, _stop_on_signal)
+    watcher.start()
+    print("ansibleconnect daemon listening on {}".format(socket_path), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def request_daemon(request: dict, socket_path: Optional[str] = None) -> dict:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CLIENT_TIMEOUT)
+    try:
+        client.connect(socket_path or get_socket_path())
+    except OSError as error:
+        client.close()
+        raise DaemonError('Daemon is not running: {}'.format(error))
+    try:
+        with client, client.makefile('rwb') as connection:
+            connection.write((json.dumps(request) + '\n').encode())
+            connection.flush()
+            response = json.loads(connection.readline().decode())
+    except (OSError, ValueError) as error:
+        raise DaemonError('Daemon did not respond: {}'.format(error))
+    return response
+
+
+def run_client(argv: List[str], socket_path: Optional[str] = None) -> int:
+    """Run ansibleconnect in the daemon and print its output
+
+    :param argv: Command line arguments
+    :type argv: list
+    :param socket_path: Path of the daemon's Unix socket, None uses the default path
+    :type socket_path: str
+
+    :return: Exit code of the run
+    :rtype: int
+    """
+    environment = {name: os.environ[name] for name in CLIENT_ENVIRONMENT if name in os.environ}
+    terminal_size = get_terminal_size()
+    if terminal_size is not None:
+        environment['COLUMNS'], environment['LINES'] = map(str, terminal_size)
+    response = request_daemon({'argv': argv, 'cwd': os.getcwd(), 'environment': environment},
+                              socket_path)
+    sys.stderr.write(response['stderr'])
+    sys.stdout.write(response['stdout'])
+    return response['exit_code']
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import signal
+import time
+from collections import OrderedDict
+from typing import List, Optional, TextIO, Tuple
+
+# Seconds which ssh waits for each host to connect, apart from --exec-timeout
+EXEC_CONNECT_TIMEOUT = 10
+READ_CHUNK_SIZE = 65536
+SLOWEST_HOSTS_COUNT = 5
+LISTED_HOSTS_COUNT = 10
+
+
+class ExecResult:
+    def __init__(self, name: str, exit_code: Optional[int], elapsed: float, output: str):
+        self.name = name
+        # None if the command did not finish in time
+        self.exit_code = exit_code
+        self.elapsed = elapsed
+        self.output = output
+
+    @property
+    def timed_out(self) -> bool:
+        return self.exit_code is None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.exit_code == 0
+
+
+class _OutputPrinter:
+    """Prints output lines of the hosts as they come, prefixed with the host name"""
+
+    def __init__(self, names: List[str], output: TextIO):
+        self._width = max((len(name) for name in names), default=0)
+        self._output = output
+
+    def print_line(self, name: str, line: bytes) -> str:
+        text = line.decode(errors='replace').rstrip('\r')
+        print('{} | {}'.format(name.ljust(self._width), text), file=self._output, flush=True)
+        return text
+
+
+async def _read_lines(name: str, stream: asyncio.StreamReader, printer: _OutputPrinter,
+                      lines: List[str]) -> None:
+    # Chunks are split into lines here, readline fails on lines longer than its limit
+    buffer = b''
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        *complete_lines, buffer = (buffer + chunk).split(b'\n')
+        lines.extend(printer.print_line(name, line) for line in complete_lines)
+    if buffer:
+        lines.append(printer.print_line(name, buffer))
+
+
+async def _run_on_host(name: str, command: str, timeout: Optional[float],
+                       semaphore: asyncio.Semaphore, printer: _OutputPrinter) -> ExecResult:
+    async with semaphore:
+        start = time.perf_counter()
+        # Own process group lets the whole command, e.g. sshpass and its ssh, be killed
+        process = await asyncio.create_subprocess_shell(
+            command, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT, start_new_session=True)
+        lines: List[str] = []
+
+        async def read_until_exit() -> int:
+            await _read_lines(name, process.stdout, printer, lines)  # type: ignore
+            # Command can close its output and keep running, the timeout covers it too
+            return await process.wait()
+
+        try:
+            exit_code: Optional[int] = await asyncio.wait_for(read_until_exit(), timeout)
+        except asyncio.TimeoutError:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            exit_code = None
+        return ExecResult(name, exit_code, time.perf_counter() - start, '\n'.join(lines))
+
+
+async def _run_on_hosts(commands: List[Tuple[str, str]], concurrency: int,
+                        timeout: Optional[float], output: TextIO) -> List[ExecResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    printer = _OutputPrinter([name for name, _ in commands], output)
+    return list(await asyncio.gather(*(
+        _run_on_host(name, command, timeout, semaphore, printer)
+        for name, command in commands)))
+
+
+def run_commands(commands: List[Tuple[str, str]], concurrency: int, timeout: Optional[float],
+                 output: TextIO) -> List[ExecResult]:
+    """Run shell commands in parallel, printing their output lines prefixed with their names
+
+    :param commands: List of (name, shell command) tuples
+    :type commands: list
+    :param concurrency: Maximum number of commands run at the same time
+    :type concurrency: int
+    :param timeout: Seconds after which a command is killed, None if there is no limit
+    :type timeout: float
+    :param output: Stream which output lines of the commands are printed to
+    :type output: TextIO
+
+    :return: Results of the commands, in the order of commands
+    :rtype: list
+    """
+    if not commands:
+        return []
+    return asyncio.run(_run_on_hosts(commands, max(concurrency, 1), timeout, output))
+
+
+def exec_on_hosts(hosts: list, command: str, concurrency: int, timeout: Optional[float],
+                  output: TextIO) -> List[ExecResult]:
+    """Run the command on the hosts over ssh, without terminals, in parallel
+
+    :param hosts: Host adapters to run the command on
+    :type hosts: list
+    :param command: Shell command run on each host
+    :type command: str
+
+    :return: Results of the hosts, in the order of hosts
+    :rtype: list
+    """
+    return run_commands(
+        [(host.host_name, host.connection.remote_command(command, EXEC_CONNECT_TIMEOUT))
+         for host in hosts],
+        concurrency, timeout, output)
+
+
+def _host_names(results: List[ExecResult]) -> str:
+    names = ', '.join(result.name for result in results[:LISTED_HOSTS_COUNT])
+    if len(results) > LISTED_HOSTS_COUNT:
+        names += ' and {} more'.format(len(results) - LISTED_HOSTS_COUNT)
+    return names
+
+
+def report_exec_results(results: List[ExecResult], elapsed: float, output: TextIO) -> None:
+    """Print exit codes, the slowest hosts and hosts grouped by identical output"""
+    succeeded_count = sum(result.succeeded for result in results)
+    timed_out_count = sum(result.timed_out for result in results)
+    print("exec: {} succeeded, {} failed, {} timed out in {:.0f} ms".format(
+        succeeded_count, len(results) - succeeded_count - timed_out_count, timed_out_count,
+        elapsed * 1000), file=output)
+    failed_results: OrderedDict = OrderedDict()
+    for result in results:
+        if not result.succeeded:
+            failed_results.setdefault(result.exit_code, []).append(result)
+    for exit_code, code_results in failed_results.items():
+        status = 'timed out' if exit_code is None else 'exit status {}'.format(exit_code)
+        print("exec: {} on {} hosts: {}".format(status, len(code_results),
+                                                _host_names(code_results)), file=output)
+    slowest_results = sorted(results, key=lambda result: result.elapsed,
+                             reverse=True)[:SLOWEST_HOSTS_COUNT]
+    print("exec: slowest: {}".format(', '.join(
+        '{} {:.0f} ms'.format(result.name, result.elapsed * 1000)
+        for result in slowest_results)), file=output)
+    outputs: OrderedDict = OrderedDict()
+    for result in results:
+        outputs.setdefault(result.output, []).append(result)
+    for host_output, output_results in sorted(outputs.items(),
+                                              key=lambda item: len(item[1]), reverse=True):
+        first_line = host_output.split('\n', 1)[0] if host_output else '(no output)'
+        print("exec: same output on {} hosts ({}): {}".format(
+            len(output_results), first_line, _host_names(output_results)), file=output)
@@ -0,0 +1,196 @@
+import fnmatch
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Pattern
+
+logger = logging.getLogger(__name__)
+
+# Same term splitting as in ansible: terms are separated by ':' or ',',
+# but colons inside of [x:y] subscripts do not split the pattern
+PATTERN_TERM_RE = re.compile(r'(?:[^\s:\[\]]|\[[^\]]*\])+')
+SUBSCRIPT_RE = re.compile(r'^(.+)\[(?:(-?[0-9]+)|([0-9]*):([0-9]*))\]$')
+SPECIAL_CHARACTERS = ('.', '?', '*', '[')
+ALL_PATTERNS = ('all', '*')
+
+UNION = ''
+INTERSECTION = '&'
+EXCLUSION = '!'
+
+
+class HostPatternError(ValueError):
+    pass
+
+
+class HostMembership:
+    """Group membership of inventory hosts stored as bitsets
+
+    Every host gets a bit, in the order of the inventory hosts. Bitset of
+    a group holds hosts of the group and of all of its descendant groups.
+    """
+
+    def __init__(self, host_names: List[str], group_children: Dict[str, List[str]],
+                 group_hosts: Dict[str, List[str]]):
+        self.host_names = host_names
+        self.host_indices = {host_name: index for index, host_name in enumerate(host_names)}
+        self.all_hosts = (1 << len(host_names)) - 1
+        self._group_children = group_children
+        self._group_hosts = group_hosts
+        self.group_bits: Dict[str, int] = {}
+        for group_name in group_children:
+            self._get_group_bits(group_name, set())
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'HostMembership':
+        return cls(list(snapshot.hosts),
+                   {name: group.child_groups for name, group in snapshot.groups.items()},
+                   {name: [host.name for host in group.hosts]
+                    for name, group in snapshot.groups.items()})
+
+    def _get_group_bits(self, group_name: str, groups_in_progress: set) -> int:
+        if group_name in self.group_bits:
+            return self.group_bits[group_name]
+        groups_in_progress.add(group_name)
+        bits = self.bits_of(self._group_hosts.get(group_name, []))
+        for child_name in self._group_children.get(group_name, []):
+            # Skipping groups in progress protects from cycles in group hierarchy
+            if child_name not in groups_in_progress:
+                bits |= self._get_group_bits(child_name, groups_in_progress)
+        groups_in_progress.discard(group_name)
+        self.group_bits[group_name] = bits
+        return bits
+
+    def bits_of(self, host_names: Iterable[str]) -> int:
+        # Setting bits in a bytearray is much faster than or-ing big integers one by one
+        bitmap = bytearray((len(self.host_names) + 7) // 8)
+        for host_name in host_names:
+            index = self.host_indices[host_name]
+            bitmap[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(bitmap, 'little')
+
+    def host_names_of(self, bits: int) -> List[str]:
+        # Bit with index 0 is the last character of the binary representation
+        reversed_bits = format(bits, 'b')[::-1]
+        host_names = []
+        index = reversed_bits.find('1')
+        while index != -1:
+            host_names.append(self.host_names[index])
+            index = reversed_bits.find('1', index + 1)
+        return host_names
+
+
+class PatternTerm:
+    def __init__(self, operator: str, expression: str, subscript: Optional[slice]):
+        self.operator = operator
+        self.expression = expression
+        self.subscript = subscript
+        self._matcher = self._compile_matcher(expression)
+        self._is_special = (expression.startswith('~') or
+                            any(char in expression for char in SPECIAL_CHARACTERS))
+
+    @staticmethod
+    def _compile_matcher(expression: str) -> Pattern:
+        if expression.startswith('~'):
+            try:
+                return re.compile(expression[1:])
+            except re.error as error:
+                raise HostPatternError("Invalid regular expression in host pattern "
+                                       "'{}': {}".format(expression, error))
+        return re.compile(fnmatch.translate(expression))
+
+    def _match_names(self, names: Iterable[str]) -> List[str]:
+        if not self._is_special:
+            return [self.expression] if self.expression in names else []
+        return [name for name in names if self._matcher.match(name)]
+
+    def evaluate(self, membership: HostMembership) -> int:
+        if self.expression in ALL_PATTERNS:
+            bits = membership.all_hosts
+        else:
+            bits = 0
+            matching_groups = self._match_names(membership.group_bits)
+            for group_name in matching_groups:
+                bits |= membership.group_bits[group_name]
+            # Like in ansible, host names are checked when no group matched
+            # or when the pattern could match both groups and hosts
+            if not matching_groups or self._is_special:
+                bits |= membership.bits_of(self._match_names(membership.host_indices))
+            if not bits:
+                logger.warning("Could not match supplied host pattern, ignoring: %s",
+                               self.expression)
+        if self.subscript is not None:
+            bits = self._apply_subscript(bits, membership, self.subscript)
+        return bits
+
+    @staticmethod
+    def _apply_subscript(bits: int, membership: HostMembership, subscript: slice) -> int:
+        return membership.bits_of(membership.host_names_of(bits)[subscript])
+
+
+class HostPattern:
+    """Compiled ansible host pattern
+
+    Terms are evaluated in the same order as in ansible: unions first,
+    then intersections (&) and exclusions (!) last.
+    """
+
+    def __init__(self, terms: List[PatternTerm]):
+        self.terms = terms
+
+    def evaluate(self, membership: HostMembership) -> int:
+        union_terms = [term for term in self.terms if term.operator == UNION]
+        bits = 0
+        if not union_terms:
+            bits = membership.all_hosts
+        for term in union_terms:
+            bits |= term.evaluate(membership)
+        for term in self.terms:
+            if term.operator == INTERSECTION:
+                bits &= term.evaluate(membership)
+        for term in self.terms:
+            if term.operator == EXCLUSION:
+                bits &= ~term.evaluate(membership)
+        return bits
+
+    def get_host_names(self, membership: HostMembership) -> List[str]:
+        return membership.host_names_of(self.evaluate(membership))
+
+
+def _parse_subscript(term: str):
+    """Split term into the expression and slice of its [x], [x:y] subscript
+    Like in ansible, the end of [x:y] range is inclusive
+    """
+    if term.startswith('~'):
+        return term, None
+    subscript_match = SUBSCRIPT_RE.match(term)
+    if not subscript_match:
+        return term, None
+    expression, single_index, start, end = subscript_match.groups()
+    if single_index is not None:
+        index = int(single_index)
+        return expression, slice(index, index + 1 if index != -1 else None)
+    return expression, slice(int(start) if start else None, int(end) + 1 if end else None)
+
+
+def compile_host_pattern(pattern: str) -> HostPattern:
+    """Compile ansible host pattern, like 'webservers:&prod:!web[0:2]:~db\\d+'
+
+    :param pattern: Host pattern in the ansible syntax
+    :type pattern: str
+
+    :return: Compiled host pattern
+    :rtype: HostPattern
+    """
+    if ',' in pattern:
+        raw_terms = [term.strip() for term in pattern.split(',')]
+    else:
+        raw_terms = PATTERN_TERM_RE.findall(pattern)
+    terms = []
+    for raw_term in raw_terms:
+        if not raw_term:
+            continue
+        operator = UNION
+        if raw_term[0] in (INTERSECTION, EXCLUSION):
+            operator, raw_term = raw_term[0], raw_term[1:]
+        expression, subscript = _parse_subscript(raw_term)
+        terms.append(PatternTerm(operator, expression, subscript))
+    return HostPattern(terms)
@@ -0,0 +1,51 @@
+from collections import defaultdict
+from typing import Dict, List, TextIO
+
+from ansibleconnect.ansiblehostadapter import host_connection_plugin, is_connection_supported
+from ansibleconnect.hostpattern import HostPatternError
+from ansibleconnect.inventoryadapter import InventoryAdapter
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.parser import parse_hostnames, parse_vars
+
+
+def select_hosts(args, inventory: InventoryAdapter) -> List[SnapshotHost]:
+    """Hosts selected by names or the host pattern, before filtering them by variables"""
+    hostnames = parse_hostnames(args.hosts)
+    if hostnames:
+        return inventory.get_hosts_by_names(hostnames)
+    try:
+        return inventory.get_hosts_by_pattern(args.groups or '')
+    except HostPatternError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+
+
+def filter_hosts_by_variables(args, inventory: InventoryAdapter,
+                              hosts_list: List[SnapshotHost]) -> List[SnapshotHost]:
+    variables = parse_vars(args.variables)
+    no_variables = parse_vars(args.no_variables)
+    if not variables and not no_variables:
+        return hosts_list
+    return inventory.get_hosts_by_variables(hosts_list, variables, no_variables)
+
+
+def skip_unsupported_hosts(hosts_list: List[SnapshotHost], output: TextIO) -> List[SnapshotHost]:
+    """Hosts which can be connected to, the others are reported as skipped
+
+    Hosts whose ansible_connection has no connection command, e.g. local,
+    would get a pane connecting to a different host than ansible does.
+
+    :param output: File the skipped hosts are reported to
+    :type output: file
+    """
+    skipped_hosts: Dict[str, List[str]] = defaultdict(list)
+    supported_hosts = []
+    for host in hosts_list:
+        if is_connection_supported(host):
+            supported_hosts.append(host)
+        else:
+            skipped_hosts[host_connection_plugin(host)].append(host.name)
+    for plugin, host_names in sorted(skipped_hosts.items()):
+        print("connection: {} skipped, ansible_connection {} is not supported".format(
+            ', '.join(host_names), plugin), file=output)
+    return supported_hosts
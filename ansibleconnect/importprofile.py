@@ -0,0 +1,72 @@
+import builtins
+import importlib.util
+import sys
+import time
+from typing import List, TextIO
+
+
+class ImportRecord:
+    def __init__(self, module_name: str, depth: int):
+        self.module_name = module_name
+        self.depth = depth
+        self.self_time = 0.0
+        self.cumulative_time = 0.0
+
+
+class ImportProfiler:
+    """Measures how long it takes to import each module imported while it is running
+
+    Times are reported in the same format as by python's ``-X importtime`` option.
+    Modules that were imported before the profiler was started are not reported.
+    """
+
+    def __init__(self):
+        self.records: List[ImportRecord] = []
+        self._original_import = builtins.__import__
+        self._children_times: List[float] = []
+
+    def start(self) -> None:
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self) -> None:
+        builtins.__import__ = self._original_import
+
+    def _resolve_name(self, name: str, import_globals, level: int) -> str:
+        if level == 0:
+            return name
+        package = (import_globals or {}).get('__package__') or ''
+        try:
+            return importlib.util.resolve_name('.' * level + name, package)
+        except (ImportError, ValueError):
+            return name
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = self._resolve_name(name, globals, level)
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        record = ImportRecord(module_name, len(self._children_times))
+        self.records.append(record)
+        self._children_times.append(0.0)
+        start_time = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            record.cumulative_time = time.perf_counter() - start_time
+            record.self_time = record.cumulative_time - self._children_times.pop()
+            if self._children_times:
+                self._children_times[-1] += record.cumulative_time
+
+    def total_time(self) -> float:
+        return sum(record.cumulative_time for record in self.records if record.depth == 0)
+
+    def report(self, output: TextIO) -> None:
+        output.write("import time: self [us] | cumulative | imported package\n")
+        for record in self.records:
+            output.write("import time: {self_time:>9} | {cumulative_time:>10} | {indent}{name}\n"
+                         .format(self_time=int(record.self_time * 1e6),
+                                 cumulative_time=int(record.cumulative_time * 1e6),
+                                 indent='  ' * record.depth,
+                                 name=record.module_name))
+        output.write("import time: total {:.3f}s in {} modules\n".format(self.total_time(),
+                                                                         len(self.records)))
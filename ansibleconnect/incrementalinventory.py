@@ -0,0 +1,236 @@
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ansibleconnect.inventoryadapter import parse_inventory
+from ansibleconnect.inventorysnapshot import InventorySnapshot, \
+    SnapshotGroup, \
+    SnapshotHost, \
+    merge_host_vars
+from ansibleconnect.variableindex import VariableIndex
+
+
+def _get_stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+def _walk_inventory_dir(directory: str, ignored, files: List[str]) -> None:
+    # Entries are visited in the same order as ansible does, sorted by name,
+    # descending into subdirectories as soon as they are found
+    for name in sorted(os.listdir(directory)):
+        if ignored.search(os.fsencode(name)):
+            continue
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            _walk_inventory_dir(path, ignored, files)
+        else:
+            files.append(path)
+
+
+def list_inventory_files(inventory_dir: str) -> List[str]:
+    """List files which ansible parses as separate sources of an inventory directory
+
+    :param inventory_dir: Path of the inventory directory
+    :type inventory_dir: str
+
+    :return: Paths of the inventory files, in the order ansible parses them
+    :rtype: list
+    """
+    # Same names are skipped as by ansible, including group_vars and host_vars
+    # directories and the extensions configured with INVENTORY_IGNORE_EXTS
+    from ansible.inventory.manager import IGNORED  # type: ignore
+
+    files: List[str] = []
+    _walk_inventory_dir(os.path.abspath(inventory_dir), IGNORED, files)
+    return files
+
+
+class InventoryFile:
+    """Inventory file parsed on its own, with the hosts and groups it contributed"""
+
+    def __init__(self, path: str, stat_key: Optional[Tuple[int, int]],
+                 snapshot: InventorySnapshot):
+        self.path = path
+        self.stat_key = stat_key
+        self.snapshot = snapshot
+
+
+class InventoryUpdate:
+    def __init__(self, parsed_files: List[str], removed_files: List[str],
+                 updated_hosts_count: int, elapsed: float):
+        self.parsed_files = parsed_files
+        self.removed_files = removed_files
+        self.updated_hosts_count = updated_hosts_count
+        self.elapsed = elapsed
+
+
+class IncrementalInventory:
+    """Inventory directory which files are parsed one by one and re-parsed only when changed
+
+    Every host and group remembers the files it comes from. When files change,
+    only they are parsed again and only hosts and groups they contributed to
+    are merged again, replacing their records in the hosts and groups mappings
+    and updating the variable index in place.
+    Files are merged the same way as inventory sources given with multiple -i
+    options, so a host has only the groups defined by the files it appears in.
+    """
+
+    def __init__(self, inventory_dir: str):
+        self.source = inventory_dir
+        self._files: Dict[str, InventoryFile] = {}
+        self._file_order: List[str] = []
+        self._host_files: Dict[str, List[str]] = {}
+        self._group_files: Dict[str, List[str]] = {}
+        self._hosts: Dict[str, SnapshotHost] = {}
+        self._groups: Dict[str, SnapshotGroup] = {}
+        self._variable_index = VariableIndex({}, {})
+        self.snapshot = InventorySnapshot(self._hosts, self._groups, self._variable_index)
+
+    def get_host_files(self, host_name: str) -> List[str]:
+        return list(self._host_files.get(host_name, []))
+
+    def get_group_files(self, group_name: str) -> List[str]:
+        return list(self._group_files.get(group_name, []))
+
+    def update(self, reparse_all: bool = False) -> InventoryUpdate:
+        """Parse files which changed since the last update and merge them into the snapshot
+
+        :param reparse_all: Parse all the files, even if they did not change
+        :type reparse_all: bool
+
+        :return: Files parsed and removed by the update
+        :rtype: InventoryUpdate
+        """
+        start = time.perf_counter()
+        file_order = list_inventory_files(self.source)
+        stat_keys = {path: _get_stat_key(path) for path in file_order}
+        changed_files = [path for path in file_order
+                         if reparse_all or path not in self._files
+                         or self._files[path].stat_key != stat_keys[path]]
+        removed_files = [path for path in self._files if path not in stat_keys]
+        if not changed_files and not removed_files and file_order == self._file_order:
+            return InventoryUpdate([], [], 0, time.perf_counter() - start)
+        # Files are parsed before anything is updated, so that a file which fails
+        # to parse leaves the inventory as it was
+        parsed_files = [InventoryFile(path, stat_keys[path], parse_inventory(path))
+                        for path in changed_files]
+        previous_files = [self._files.pop(path) for path in changed_files + removed_files
+                          if path in self._files]
+        self._files.update((inventory_file.path, inventory_file) for inventory_file in parsed_files)
+        file_positions = {path: index for index, path in enumerate(file_order)}
+        affected_hosts, hosts_moved = self._update_provenance(
+            self._host_files, previous_files, parsed_files, file_positions,
+            lambda snapshot: snapshot.hosts)
+        affected_groups, groups_moved = self._update_provenance(
+            self._group_files, previous_files, parsed_files, file_positions,
+            lambda snapshot: snapshot.groups)
+        for host_name in affected_hosts:
+            # Groups holding the replaced host records are merged again as well
+            affected_groups.update(group_name for group_name in self._merge_host(host_name)
+                                   if group_name in self._groups)
+        for group_name in affected_groups:
+            self._merge_group(group_name)
+        if hosts_moved or groups_moved or file_order != self._file_order:
+            self._restore_order(file_order)
+        self._file_order = file_order
+        # Group membership bitsets depend on positions of all the hosts, they are built again
+        self.snapshot = InventorySnapshot(self._hosts, self._groups, self._variable_index)
+        return InventoryUpdate(changed_files, removed_files, len(affected_hosts),
+                               time.perf_counter() - start)
+
+    @staticmethod
+    def _update_provenance(item_files: Dict[str, List[str]],
+                           previous_files: List[InventoryFile], parsed_files: List[InventoryFile],
+                           file_positions: Dict[str, int], get_items) -> Tuple[Set[str], bool]:
+        """Update files of the hosts or groups which changed files contributed to
+
+        :return: Names of the hosts or groups which files changed and whether any
+                 of them comes first from another file than before
+        :rtype: tuple
+        """
+        touched_files = {inventory_file.path for inventory_file in previous_files + parsed_files}
+        affected_items: Set[str] = set()
+        for inventory_file in previous_files:
+            affected_items.update(get_items(inventory_file.snapshot))
+        new_item_files: Dict[str, List[str]] = {}
+        for inventory_file in parsed_files:
+            for name in get_items(inventory_file.snapshot):
+                new_item_files.setdefault(name, []).append(inventory_file.path)
+        affected_items.update(new_item_files)
+        moved = False
+        for name in affected_items:
+            previous_item_files = item_files.get(name, [])
+            files = [path for path in previous_item_files if path not in touched_files]
+            files.extend(new_item_files.get(name, []))
+            if not files:
+                item_files.pop(name, None)
+                continue
+            files.sort(key=file_positions.__getitem__)
+            moved = moved or not previous_item_files or previous_item_files[0] != files[0]
+            item_files[name] = files
+        return affected_items, moved
+
+    def _merge_host(self, host_name: str) -> Set[str]:
+        """Replace record of the host with one merged from its files
+
+        :return: Groups of the previous and the new record of the host
+        :rtype: set
+        """
+        groups: Set[str] = set()
+        host = self._hosts.get(host_name)
+        if host is not None:
+            self._variable_index.remove_host(host_name, host.get_vars())
+            groups.update(host.groups)
+        files = self._host_files.get(host_name)
+        if not files:
+            self._hosts.pop(host_name, None)
+            return groups
+        variables: dict = {}
+        host_groups: List[str] = []
+        inherited_variables: dict = {}
+        for path in files:
+            file_host = self._files[path].snapshot.hosts[host_name]
+            merge_host_vars(variables, file_host.vars)
+            host_groups.extend(group for group in file_host.groups if group not in host_groups)
+            inherited_variables.update(file_host.inherited_vars)
+        host = SnapshotHost(host_name, variables, host_groups, inherited_variables)
+        # Replaced record keeps the position of the previous one
+        self._hosts[host_name] = host
+        self._variable_index.add_host(host)
+        groups.update(host_groups)
+        return groups
+
+    def _merge_group(self, group_name: str) -> None:
+        files = self._group_files.get(group_name)
+        if not files:
+            self._groups.pop(group_name, None)
+            return
+        hosts: Dict[str, SnapshotHost] = {}
+        child_groups: List[str] = []
+        for path in files:
+            file_group = self._files[path].snapshot.groups[group_name]
+            for file_host in file_group.hosts:
+                hosts.setdefault(file_host.name, self._hosts[file_host.name])
+            child_groups.extend(child for child in file_group.child_groups
+                                if child not in child_groups)
+        self._groups[group_name] = SnapshotGroup(group_name, list(hosts.values()), child_groups)
+
+    def _restore_order(self, file_order: List[str]) -> None:
+        # Hosts and groups are kept in the order they first appear in the files,
+        # the same as when the files are parsed all at once
+        snapshots = [self._files[path].snapshot for path in file_order]
+        self._reorder(self._hosts, [snapshot.hosts for snapshot in snapshots])
+        self._reorder(self._groups, [snapshot.groups for snapshot in snapshots])
+
+    @staticmethod
+    def _reorder(items: dict, file_items: List[dict]) -> None:
+        ordered_names: Dict[str, None] = {}
+        for names in file_items:
+            ordered_names.update(dict.fromkeys(names))
+        ordered_items = [(name, items[name]) for name in ordered_names]
+        items.clear()
+        items.update(ordered_items)
@@ -1,57 +1,374 @@
+import bisect
 import logging
-from typing import List
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
-from ansible.inventory.host import Host  # type: ignore
-from ansible.inventory.manager import InventoryManager  # type: ignore
-from ansible.parsing.dataloader import DataLoader  # type: ignore
+from ansibleconnect.connections import CONNECTION_VARIABLES
+from ansibleconnect.hostpattern import EXCLUSION, compile_host_pattern
+from ansibleconnect.inventorycache import get_inventory_fingerprint, \
+    load_cached_snapshot, \
+    save_snapshot
+from ansibleconnect.inventorysnapshot import InventorySnapshot, SnapshotHost
 
 logger = logging.getLogger(__name__)
 
 
+def parse_inventory(inventory_path: str) -> InventorySnapshot:
+    # Ansible is imported only when the inventory really has to be parsed,
+    # importing it takes longer than loading a cached inventory snapshot
+    from ansible.inventory.manager import InventoryManager  # type: ignore
+    from ansible.parsing.dataloader import DataLoader  # type: ignore
+
+    loader = DataLoader()
+    inventory_manager = InventoryManager(loader=loader, sources=inventory_path)
+    return InventorySnapshot.from_inventory_manager(
+        inventory_manager, _inherited_connection_variables(inventory_manager, loader,
+                                                           inventory_path))
+
+
+def _connection_variables(variables) -> dict:
+    return {key: value for key, value in variables.items() if key in CONNECTION_VARIABLES}
+
+
+def _inherited_connection_variables(inventory_manager, loader,
+                                    inventory_path: str) -> Dict[str, dict]:
+    """Connection variables of each host, with the ones set for its groups and in
+    group_vars and host_vars files, in ansible's order of precedence
+
+    Only connection variables are inherited, e.g. vault encrypted ansible_password
+    of a group, other variables of the hosts are the ones set in the inventory for them.
+    """
+    from ansible.errors import AnsibleError  # type: ignore
+    from ansible.inventory.helpers import get_group_vars, sort_groups  # type: ignore
+    from ansible.vars.plugins import get_vars_from_inventory_sources  # type: ignore
+
+    # Vars plugins look for group_vars and host_vars next to absolute inventory paths only
+    sources = [os.path.abspath(inventory_path) if os.path.exists(inventory_path)
+               else inventory_path]
+
+    def vars_files_variables(entity) -> dict:
+        try:
+            # Stage of the vars plugins run on demand, like host_group_vars by default
+            return _connection_variables(get_vars_from_inventory_sources(loader, sources,
+                                                                         [entity], 'task'))
+        except AnsibleError as error:
+            logger.warning("Variables of %s could not be loaded: %s", entity.name, error)
+            return {}
+
+    group_files_variables: Dict[str, dict] = {}
+    host_variables = {}
+    for name, host in inventory_manager.hosts.items():
+        groups = sort_groups(host.get_groups())
+        variables = _connection_variables(get_group_vars(groups))
+        for group in groups:
+            if group.name not in group_files_variables:
+                group_files_variables[group.name] = vars_files_variables(group)
+            variables.update(group_files_variables[group.name])
+        variables.update(_connection_variables(host.vars))
+        variables.update(vars_files_variables(host))
+        host_variables[name] = variables
+    return host_variables
+
+
+SOURCE_PARSED = 'parsed'
+SOURCE_CACHED = 'cached'
+SOURCE_STALE = 'stale'
+SOURCE_FAILED = 'failed'
+
+
+class InventorySourceError(Exception):
+    pass
+
+
+class SourceLoadResult:
+    def __init__(self, source: str, status: str, elapsed: float,
+                 snapshot: Optional[InventorySnapshot] = None, error: Optional[str] = None):
+        self.source = source
+        self.status = status
+        self.elapsed = elapsed
+        self.snapshot = snapshot
+        self.error = error
+
+
+def _parse_to_pipe(source: str, sender) -> None:
+    # Output of the worker must not mix with the script printed by the main process,
+    # which is also run only once all the processes writing it have closed it
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
+    try:
+        sender.send((parse_inventory(source).to_dict(), None))
+    except Exception as exception:
+        sender.send((None, str(exception) or type(exception).__name__))
+
+
+class _SourceParser:
+    """Parses an inventory source in a worker process
+
+    Ansible loads its plugins lazily and not in a thread safe way, separate
+    processes also parse the sources in parallel and can be stopped on timeout.
+    """
+
+    def __init__(self, source: str):
+        # Imported only when sources are parsed in worker processes, runs served
+        # from the cache or parsing a single source do not pay for the import
+        import multiprocessing
+
+        self.source = source
+        self.snapshot: Optional[InventorySnapshot] = None
+        self.error: Optional[str] = None
+        self.elapsed = 0.0
+        self._receiver, self._sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_parse_to_pipe,
+                                                args=(source, self._sender), daemon=True)
+        self._start = 0.0
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._process.start()
+        # Receiver gets EOF if the worker process dies without sending the result
+        self._sender.close()
+
+    @property
+    def receiver(self):
+        return self._receiver
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """Wait for the result, the worker process is stopped if it does not finish in time"""
+        if not self._receiver.poll(timeout):
+            self._process.terminate()
+            return False
+        try:
+            snapshot_dict, self.error = self._receiver.recv()
+        except EOFError:
+            snapshot_dict, self.error = None, 'worker process exited unexpectedly'
+        self.elapsed = time.perf_counter() - self._start
+        if snapshot_dict is not None:
+            self.snapshot = InventorySnapshot.from_dict(snapshot_dict)
+        self._process.join()
+        return True
+
+
+def refresh_in_background(inventory_source: str) -> None:
+    """Parse the inventory source in a detached process which updates its cached snapshot"""
+    import subprocess
+
+    subprocess.Popen([sys.executable, '-m', 'ansibleconnect.inventoryadapter', inventory_source],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def refresh_cached_snapshot(inventory_source: str) -> None:
+    fingerprint = get_inventory_fingerprint(inventory_source)
+    save_snapshot(inventory_source, fingerprint, parse_inventory(inventory_source))
+
+
+def _get_parser_result(parser: _SourceParser, finished: bool, timeout: Optional[float],
+                       use_cache: bool, fingerprint: Optional[str]) -> SourceLoadResult:
+    error: Optional[str]
+    if not finished:
+        elapsed = timeout or 0.0
+        error = 'timed out after {:g} s'.format(elapsed)
+        if use_cache:
+            refresh_in_background(parser.source)
+    elif parser.snapshot is None:
+        elapsed = parser.elapsed
+        error = parser.error
+    else:
+        if use_cache and fingerprint is not None:
+            save_snapshot(parser.source, fingerprint, parser.snapshot)
+        return SourceLoadResult(parser.source, SOURCE_PARSED, parser.elapsed, parser.snapshot)
+    stale_snapshot = load_cached_snapshot(parser.source, None) if use_cache else None
+    status = SOURCE_STALE if stale_snapshot is not None else SOURCE_FAILED
+    return SourceLoadResult(parser.source, status, elapsed, stale_snapshot, error)
+
+
+def iter_inventory_sources(sources: List[str], use_cache: bool = False,
+                           refresh_cache: bool = False,
+                           timeout: Optional[float] = None
+                           ) -> Iterator[Tuple[int, SourceLoadResult]]:
+    """Load inventory sources, yielding each of them as soon as it is loaded
+
+    Cached sources come first, sources which are parsed follow in the order
+    they finish. See load_inventory_sources for the parameters.
+
+    :return: Iterator of (index of the source, load result) tuples
+    :rtype: iterator
+    """
+    fingerprints = {}
+    sources_to_parse = []
+    for index, source in enumerate(sources):
+        if use_cache:
+            start = time.perf_counter()
+            fingerprints[source] = get_inventory_fingerprint(source)
+            if not refresh_cache:
+                snapshot = load_cached_snapshot(source, fingerprints[source])
+                if snapshot is not None:
+                    yield index, SourceLoadResult(source, SOURCE_CACHED,
+                                                  time.perf_counter() - start, snapshot)
+                    continue
+        sources_to_parse.append((index, source))
+    if len(sources_to_parse) == 1 and timeout is None:
+        # Single source is parsed in this process, its errors are raised as they are
+        index, source = sources_to_parse[0]
+        start = time.perf_counter()
+        snapshot = parse_inventory(source)
+        if use_cache:
+            save_snapshot(source, fingerprints[source], snapshot)
+        yield index, SourceLoadResult(source, SOURCE_PARSED, time.perf_counter() - start,
+                                      snapshot)
+        return
+    if not sources_to_parse:
+        return
+    import multiprocessing.connection
+
+    parsers = {}
+    for index, source in sources_to_parse:
+        parser = _SourceParser(source)
+        parser.start()
+        parsers[parser.receiver] = (index, parser)
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    while parsers:
+        ready = multiprocessing.connection.wait(
+            list(parsers), None if deadline is None else max(deadline - time.perf_counter(), 0))
+        # Sources which are not ready by the deadline are stopped
+        for receiver in ready or list(parsers):
+            index, parser = parsers.pop(receiver)
+            finished = parser.wait(0)
+            yield index, _get_parser_result(parser, finished, timeout, use_cache,
+                                            fingerprints.get(parser.source))
+
+
+def check_sources_loaded(results: List[SourceLoadResult]) -> None:
+    if all(result.snapshot is None for result in results):
+        raise InventorySourceError('None of the inventory sources could be loaded: {}'.format(
+            '; '.join('{}: {}'.format(result.source, result.error) for result in results)))
+
+
+def load_inventory_sources(sources: List[str], use_cache: bool = False,
+                           refresh_cache: bool = False,
+                           timeout: Optional[float] = None) -> List[SourceLoadResult]:
+    """Load inventory sources, sources which are not cached are parsed concurrently
+
+    A source which fails or does not finish within the timeout falls back to
+    its last cached snapshot, even if it is stale. Source which timed out is
+    then parsed again in the background, so that the next run gets fresh data.
+
+    :param sources: Inventory paths as passed to ansible
+    :type sources: list
+    :param use_cache: Read and write cached inventory snapshots
+    :type use_cache: bool
+    :param refresh_cache: Parse the sources even if they are cached
+    :type refresh_cache: bool
+    :param timeout: Seconds to wait for each of the sources, None waits until they finish
+    :type timeout: float
+
+    :return: Results in the order of the sources
+    :rtype: list
+    """
+    indexed_results = sorted(iter_inventory_sources(sources, use_cache, refresh_cache, timeout),
+                             key=lambda indexed_result: indexed_result[0])
+    results = [result for _, result in indexed_results]
+    check_sources_loaded(results)
+    return results
+
+
+def report_source_results(results: List[SourceLoadResult], output: TextIO) -> None:
+    for result in results:
+        message = "inventory: {} {} in {:.0f} ms".format(
+            result.source, result.status, result.elapsed * 1000)
+        if result.error:
+            message += " ({})".format(result.error)
+        print(message, file=output)
+
+
 class InventoryAdapter:
-    def __init__(self, inventory_path: str):
-        self._inventory = InventoryManager(loader=DataLoader(), sources=inventory_path)
+    def __init__(self, inventory_path: Union[str, List[str]], use_cache: bool = False,
+                 refresh_cache: bool = False, source_timeout: Optional[float] = None,
+                 source_results: Optional[List[SourceLoadResult]] = None):
+        # Sources can also be loaded by the caller and passed in source_results
+        if source_results is None:
+            sources = [inventory_path] if isinstance(inventory_path, str) \
+                else list(inventory_path)
+            source_results = load_inventory_sources(sources, use_cache, refresh_cache,
+                                                    source_timeout)
+        self.source_results = list(source_results)
+        # Index of each of the results among the sources, sources which load later
+        # are merged in this order
+        self._source_indexes = list(range(len(self.source_results)))
+        for result in self.source_results:
+            self._warn_about_source(result)
+        self._inventory = self._merge_source_results()
+
+    @staticmethod
+    def _warn_about_source(result: SourceLoadResult) -> None:
+        if result.status == SOURCE_STALE:
+            logger.warning("Using stale cached inventory of %s: %s", result.source,
+                           result.error)
+        elif result.status == SOURCE_FAILED:
+            logger.warning("Inventory source %s skipped: %s", result.source, result.error)
+
+    def _merge_source_results(self) -> InventorySnapshot:
+        return InventorySnapshot.merge([
+            result.snapshot for result in self.source_results if result.snapshot is not None])
+
+    def add_source_result(self, result: SourceLoadResult, index: int) -> None:
+        """Add a source loaded after the inventory was created, e.g. while streaming
 
-    def get_hosts_by_group(self, groups: List[str], no_groups: List[str]) -> List[Host]:
-        output_hosts = set()  # type: ignore
+        Source which comes after all the loaded ones is merged into the inventory,
+        otherwise the sources are merged again, to keep their precedence.
 
-        if not groups:
-            output_hosts.update(self._inventory.hosts.values())
+        :param index: Index of the source among the sources of the inventory
+        :type index: int
+        """
+        position = bisect.bisect(self._source_indexes, index)
+        self._source_indexes.insert(position, index)
+        self.source_results.insert(position, result)
+        self._warn_about_source(result)
+        if result.snapshot is None:
+            return
+        if position == len(self.source_results) - 1:
+            self._inventory = InventorySnapshot.merge([self._inventory, result.snapshot])
         else:
-            for group in groups:
-                group_data = self._inventory.groups[group]
-                output_hosts.update(group_data.hosts)
+            self._inventory = self._merge_source_results()
 
-        for no_group in no_groups:
-            no_group_data = self._inventory.groups[no_group]
-            output_hosts.difference_update(no_group_data.hosts)
+    @property
+    def hosts_count(self) -> int:
+        return len(self._inventory.hosts)
 
-        return list(output_hosts)
+    def get_hosts_by_pattern(self, pattern: str) -> List[SnapshotHost]:
+        """Select hosts with ansible host pattern, hosts are returned in the inventory order
+
+        :param pattern: Host pattern, like 'group1:&group2:!group3:~web[0-9]+:db[0:4]'
+        :type pattern: str
+
+        :return: List of matching hosts
+        :rtype: list
+        """
+        host_names = compile_host_pattern(pattern).get_host_names(self._inventory.host_membership)
+        return [self._inventory.hosts[host_name] for host_name in host_names]
+
+    def get_hosts_by_group(self, groups: List[str], no_groups: List[str]) -> List[SnapshotHost]:
+        pattern_terms = groups + [EXCLUSION + no_group for no_group in no_groups]
+        return self.get_hosts_by_pattern(':'.join(pattern_terms))
 
-    def get_hosts_by_names(self, hostnames: List[str]) -> List[Host]:
+    def get_hosts_by_names(self, hostnames: List[str]) -> List[SnapshotHost]:
         output_hosts = {self._inventory.hosts[hostname] for hostname in hostnames if
                         hostname in self._inventory.hosts}
         return list(output_hosts)
 
     def get_hosts_by_variables(self, hosts: List,
-                               variables: List, no_variables: List) -> List[Host]:
-        output_hosts = []
-        if not no_variables:
-            no_variables = []
-        variable_husked_hosts = []
-        if not variables:
-            variable_husked_hosts = hosts
-        else:
-            for host in hosts:
-                if any(var in host.get_vars().items()
-                       for var in variables) or \
-                        any(var[0] in host.get_vars().keys()
-                            for var in variables if not var[1]):
-                    variable_husked_hosts.append(host)
-        for host in variable_husked_hosts:
-            if not any(nvar in host.get_vars().items()
-                       for nvar in no_variables) and \
-                    not any(nvar[0] in host.get_vars().keys()
-                            for nvar in no_variables if not nvar[1]):
-                output_hosts.append(host)
-        return output_hosts
+                               variables: List, no_variables: List) -> List[SnapshotHost]:
+        variable_index = self._inventory.variable_index
+        selected_host_names = {host.name for host in hosts}
+        if variables:
+            selected_host_names &= variable_index.get_host_names_matching_any(variables)
+        if no_variables:
+            selected_host_names -= variable_index.get_host_names_matching_any(no_variables)
+        return [host for host in hosts if host.name in selected_host_names]
+
+
+if __name__ == "__main__":
+    refresh_cached_snapshot(sys.argv[1])
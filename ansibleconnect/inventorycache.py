@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from ansibleconnect.ansible_config_adapter import get_ansible_config_filepath
+from ansibleconnect.completionindex import CompletionIndex
+
+if TYPE_CHECKING:
+    from ansibleconnect.inventorysnapshot import InventorySnapshot
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+# Directories next to an inventory file that ansible vars plugins read from
+INVENTORY_VARS_DIRS = ['group_vars', 'host_vars']
+# Inventory scripts and plugins can return other hosts while their files stay the same,
+# their cached snapshots expire after this many seconds
+DYNAMIC_SOURCE_CACHE_TTL = 300
+YAML_EXTENSIONS = ('.yml', '.yaml')
+PLUGIN_CONFIG_RE = re.compile(rb'^plugin\s*:', re.MULTILINE)
+PLUGIN_CONFIG_HEAD_SIZE = 4096
+
+
+def get_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(cache_home, 'ansibleconnect')
+
+
+def _walk_files(directory: str) -> List[str]:
+    files: List[str] = []
+    for root, dirs, filenames in os.walk(directory):
+        # Hidden files and directories are ignored by ansible as well
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        files.extend(os.path.join(root, filename) for filename in sorted(filenames)
+                     if not filename.startswith('.'))
+    return files
+
+
+def get_inventory_source_files(inventory_source: str) -> List[str]:
+    """List files which content is used when the inventory source is parsed
+
+    :param inventory_source: Inventory path as passed to ansible
+    :type inventory_source: str
+
+    :return: Paths of the inventory files, including group_vars and host_vars
+             directories placed next to the inventory file
+    :rtype: list
+    """
+    source_path = os.path.abspath(inventory_source)
+    if os.path.isdir(source_path):
+        return _walk_files(source_path)
+    if not os.path.exists(source_path):
+        # Comma separated host list, there are no files behind it
+        return []
+    files = [source_path]
+    for vars_dir in INVENTORY_VARS_DIRS:
+        files.extend(_walk_files(os.path.join(os.path.dirname(source_path), vars_dir)))
+    return files
+
+
+def _is_dynamic_inventory_file(filepath: str) -> bool:
+    """Whether the file is an inventory script or an inventory plugin configuration"""
+    if os.access(filepath, os.X_OK):
+        return True
+    if not filepath.endswith(YAML_EXTENSIONS):
+        return False
+    try:
+        with open(filepath, 'rb') as inventory_file:
+            head = inventory_file.read(PLUGIN_CONFIG_HEAD_SIZE)
+    except OSError:
+        return False
+    return PLUGIN_CONFIG_RE.search(head) is not None
+
+
+def is_dynamic_inventory_source(inventory_source: str) -> bool:
+    """Whether the source runs a script or an inventory plugin, which hosts may change
+    without any of its files being modified"""
+    source_path = os.path.abspath(inventory_source)
+    if not os.path.isdir(source_path):
+        return os.path.isfile(source_path) and _is_dynamic_inventory_file(source_path)
+    vars_dirs = set(INVENTORY_VARS_DIRS)
+    return any(_is_dynamic_inventory_file(filepath) for filepath in _walk_files(source_path)
+               if vars_dirs.isdisjoint(os.path.relpath(filepath, source_path).split(os.sep)))
+
+
+def get_inventory_fingerprint(inventory_source: str,
+                              config_filepath: Optional[str] = None) -> str:
+    """Fingerprint of the files of the inventory source, and of ansible.cfg
+
+    Fingerprint of a dynamic source also changes every DYNAMIC_SOURCE_CACHE_TTL
+    seconds, so that its cached snapshot expires.
+
+    :param config_filepath: Path of ansible.cfg, the one found by ansible if None
+    :type config_filepath: str
+    """
+    files = get_inventory_source_files(inventory_source)
+    if config_filepath is None:
+        config_filepath = get_ansible_config_filepath()
+    if config_filepath:
+        files.append(os.path.abspath(config_filepath))
+    fingerprint_data = [CACHE_VERSION, inventory_source]
+    for filepath in files:
+        try:
+            file_stat = os.stat(filepath)
+        except OSError:
+            continue
+        fingerprint_data.append([filepath, file_stat.st_mtime_ns, file_stat.st_size])
+    if is_dynamic_inventory_source(inventory_source):
+        fingerprint_data.append(int(time.time() // DYNAMIC_SOURCE_CACHE_TTL))
+    return hashlib.sha256(json.dumps(fingerprint_data).encode()).hexdigest()
+
+
+def get_cache_filepath(inventory_source: str) -> str:
+    source_key = inventory_source
+    if os.path.exists(inventory_source):
+        source_key = os.path.abspath(inventory_source)
+    filename = hashlib.sha256(source_key.encode()).hexdigest()[:32] + '.json'
+    return os.path.join(get_cache_dir(), filename)
+
+
+def get_completion_index_filepath(inventory_source: str) -> str:
+    return get_cache_filepath(inventory_source)[:-len('.json')] + '.completion.json'
+
+
+def load_cached_snapshot(inventory_source: str,
+                         fingerprint: Optional[str]) -> Optional['InventorySnapshot']:
+    """Load inventory snapshot if it was saved for unchanged inventory files
+
+    :param inventory_source: Inventory path as passed to ansible
+    :type inventory_source: str
+    :param fingerprint: Current fingerprint of the inventory source files,
+                        None loads the last saved snapshot, even if it is stale
+    :type fingerprint: str
+
+    :return: Inventory snapshot or None if there is no valid snapshot cached
+    :rtype: InventorySnapshot
+    """
+    try:
+        with open(get_cache_filepath(inventory_source)) as cache_file:
+            cache_data = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if fingerprint is not None and cache_data.get('fingerprint') != fingerprint:
+        return None
+    # Shell completion reads only completion indexes, so it does not import snapshots
+    from ansibleconnect.inventorysnapshot import InventorySnapshot
+
+    return InventorySnapshot.from_dict(cache_data['snapshot'])
+
+
+def load_completion_index(inventory_source: str) -> Tuple[Optional[str],
+                                                          Optional[CompletionIndex]]:
+    """Load completion index saved with the last snapshot of the inventory source
+
+    :param inventory_source: Inventory path as passed to ansible
+    :type inventory_source: str
+
+    :return: Fingerprint of the inventory files the index was built from and the index,
+             (None, None) if there is no index saved
+    :rtype: tuple
+    """
+    try:
+        with open(get_completion_index_filepath(inventory_source)) as index_file:
+            index_data = json.load(index_file)
+    except (OSError, ValueError):
+        return None, None
+    return index_data['fingerprint'], CompletionIndex.from_dict(index_data['index'])
+
+
+def _write_cache_file(cache_filepath: str, serialized_data: str) -> None:
+    # Imported only when the cache is written, like snapshots in load_cached_snapshot
+    import tempfile
+
+    os.makedirs(os.path.dirname(cache_filepath), mode=0o700, exist_ok=True)
+    # Written to a temporary file first so that concurrent runs never read a partial cache
+    file_descriptor, temp_filepath = tempfile.mkstemp(dir=os.path.dirname(cache_filepath))
+    try:
+        with os.fdopen(file_descriptor, 'w') as cache_file:
+            cache_file.write(serialized_data)
+        os.replace(temp_filepath, cache_filepath)
+    except OSError:
+        # Partially written file, e.g. when the disk is full, would stay in the cache forever
+        os.unlink(temp_filepath)
+        raise
+
+
+def save_snapshot(inventory_source: str, fingerprint: str, snapshot: 'InventorySnapshot') -> None:
+    """Save the snapshot and the completion index of the inventory source"""
+    cache_data = {
+        'fingerprint': fingerprint,
+        'snapshot': snapshot.to_dict(),
+    }
+    try:
+        serialized_data = json.dumps(cache_data)
+    except (TypeError, ValueError) as error:
+        logger.warning("Inventory is not cached, it holds values that cannot be serialized: %s",
+                       error)
+        return
+    index_data = {
+        'fingerprint': fingerprint,
+        'index': CompletionIndex.from_snapshot(snapshot).to_dict(),
+    }
+    try:
+        _write_cache_file(get_cache_filepath(inventory_source), serialized_data)
+        _write_cache_file(get_completion_index_filepath(inventory_source),
+                          json.dumps(index_data))
+    except OSError as error:
+        logger.warning("Inventory cache could not be saved: %s", error)
@@ -0,0 +1,212 @@
+import ipaddress
+from collections import ChainMap
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from ansibleconnect.hostpattern import HostMembership
+from ansibleconnect.variableindex import VariableIndex
+from ansibleconnect.vault import encode_vault_values
+
+# Ansible sets them when a host is added for the first time, later sources keep them
+FIRST_SOURCE_VARIABLES = ('inventory_file', 'inventory_dir')
+
+
+def _short_hostname(host_name: str) -> str:
+    try:
+        ipaddress.ip_address(host_name)
+        return host_name
+    except ValueError:
+        return host_name.split('.')[0]
+
+
+def merge_host_vars(variables: dict, source_variables: dict) -> None:
+    """Update variables of a host with its variables from a later inventory source"""
+    for key, value in source_variables.items():
+        if key not in FIRST_SOURCE_VARIABLES or key not in variables:
+            variables[key] = value
+
+
+class SnapshotHost:
+    """Compact record of resolved host data, the plain python counterpart of ansible's Host
+
+    Records are not modified once created, merging inventory sources creates new ones.
+    Variables of the host itself are the ones hosts are selected by, connection
+    variables inherited from its groups and vars files are kept apart from them.
+    """
+
+    __slots__ = ('name', 'vars', 'groups', 'inherited_vars')
+
+    def __init__(self, name: str, variables: dict, groups: Iterable[str],
+                 inherited_variables: Optional[dict] = None):
+        self.name = name
+        self.vars = variables
+        self.groups = tuple(groups)
+        self.inherited_vars = inherited_variables or {}
+
+    def get_magic_vars(self) -> dict:
+        return {
+            'inventory_hostname': self.name,
+            'inventory_hostname_short': _short_hostname(self.name),
+            'group_names': sorted(group for group in self.groups if group != 'all'),
+        }
+
+    def get_vars(self) -> dict:
+        host_vars = dict(self.vars)
+        host_vars.update(self.get_magic_vars())
+        return host_vars
+
+    def get_connection_vars(self) -> Mapping:
+        """Variables of the host with the inherited connection variables, which take precedence"""
+        return ChainMap(self.inherited_vars, self.vars)
+
+    def __repr__(self):
+        return self.name
+
+
+class SnapshotGroup:
+    __slots__ = ('name', 'hosts', 'child_groups')
+
+    def __init__(self, name: str, hosts: List[SnapshotHost], child_groups: List[str]):
+        self.name = name
+        self.hosts = hosts
+        self.child_groups = child_groups
+
+
+class InventorySnapshot:
+    """Resolved hosts and groups of an inventory, detached from ansible objects
+
+    Exposes the same ``hosts`` and ``groups`` mappings that are used from
+    ansible's InventoryManager, so it can be used in its place.
+    """
+
+    def __init__(self, hosts: Dict[str, SnapshotHost], groups: Dict[str, SnapshotGroup],
+                 variable_index: Optional[VariableIndex] = None):
+        self.hosts = hosts
+        self.groups = groups
+        self._variable_index = variable_index
+        self._host_membership: Optional[HostMembership] = None
+
+    @property
+    def variable_index(self) -> VariableIndex:
+        if self._variable_index is None:
+            self._variable_index = VariableIndex.from_hosts(self.hosts.values())
+        return self._variable_index
+
+    @property
+    def host_membership(self) -> HostMembership:
+        if self._host_membership is None:
+            self._host_membership = HostMembership.from_snapshot(self)
+        return self._host_membership
+
+    @classmethod
+    def from_inventory_manager(cls, inventory_manager,
+                               inherited_variables: Optional[Dict[str, dict]] = None
+                               ) -> 'InventorySnapshot':
+        """Snapshot of the parsed inventory
+
+        :param inherited_variables: Variables of each host inherited from its groups
+                                    or vars files, they take precedence over host.vars
+        :type inherited_variables: dict
+        """
+        inherited_variables = inherited_variables or {}
+        hosts = {}
+        for name, host in inventory_manager.hosts.items():
+            # Values the host sets itself are not stored twice
+            inherited = {key: value for key, value in inherited_variables.get(name, {}).items()
+                         if host.vars.get(key) is not value}
+            hosts[name] = SnapshotHost(name, encode_vault_values(dict(host.vars)),
+                                       [group.name for group in host.get_groups()],
+                                       encode_vault_values(inherited))
+        groups = {
+            name: SnapshotGroup(name,
+                                [hosts[host.name] for host in group.hosts],
+                                [child.name for child in group.child_groups])
+            for name, group in inventory_manager.groups.items()
+        }
+        return cls(hosts, groups)
+
+    @classmethod
+    def merge(cls, snapshots: List['InventorySnapshot']) -> 'InventorySnapshot':
+        """Combine snapshots of several inventory sources, like ansible does with multiple -i
+
+        Hosts and groups are kept in the order they first appear in, variables
+        of a host from later sources take precedence.
+        """
+        if len(snapshots) == 1:
+            return snapshots[0]
+        host_vars: Dict[str, dict] = {}
+        host_groups: Dict[str, List[str]] = {}
+        host_inherited_vars: Dict[str, dict] = {}
+        for snapshot in snapshots:
+            for name, host in snapshot.hosts.items():
+                if name not in host_vars:
+                    host_vars[name] = dict(host.vars)
+                    host_groups[name] = list(host.groups)
+                    host_inherited_vars[name] = dict(host.inherited_vars)
+                    continue
+                merge_host_vars(host_vars[name], host.vars)
+                host_groups[name].extend(group for group in host.groups
+                                         if group not in host_groups[name])
+                host_inherited_vars[name].update(host.inherited_vars)
+        hosts = {name: SnapshotHost(name, variables, host_groups[name], host_inherited_vars[name])
+                 for name, variables in host_vars.items()}
+        group_hosts: Dict[str, Dict[str, SnapshotHost]] = {}
+        group_children: Dict[str, List[str]] = {}
+        for snapshot in snapshots:
+            for name, group in snapshot.groups.items():
+                merged_hosts = group_hosts.setdefault(name, {})
+                for host in group.hosts:
+                    merged_hosts.setdefault(host.name, hosts[host.name])
+                children = group_children.setdefault(name, [])
+                children.extend(child for child in group.child_groups if child not in children)
+        groups = {name: SnapshotGroup(name, list(merged_hosts.values()), group_children[name])
+                  for name, merged_hosts in group_hosts.items()}
+        return cls(hosts, groups)
+
+    @classmethod
+    def from_dict(cls, snapshot_dict: dict) -> 'InventorySnapshot':
+        # JSON decoder creates a new string for every occurrence of a value, equal
+        # host names, group names and variable values are shared between hosts instead
+        strings: Dict[str, str] = {name: name for name in snapshot_dict['hosts']}
+        hosts = {}
+        for name, host_dict in snapshot_dict['hosts'].items():
+            variables = host_dict['vars']
+            inherited_variables = host_dict.get('inherited_vars', {})
+            for host_variables in (variables, inherited_variables):
+                for key, value in host_variables.items():
+                    if isinstance(value, str):
+                        host_variables[key] = strings.setdefault(value, value)
+            hosts[name] = SnapshotHost(name, variables, [strings.setdefault(group, group)
+                                                         for group in host_dict['groups']],
+                                       inherited_variables)
+        groups = {
+            name: SnapshotGroup(name,
+                                [hosts[host_name] for host_name in group_dict['hosts']],
+                                group_dict['children'])
+            for name, group_dict in snapshot_dict['groups'].items()
+        }
+        variable_index = None
+        if 'variable_index' in snapshot_dict:
+            variable_index = VariableIndex.from_dict(snapshot_dict['variable_index'], strings)
+        return cls(hosts, groups, variable_index)
+
+    def to_dict(self) -> dict:
+        return {
+            'hosts': {
+                name: self._host_dict(host)
+                for name, host in self.hosts.items()
+            },
+            'groups': {
+                name: {'hosts': [host.name for host in group.hosts],
+                       'children': group.child_groups}
+                for name, group in self.groups.items()
+            },
+            'variable_index': self.variable_index.to_dict(),
+        }
+
+    @staticmethod
+    def _host_dict(host: SnapshotHost) -> dict:
+        host_dict = {'vars': host.vars, 'groups': list(host.groups)}
+        # Most hosts inherit no connection variables, their entries are left out
+        if host.inherited_vars:
+            host_dict['inherited_vars'] = host.inherited_vars
+        return host_dict
@@ -0,0 +1,102 @@
+from collections import OrderedDict, defaultdict, deque
+from typing import Deque, Dict, Hashable, List, Optional, Sequence, TextIO
+
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+
+DEFAULT_LAUNCH_BURST = 1
+# Seconds a connection is assumed to take to be established
+DEFAULT_LAUNCH_CONNECT_TIME = 1.0
+# Launch group of hosts connected through the same jump host
+BASTION_LAUNCH_GROUP = 'bastion'
+
+
+def launch_group(host: AnsibleHostAdapter, group_by: str) -> Optional[Hashable]:
+    """Group which connections of the host count against the per group limit
+
+    :param group_by: 'bastion' to group hosts by their jump host, otherwise a host
+                     variable, e.g. group_names groups hosts by their (first) inventory group
+    :type group_by: str
+
+    :return: Group of the host, None if the host is not limited by any group
+    """
+    if group_by == BASTION_LAUNCH_GROUP:
+        return host.connection.get_bastion()
+    value = host.get_variable(group_by)
+    # List values, like group_names, are grouped by their first item
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return None if value is None else str(value)
+
+
+def schedule_launches(groups: Sequence[Optional[Hashable]], rate: float = 0.0,
+                      burst: int = DEFAULT_LAUNCH_BURST, group_limit: int = 0,
+                      connect_time: float = DEFAULT_LAUNCH_CONNECT_TIME) -> List[float]:
+    """Plan the start of each connection, so that they are not all opened at once
+
+    Connections start at most at rate connections per second, after the first burst
+    ones which start right away. Connections of the same group start only while fewer
+    than group_limit connections of the group are being established, each of them
+    assumed to take connect_time seconds, as panes cannot tell when ssh is connected.
+    Connections which have to wait for their group let the next ones start first.
+
+    :param groups: Launch group of each connection, None for connections of no group
+    :type groups: list
+    :param rate: Connections started per second, 0 means no limit
+    :type rate: float
+    :param burst: Number of connections started at once before the rate applies
+    :type burst: int
+    :param group_limit: Connections of a group established at the same time, 0 means no limit
+    :type group_limit: int
+    :param connect_time: Seconds a connection is assumed to take to be established
+    :type connect_time: float
+
+    :return: Delay in seconds of the start of each connection
+    :rtype: list
+    """
+    pending: Dict[Optional[Hashable], Deque[int]] = OrderedDict()
+    for index, group in enumerate(groups):
+        pending.setdefault(group if group_limit else None, deque()).append(index)
+    # Starts of the last group_limit connections of each group
+    group_starts: Dict[Hashable, Deque[float]] = defaultdict(lambda: deque(maxlen=group_limit))
+
+    def group_ready(group: Optional[Hashable]) -> float:
+        if group is None or len(group_starts[group]) < group_limit:
+            return 0.0
+        return group_starts[group][0] + connect_time
+
+    delays = [0.0] * len(groups)
+    previous_delay = 0.0
+    for slot in range(len(groups)):
+        group = min(pending, key=lambda group: (group_ready(group), pending[group][0]))
+        index = pending[group].popleft()
+        if not pending[group]:
+            del pending[group]
+        rate_delay = max(slot + 1 - burst, 0) / rate if rate else 0.0
+        delays[index] = max(previous_delay, rate_delay, group_ready(group))
+        previous_delay = delays[index]
+        if group is not None:
+            group_starts[group].append(delays[index])
+    return delays
+
+
+def schedule_host_launches(hosts: List[AnsibleHostAdapter], rate: float = 0.0,
+                           burst: int = DEFAULT_LAUNCH_BURST, group_limit: int = 0,
+                           group_by: str = BASTION_LAUNCH_GROUP,
+                           connect_time: float = DEFAULT_LAUNCH_CONNECT_TIME) -> List[float]:
+    """Set the launch delay of each host's pane, see schedule_launches
+
+    :return: Launch delay of each host
+    :rtype: list
+    """
+    groups = [launch_group(host, group_by) for host in hosts] if group_limit else \
+        [None] * len(hosts)
+    delays = schedule_launches(groups, rate, burst, group_limit, connect_time)
+    for host, delay in zip(hosts, delays):
+        host.launch_delay = delay
+    return delays
+
+
+def report_launch_schedule(delays: List[float], output: TextIO) -> None:
+    delayed_count = sum(1 for delay in delays if delay > 0)
+    print("launch: {} connections over {:.1f}s, {} started right away".format(
+        len(delays), max(delays, default=0.0), len(delays) - delayed_count), file=output)
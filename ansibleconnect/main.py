@@ -1,49 +1,304 @@
 #!/usr/bin/env python
 
 import logging
-from typing import Iterable
-
-import yaml
+import sys
+import time
+from contextlib import nullcontext
+from typing import Iterable, Optional
 
 from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
-from ansibleconnect.inventoryadapter import InventoryAdapter
-from ansibleconnect.parser import parse_arguments, \
-    parse_hostnames, \
-    parse_inventory_groups, \
-    parse_vars
-from ansibleconnect.tmuxpresenter import create_tmux_script
+from ansibleconnect.commandrenderer import ConnectionCommandRenderer
+from ansibleconnect.connections import SHARED_CONTROL_PATH
+from ansibleconnect.hostselection import filter_hosts_by_variables, select_hosts, \
+    skip_unsupported_hosts
+from ansibleconnect.importprofile import ImportProfiler
+from ansibleconnect.inventoryadapter import InventoryAdapter, \
+    InventorySourceError, \
+    report_source_results
+from ansibleconnect.launchscheduler import report_launch_schedule, schedule_host_launches
+from ansibleconnect.parser import WINDOW_DOWN_HOSTS, parse_arguments
+from ansibleconnect.sshproxy import plan_bastion_connections, report_bastion_plan
+from ansibleconnect.timings import StageTimings, write_profile
+from ansibleconnect.tmuxlayout import check_terminal_fits_panes, get_terminal_size
+from ansibleconnect.tmuxpresenter import create_tmux_control_commands, \
+    create_tmux_script, \
+    create_tmux_source_file_script, \
+    host_pane_commands, \
+    shard_hosts, \
+    tmux_session_or_window_name
+from ansibleconnect.vault import VaultDecryptor, VaultError
 
 logger = logging.getLogger(__name__)
 
 
 def load_inventory_file(inventory_path: str) -> Iterable:
+    import yaml
+
     with open(inventory_path) as inventory_file:
         inventory_data = yaml.safe_load(inventory_file)
     return inventory_data
 
 
+def report_failed_tmux_commands(results, hosts_adapters):
+    host_names_by_command = {command: host.host_name for host in hosts_adapters
+                             for command in host_pane_commands(host, export_auth_socket=False)}
+    for result in results:
+        if result.failed:
+            failed_target = host_names_by_command.get(result.command, result.command)
+            print("tmux command for {} failed: {}".format(failed_target, ' '.join(result.output)),
+                  file=sys.stderr)
+
+
+def share_bastion_connections(hosts_adapters, concurrency: int, timeout: int):
+    from ansibleconnect.prewarm import control_persist_for_launches, \
+        prewarm_bastions, \
+        report_prewarm_results
+
+    bastion_plan = plan_bastion_connections(hosts_adapters)
+    report_bastion_plan(bastion_plan, sys.stderr)
+    # Master connections are started up front, otherwise panes starting at the same
+    # time would not find one another's master connection and each would open its own
+    start = time.perf_counter()
+    results = prewarm_bastions(list(bastion_plan.bastion_hosts), SHARED_CONTROL_PATH,
+                               concurrency, timeout, control_persist_for_launches(hosts_adapters))
+    report_prewarm_results(results, time.perf_counter() - start, sys.stderr, label='bastions')
+
+
 def main():
     args = parse_arguments()
-    inventory = InventoryAdapter(args.inventory)
-    hostnames = parse_hostnames(args.hosts)
-    groups, no_groups = parse_inventory_groups(args.groups)
-    if hostnames:
-        hosts_list = inventory.get_hosts_by_names(hostnames)
-    else:
-        hosts_list = inventory.get_hosts_by_group(groups, no_groups)
+    if args.daemon:
+        from ansibleconnect.daemon import DaemonError, serve
+
+        try:
+            serve(args.daemon_socket, args.daemon_poll_interval)
+        except DaemonError as error:
+            print(error, file=sys.stderr)
+            exit(1)
+        return
+    if args.stream:
+        from ansibleconnect.streaming import stream_connect
+
+        stream_connect(args)
+        return
+    with write_profile(args.profile) if args.profile else nullcontext():
+        if args.client:
+            from ansibleconnect.daemon import DaemonError, run_client
+
+            try:
+                exit(run_client(sys.argv[1:], args.daemon_socket))
+            except DaemonError as error:
+                print("{}, running without it".format(error), file=sys.stderr)
+        if not args.import_profile:
+            connect(args)
+            return
+        import_profiler = ImportProfiler()
+        import_profiler.start()
+        try:
+            connect(args)
+        finally:
+            import_profiler.stop()
+            import_profiler.report(sys.stderr)
+
+
+def load_inventory(args) -> InventoryAdapter:
+    try:
+        inventory = InventoryAdapter(args.inventory,
+                                     use_cache=not args.no_cache,
+                                     refresh_cache=args.refresh_cache,
+                                     source_timeout=args.source_timeout)
+    except InventorySourceError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+    if len(args.inventory) > 1:
+        report_source_results(inventory.source_results, sys.stderr)
+    return inventory
+
+
+def connect(args, inventory: Optional[InventoryAdapter] = None,
+            timings: Optional[StageTimings] = None):
+    """Select hosts and print the tmux script connecting with them
+
+    :param args: Parsed command line arguments
+    :param inventory: Already loaded inventory, loaded from args.inventory if None
+    :type inventory: InventoryAdapter
+    :param timings: Timings of the stages run before, e.g. of loading the inventory
+    :type timings: StageTimings
+    """
+    if timings is None:
+        timings = StageTimings(measure_imports=args.timings)
+    try:
+        connect_stages(args, inventory, timings)
+    except VaultError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+    finally:
+        # Timings are reported also when the run stops early, e.g. when no host matched
+        if args.timings:
+            timings.report(sys.stderr)
+
+
+def connect_stages(args, inventory: Optional[InventoryAdapter], timings: StageTimings):
+    if inventory is None:
+        with timings.stage('inventory_load') as stage:
+            inventory = load_inventory(args)
+            stage.hosts_count = inventory.hosts_count
+    with timings.stage('host_selection') as stage:
+        hosts_list = select_hosts(args, inventory)
+        stage.hosts_count = len(hosts_list)
+    if args.variables or args.no_variables:
+        with timings.stage('variables_filter') as stage:
+            hosts_list = filter_hosts_by_variables(args, inventory, hosts_list)
+            stage.hosts_count = len(hosts_list)
+    hosts_list = skip_unsupported_hosts(hosts_list, sys.stderr)
     if not hosts_list:
         print("echo 'No hosts matched given criteria'")
         exit(1)
-    variables = parse_vars(args.variables)
-    no_variables = parse_vars(args.no_variables)
-    if variables or no_variables:
-        hosts_list = inventory.get_hosts_by_variables(hosts_list,
-                                                      variables,
-                                                      no_variables)
-    hosts_adapters = [AnsibleHostAdapter(host) for host in hosts_list]
-    tmux_script = create_tmux_script(hosts_adapters, args.windows)
+    # Panes have to use the same ControlPath as the pre-warmed master connections
+    default_variables = {'control_path': SHARED_CONTROL_PATH} if args.prewarm else None
+    # Hosts with the same connection variables share one template of the connection command
+    renderer = ConnectionCommandRenderer()
+    # Vault values read by the connection commands are decrypted once for all the hosts
+    decryptor = VaultDecryptor(args.vault_id, args.vault_password_file)
+    with timings.stage('host_adapters', len(hosts_list)):
+        hosts_adapters = [AnsibleHostAdapter(host, default_variables, args.share_bastions,
+                                             renderer, decryptor)
+                          for host in hosts_list]
+    down_hosts = []
+    if args.probe:
+        with timings.stage('probe') as stage:
+            # asyncio takes a noticeable part of the start up time,
+            # so it is imported only when needed
+            from ansibleconnect.reachability import probe_hosts, report_probe_results
+
+            probe_start = time.perf_counter()
+            probe_results = probe_hosts(hosts_adapters, args.probe_concurrency,
+                                        args.probe_timeout)
+            report_probe_results(probe_results, time.perf_counter() - probe_start, sys.stderr)
+            hosts_adapters = [result.host for result in probe_results if not result.is_down]
+            stage.hosts_count = len(hosts_adapters)
+        if args.down_hosts == WINDOW_DOWN_HOSTS:
+            down_hosts = [result.host for result in probe_results if result.is_down]
+            if not hosts_adapters:
+                hosts_adapters, down_hosts = down_hosts, []
+        if not hosts_adapters:
+            print("echo 'No reachable hosts matched given criteria'")
+            exit(1)
+    if args.exec is None and (args.launch_rate or args.launch_group_limit):
+        with timings.stage('launch_schedule', len(hosts_adapters) + len(down_hosts)):
+            # Panes wait before connecting, so that a large fleet is not connected to at once.
+            # Launches are planned before master connections are started, which have to
+            # stay open until the last pane connects
+            launch_delays = schedule_host_launches(
+                hosts_adapters + down_hosts, args.launch_rate, args.launch_burst,
+                args.launch_group_limit, args.launch_group_by, args.launch_connect_time)
+            report_launch_schedule(launch_delays, sys.stderr)
+    if args.share_bastions:
+        with timings.stage('share_bastions', len(hosts_adapters)):
+            share_bastion_connections(hosts_adapters, args.prewarm_concurrency,
+                                      args.prewarm_timeout)
+    if args.prewarm:
+        with timings.stage('prewarm', len(hosts_adapters)):
+            from ansibleconnect.prewarm import control_persist_for_launches, \
+                prewarm_hosts, \
+                report_prewarm_results
+
+            prewarm_start = time.perf_counter()
+            prewarm_results = prewarm_hosts(hosts_adapters, args.prewarm_concurrency,
+                                            args.prewarm_timeout,
+                                            control_persist_for_launches(hosts_adapters))
+            report_prewarm_results(prewarm_results, time.perf_counter() - prewarm_start,
+                                   sys.stderr)
+    if args.exec is not None:
+        with timings.stage('exec', len(hosts_adapters)):
+            from ansibleconnect.fanout import exec_on_hosts, report_exec_results
+
+            exec_start = time.perf_counter()
+            exec_results = exec_on_hosts(hosts_adapters, args.exec, args.exec_concurrency,
+                                         args.exec_timeout, sys.stdout)
+            report_exec_results(exec_results, time.perf_counter() - exec_start, sys.stderr)
+        if not all(result.succeeded for result in exec_results):
+            exit(1)
+        return
+    tmux_script = None
+    if args.update is not None:
+        with timings.stage('session_update', len(hosts_adapters) + len(down_hosts)):
+            tmux_script = update_session(args, hosts_adapters + down_hosts)
+    if tmux_script is None:
+        with timings.stage('tmux_script', len(hosts_adapters) + len(down_hosts)):
+            tmux_script = create_script(args, hosts_adapters, down_hosts)
+    if args.timings:
+        renderer.report(sys.stderr)
+        decryptor.report(sys.stderr)
     print(tmux_script)
 
 
+def update_session(args, hosts_adapters) -> Optional[str]:
+    """Update panes of the existing ansibleconnect session to the selected hosts
+
+    :return: Command attaching to the updated session, None if there is no session
+    :rtype: str
+    """
+    from ansibleconnect.tmuxupdate import TmuxSessionError, \
+        apply_session_update, \
+        find_session_panes, \
+        list_panes, \
+        plan_session_update, \
+        report_session_update
+    from ansibleconnect.tmuxcontrol import attach_command
+
+    try:
+        session_panes = find_session_panes(list_panes(), args.update or None)
+        if not session_panes:
+            if args.update:
+                print("echo 'tmux session {} not found'".format(args.update))
+                exit(1)
+            return None
+        update = plan_session_update(session_panes, hosts_adapters, args.windows,
+                                     args.max_panes_per_window)
+        apply_session_update(update)
+    except TmuxSessionError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+    report_session_update(update, sys.stderr)
+    return attach_command(update.session_name)
+
+
+def create_script(args, hosts_adapters, down_hosts) -> str:
+    if not args.windows or down_hosts:
+        panes_counts = [len(down_hosts)]
+        if not args.windows:
+            panes_counts.extend(len(window_hosts) for _, window_hosts in
+                                shard_hosts(hosts_adapters, args.max_panes_per_window,
+                                            args.group_by))
+        terminal_size_error = check_terminal_fits_panes(max(panes_counts))
+        if terminal_size_error:
+            print("echo '{}'".format(terminal_size_error))
+            exit(1)
+    if args.control_mode:
+        # tmux control mode client, and subprocess with it, is imported only when used
+        from ansibleconnect.tmuxcontrol import TmuxControlError, attach_command, \
+            run_in_new_session
+
+        session_name = tmux_session_or_window_name()
+        try:
+            results = run_in_new_session(
+                session_name,
+                create_tmux_control_commands(hosts_adapters, args.windows,
+                                             args.max_panes_per_window, args.group_by,
+                                             down_hosts),
+                get_terminal_size() or (80, 24))
+        except TmuxControlError as error:
+            print("echo '{}'".format(error))
+            exit(1)
+        report_failed_tmux_commands(results, hosts_adapters + down_hosts)
+        return attach_command(session_name)
+    if args.source_file:
+        return create_tmux_source_file_script(hosts_adapters, args.windows,
+                                              args.max_panes_per_window, args.group_by,
+                                              down_hosts)
+    return create_tmux_script(hosts_adapters, args.windows,
+                              args.max_panes_per_window, args.group_by, down_hosts)
+
+
 if __name__ == "__main__":
     main()
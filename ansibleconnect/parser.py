@@ -1,20 +1,41 @@
 import argparse
-from typing import List, Tuple, no_type_check
+from typing import List, Optional, no_type_check
 
+from ansibleconnect.launchscheduler import BASTION_LAUNCH_GROUP, DEFAULT_LAUNCH_BURST, \
+    DEFAULT_LAUNCH_CONNECT_TIME
 
-def parse_arguments():
+DEFAULT_PROBE_CONCURRENCY = 100
+DEFAULT_PROBE_TIMEOUT = 3.0
+DEFAULT_PREWARM_CONCURRENCY = 20
+DEFAULT_PREWARM_TIMEOUT = 10
+DEFAULT_EXEC_CONCURRENCY = 20
+DEFAULT_DAEMON_POLL_INTERVAL = 2.0
+DROP_DOWN_HOSTS = 'drop'
+WINDOW_DOWN_HOSTS = 'window'
+
+
+def parse_arguments(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '-i',
         '--inventory',
-        required=True,
-        help='Path to the ansible inventory file'
+        action='append',
+        help='Path to the ansible inventory file, can be given multiple times. '
+             'Sources which are not cached are loaded concurrently'
+    )
+    parser.add_argument(
+        '--source-timeout',
+        type=float,
+        default=None,
+        help="Seconds to wait for each inventory source. Source which does not load in time "
+             "falls back to its last cached inventory and is refreshed in the background"
     )
     parser.add_argument(
         '-g',
         '--groups',
         default=None,
-        help="Groups to connect with. Example: -g 'computes:!storage'"
+        help="Ansible host pattern of groups and hosts to connect with. "
+             "Example: -g 'computes:&rack1:!storage:web[0:9]:~db[0-9]+'"
     )
     parser.add_argument(
         '--hosts',
@@ -41,7 +62,239 @@ def parse_arguments():
         const=True,
         help="If present, then the output tmux command will create new window for each host session instead of a new pane"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '--max-panes-per-window',
+        type=int,
+        default=0,
+        help="Split hosts evenly into windows with at most this number of panes each"
+    )
+    parser.add_argument(
+        '--group-by',
+        default=None,
+        help="Host variable by which value hosts are grouped into separate windows. "
+             "Example: --group-by group_names groups hosts by their inventory group"
+    )
+    parser.add_argument(
+        '--source-file',
+        action='store_true',
+        help="Write tmux commands to a temporary file loaded with tmux source-file "
+             "instead of printing them as one long command line"
+    )
+    parser.add_argument(
+        '--control-mode',
+        action='store_true',
+        help="Create the tmux session directly through a tmux control mode client "
+             "and print only the command attaching to it"
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Open panes of the hosts of each inventory source as soon as it is loaded, "
+             "through a tmux control mode client, instead of waiting for all the sources"
+    )
+    parser.add_argument(
+        '--probe',
+        action='store_true',
+        help="Check that hosts accept TCP connections on their ssh port before opening panes"
+    )
+    parser.add_argument(
+        '--probe-timeout',
+        type=float,
+        default=DEFAULT_PROBE_TIMEOUT,
+        help="Seconds after which a host is considered unreachable by the probe"
+    )
+    parser.add_argument(
+        '--probe-concurrency',
+        type=int,
+        default=DEFAULT_PROBE_CONCURRENCY,
+        help="Maximum number of hosts probed at the same time"
+    )
+    parser.add_argument(
+        '--down-hosts',
+        choices=[DROP_DOWN_HOSTS, WINDOW_DOWN_HOSTS],
+        default=DROP_DOWN_HOSTS,
+        help="What to do with hosts unreachable by the probe: drop them "
+             "or open them in a separate 'down' window"
+    )
+    parser.add_argument(
+        '--prewarm',
+        action='store_true',
+        help="Establish ssh master connections to the hosts in parallel before opening panes, "
+             "so that panes reuse them through a shared ControlPath"
+    )
+    parser.add_argument(
+        '--prewarm-concurrency',
+        type=int,
+        default=DEFAULT_PREWARM_CONCURRENCY,
+        help="Maximum number of master connections established at the same time"
+    )
+    parser.add_argument(
+        '--prewarm-timeout',
+        type=int,
+        default=DEFAULT_PREWARM_TIMEOUT,
+        help="Seconds after which establishing a master connection fails"
+    )
+    parser.add_argument(
+        '--share-bastions',
+        action='store_true',
+        help="Connect to hosts behind the same jump host through one shared, "
+             "multiplexed connection to it"
+    )
+    parser.add_argument(
+        '--launch-rate',
+        type=float,
+        default=0.0,
+        help="Maximum number of connections started per second, panes of the other hosts "
+             "wait for their turn before connecting. Default: all connections start at once"
+    )
+    parser.add_argument(
+        '--launch-burst',
+        type=int,
+        default=DEFAULT_LAUNCH_BURST,
+        help="Number of connections started right away, before --launch-rate applies"
+    )
+    parser.add_argument(
+        '--launch-group-limit',
+        type=int,
+        default=0,
+        help="Maximum number of connections of the same group (see --launch-group-by) "
+             "being established at the same time"
+    )
+    parser.add_argument(
+        '--launch-group-by',
+        default=BASTION_LAUNCH_GROUP,
+        help="Group which --launch-group-limit applies to: 'bastion' for hosts connecting "
+             "through the same jump host (default), or a host variable, e.g. group_names"
+    )
+    parser.add_argument(
+        '--launch-connect-time',
+        type=float,
+        default=DEFAULT_LAUNCH_CONNECT_TIME,
+        help="Seconds a connection is assumed to take to be established, "
+             "for --launch-group-limit"
+    )
+    parser.add_argument(
+        '--update',
+        nargs='?',
+        const='',
+        default=None,
+        metavar='SESSION',
+        help="Update panes of the tmux session opened by ansibleconnect before (the current "
+             "or the latest one, unless SESSION is given): open new hosts, close removed ones "
+             "and reconnect ended connections. A new session is created if there is none"
+    )
+    parser.add_argument(
+        '--exec',
+        default=None,
+        metavar='CMD',
+        help="Run the shell command CMD on the hosts over ssh in parallel and print their "
+             "output prefixed with host names, instead of opening a tmux session"
+    )
+    parser.add_argument(
+        '--exec-concurrency',
+        type=int,
+        default=DEFAULT_EXEC_CONCURRENCY,
+        help="Maximum number of hosts which the --exec command runs on at the same time"
+    )
+    parser.add_argument(
+        '--exec-timeout',
+        type=float,
+        default=None,
+        help="Seconds after which the --exec command is killed on a host. Default: no limit"
+    )
+    parser.add_argument(
+        '--vault-password-file',
+        action='append',
+        default=[],
+        help="File with the vault password, or a script printing it, for decrypting vault "
+             "encrypted connection variables, e.g. ansible_password. Can be given multiple times"
+    )
+    parser.add_argument(
+        '--vault-id',
+        action='append',
+        default=[],
+        help="Vault identity to use, as in ansible, e.g. dev@~/.vault_pass. "
+             "Can be given multiple times"
+    )
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help="Parse the inventory even if it is cached and store the result in the cache"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Parse the inventory without reading or writing the inventory cache"
+    )
+    parser.add_argument(
+        '--import-profile',
+        action='store_true',
+        help="Print import time of each module imported during the run to stderr"
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help="Print duration and number of hosts of each stage of the run to stderr"
+    )
+    parser.add_argument(
+        '--profile',
+        default=None,
+        metavar='FILE',
+        help="Profile the run with cProfile and write the stats to FILE, "
+             "readable with python -m pstats FILE"
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help="Run in the foreground as a daemon keeping inventories loaded and serving "
+             "--client runs over a Unix socket"
+    )
+    parser.add_argument(
+        '--client',
+        action='store_true',
+        help="Let the running daemon select hosts and create the tmux script, "
+             "run without the daemon if it is not running"
+    )
+    parser.add_argument(
+        '--daemon-socket',
+        default=None,
+        help="Path of the daemon's Unix socket. "
+             "Default: $XDG_RUNTIME_DIR/ansibleconnect.sock"
+    )
+    parser.add_argument(
+        '--daemon-poll-interval',
+        type=float,
+        default=DEFAULT_DAEMON_POLL_INTERVAL,
+        help="Seconds between the daemon's checks of inventory files for changes"
+    )
+    args = parser.parse_args(argv)
+    if not args.inventory and not args.daemon:
+        parser.error('the following arguments are required: -i/--inventory')
+    if args.stream:
+        unsupported_flags = [flag for flag, value in (
+            ('--windows', args.windows), ('--group-by', args.group_by),
+            ('--source-file', args.source_file), ('--control-mode', args.control_mode),
+            ('--probe', args.probe), ('--prewarm', args.prewarm),
+            ('--share-bastions', args.share_bastions), ('--launch-rate', args.launch_rate),
+            ('--launch-group-limit', args.launch_group_limit), ('--client', args.client)) if value]
+        if unsupported_flags:
+            parser.error('--stream cannot be used with {}'.format(', '.join(unsupported_flags)))
+    if args.update is not None:
+        unsupported_flags = [flag for flag, value in (
+            ('--group-by', args.group_by), ('--source-file', args.source_file),
+            ('--control-mode', args.control_mode), ('--stream', args.stream),
+            ('--exec', args.exec is not None), ('--client', args.client)) if value]
+        if unsupported_flags:
+            parser.error('--update cannot be used with {}'.format(', '.join(unsupported_flags)))
+    if args.exec is not None:
+        unsupported_flags = [flag for flag, value in (
+            ('--windows', args.windows), ('--group-by', args.group_by),
+            ('--source-file', args.source_file), ('--control-mode', args.control_mode),
+            ('--stream', args.stream), ('--launch-rate', args.launch_rate),
+            ('--launch-group-limit', args.launch_group_limit), ('--client', args.client)) if value]
+        if unsupported_flags:
+            parser.error('--exec cannot be used with {}'.format(', '.join(unsupported_flags)))
+    return args
 
 
 def parse_hostnames(hosts: str) -> List[str]:
@@ -56,32 +309,6 @@ def parse_hostnames(hosts: str) -> List[str]:
     return hosts.split(',') if hosts else []
 
 
-def parse_inventory_groups(args_groups: str) -> Tuple[List[str], List[str]]:
-    """Parse list of inventory groups passed via CLI
-    Groups with indices like: 3, [3:], [:3] should be parsed into slices
-    that later can be utilizes as list indices on inventory parsing
-
-    :param args_groups: List of strings with groups
-    :type args_groups: list
-
-    :return: Two lists of:
-                * groups that should be selected
-                * groups that should be ommited
-    :rtype: list
-    """
-    if not args_groups:
-        return [], []
-    provided_groups = args_groups.split(':')
-    groups = []
-    no_groups = []
-    for group in provided_groups:
-        if group.startswith('!'):
-            no_groups.append(group[1:])
-        else:
-            groups.append(group)
-    return groups, no_groups
-
-
 @no_type_check
 def parse_vars(variables):
     """Parse variables passed as args to list of tuples
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import os
+import time
+from typing import Iterable, List, Optional, TextIO, Tuple
+
+from ansibleconnect.sshproxy import DEFAULT_CONTROL_PERSIST
+
+# ssh keeps waiting for the connection a bit longer than its own ConnectTimeout
+PREWARM_TIMEOUT_MARGIN = 2
+
+
+class PrewarmResult:
+    def __init__(self, name: str, succeeded: bool, elapsed: float, error: Optional[str] = None):
+        self.name = name
+        self.succeeded = succeeded
+        self.elapsed = elapsed
+        self.error = error
+
+
+async def _start_master_connection(name: str, command: str, timeout: int,
+                                   semaphore: asyncio.Semaphore) -> PrewarmResult:
+    async with semaphore:
+        start = time.perf_counter()
+        # ssh -f forks the master connection once authenticated, its output is not
+        # captured, as pipes inherited by the master would stay open until it exits
+        process = await asyncio.create_subprocess_shell(
+            command, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL)
+        try:
+            return_code = await asyncio.wait_for(process.wait(),
+                                                 timeout + PREWARM_TIMEOUT_MARGIN)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return PrewarmResult(name, False, time.perf_counter() - start, 'timed out')
+        elapsed = time.perf_counter() - start
+        if return_code != 0:
+            return PrewarmResult(name, False, elapsed,
+                                 'ssh exited with status {}'.format(return_code))
+        return PrewarmResult(name, True, elapsed)
+
+
+async def _start_master_connections(commands: List[Tuple[str, str]], concurrency: int,
+                                    timeout: int) -> List[PrewarmResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(*(
+        _start_master_connection(name, command, timeout, semaphore)
+        for name, command in commands)))
+
+
+def start_master_connections(commands: List[Tuple[str, str]], control_paths: Iterable[str],
+                             concurrency: int, timeout: int) -> List[PrewarmResult]:
+    """Run ssh commands starting background master connections in parallel
+
+    :param commands: List of (name, ssh command) tuples
+    :type commands: list
+    :param control_paths: ControlPaths of the connections, their directories are created
+    :type control_paths: iterable
+    :param concurrency: Maximum number of connections established at the same time
+    :type concurrency: int
+    :param timeout: Seconds after which establishing a connection fails
+    :type timeout: int
+
+    :return: Results of the master connections, in the order of commands
+    :rtype: list
+    """
+    if not commands:
+        return []
+    for control_path_dir in {os.path.dirname(os.path.expanduser(control_path))
+                             for control_path in control_paths}:
+        os.makedirs(control_path_dir, mode=0o700, exist_ok=True)
+    return asyncio.run(_start_master_connections(commands, max(concurrency, 1), timeout))
+
+
+def control_persist_for_launches(hosts: list) -> Optional[int]:
+    """ControlPersist keeping master connections open until the last pane connects
+
+    Panes with a launch delay connect to the hosts only after it, the master
+    connections have to outlive the longest delay, otherwise panes started
+    last find them closed and do a full handshake each.
+
+    :param hosts: Host adapters with their launch delays scheduled
+    :type hosts: list
+
+    :return: Seconds master connections stay open without clients, None if no pane waits
+    :rtype: int
+    """
+    longest_delay = max((host.launch_delay for host in hosts), default=0.0)
+    if longest_delay <= 0:
+        return None
+    return DEFAULT_CONTROL_PERSIST + math.ceil(longest_delay)
+
+
+def prewarm_hosts(hosts: list, concurrency: int, timeout: int,
+                  control_persist: Optional[int] = None) -> List[PrewarmResult]:
+    """Start ssh multiplexing master connections to the hosts in parallel
+
+    Panes connecting to the hosts afterwards reuse the authenticated master
+    connections through the shared ControlPath, instead of each of them doing
+    a full handshake, possibly through the same jump host, at the same time.
+
+    :param hosts: Host adapters which connection commands use a ControlPath
+    :type hosts: list
+    :param concurrency: Maximum number of connections established at the same time
+    :type concurrency: int
+    :param timeout: Seconds after which establishing a connection fails
+    :type timeout: int
+    :param control_persist: Seconds the connections stay open without clients,
+                            see control_persist_for_launches
+    :type control_persist: int
+
+    :return: Results of the master connections, in the order of hosts
+    :rtype: list
+    """
+    connections = [(host.host_name, host.connection) for host in hosts]
+    return start_master_connections(
+        [(name, connection.master_connection_command(timeout, control_persist))
+         for name, connection in connections],
+        [connection.control_path for _, connection in connections if connection.control_path],
+        concurrency, timeout)
+
+
+def prewarm_bastions(bastions: list, control_path: str, concurrency: int,
+                     timeout: int, control_persist: Optional[int] = None) -> List[PrewarmResult]:
+    """Start one shared master connection to each of the bastions in parallel
+
+    :param bastions: Bastions which proxy commands of the hosts go through
+    :type bastions: list
+    :param control_path: ControlPath of the bastion connections, escaped for ProxyCommand
+    :type control_path: str
+    :param control_persist: Seconds the connections stay open without clients
+    :type control_persist: int
+    """
+    return start_master_connections(
+        [(repr(bastion), bastion.master_connection_command(control_path, timeout,
+                                                           control_persist))
+         for bastion in bastions],
+        [control_path], concurrency, timeout)
+
+
+def report_prewarm_results(results: List[PrewarmResult], elapsed: float, output: TextIO,
+                           label: str = 'prewarm') -> None:
+    for result in results:
+        if not result.succeeded:
+            print("{}: {} failed ({:.0f} ms): {}".format(
+                label, result.name, result.elapsed * 1000, result.error), file=output)
+    succeeded_count = sum(result.succeeded for result in results)
+    print("{}: {} of {} master connections established in {:.0f} ms".format(
+        label, succeeded_count, len(results), elapsed * 1000), file=output)
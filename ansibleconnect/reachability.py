@@ -0,0 +1,90 @@
+import asyncio
+import socket
+import time
+from typing import List, Optional, TextIO
+
+REACHABLE = 'reachable'
+UNREACHABLE = 'unreachable'
+SKIPPED = 'skipped'
+
+
+class ProbeResult:
+    def __init__(self, host, status: str, elapsed: float = 0.0, error: Optional[str] = None):
+        self.host = host
+        self.status = status
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def is_down(self) -> bool:
+        return self.status == UNREACHABLE
+
+
+async def _probe_host(host, timeout: float, semaphore: asyncio.Semaphore) -> ProbeResult:
+    connection = host.connection
+    if connection.uses_proxy():
+        return ProbeResult(host, SKIPPED, error='connects through a proxy')
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(*connection.get_address()), timeout)
+        except socket.gaierror as error:
+            # Name can be an alias known only to ~/.ssh/config
+            return ProbeResult(host, SKIPPED, time.perf_counter() - start, str(error))
+        except asyncio.TimeoutError:
+            return ProbeResult(host, UNREACHABLE, time.perf_counter() - start, 'timed out')
+        except OSError as error:
+            return ProbeResult(host, UNREACHABLE, time.perf_counter() - start,
+                               error.strerror or str(error))
+        elapsed = time.perf_counter() - start
+        writer.close()
+        # Socket is released before the next probe takes the slot
+        try:
+            await writer.wait_closed()
+        except OSError:
+            # Host accepted the connection, even if it reset it right after
+            pass
+        return ProbeResult(host, REACHABLE, elapsed)
+
+
+async def _probe_hosts(hosts: list, concurrency: int, timeout: float) -> List[ProbeResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(*(_probe_host(host, timeout, semaphore)
+                                       for host in hosts)))
+
+
+def probe_hosts(hosts: list, concurrency: int, timeout: float) -> List[ProbeResult]:
+    """Check concurrently which hosts accept TCP connections on their ssh port
+
+    Hosts connected through a jump host, or which name cannot be resolved
+    (it can be an alias from ~/.ssh/config), are skipped and treated as up.
+
+    :param hosts: Host adapters to probe
+    :type hosts: list
+    :param concurrency: Maximum number of connections opened at the same time
+    :type concurrency: int
+    :param timeout: Seconds after which a connection attempt fails
+    :type timeout: float
+
+    :return: Probe results, in the order of hosts
+    :rtype: list
+    """
+    if not hosts:
+        return []
+    return asyncio.run(_probe_hosts(hosts, max(concurrency, 1), timeout))
+
+
+def report_probe_results(results: List[ProbeResult], elapsed: float, output: TextIO) -> None:
+    counts = {status: 0 for status in (REACHABLE, UNREACHABLE, SKIPPED)}
+    for result in results:
+        counts[result.status] += 1
+        if result.status != REACHABLE:
+            print("probe: {} {} ({:.0f} ms): {}".format(
+                result.host.host_name, result.status, result.elapsed * 1000, result.error),
+                file=output)
+    probe_times = sorted(result.elapsed for result in results if result.status == REACHABLE)
+    slowest = ", slowest {:.0f} ms".format(probe_times[-1] * 1000) if probe_times else ""
+    print("probe: {} reachable, {} unreachable, {} skipped in {:.0f} ms{}".format(
+        counts[REACHABLE], counts[UNREACHABLE], counts[SKIPPED], elapsed * 1000, slowest),
+        file=output)
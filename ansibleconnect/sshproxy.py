@@ -0,0 +1,282 @@
+import io
+import os
+import re
+import shlex
+from collections import OrderedDict
+from typing import Dict, List, Optional, TextIO, Tuple
+
+# Options of the ssh client which take an argument, from ssh(1)
+SSH_OPTIONS_WITH_ARGUMENT = 'BbcDEeFIiJLlmOoPpQRSWw'
+# Multiplexing options of the bastion connection are replaced by the shared ones
+MULTIPLEXING_OPTIONS = ('controlmaster', 'controlpath', 'controlpersist')
+# Seconds master connections stay open after their last client exits
+DEFAULT_CONTROL_PERSIST = 60
+PROXY_COMMAND = 'proxycommand'
+PROXY_JUMP = 'proxyjump'
+PROXY_OPTION_RE = re.compile(r'^(ProxyCommand|ProxyJump)\s*[=\s]\s*(.*)$',
+                             re.IGNORECASE | re.DOTALL)
+JUMP_HOST_RE = re.compile(r'^(?:ssh://)?(?:([^@]+)@)?([^:@]+)(?::([0-9]+))?$')
+UNSAFE_CHARACTERS_RE = re.compile(r'[\s"\'\\]')
+
+
+class SSHToken:
+    """Shell word of ssh options, with its position in the options string"""
+
+    def __init__(self, value: str, start: int, end: int):
+        self.value = value
+        self.start = start
+        self.end = end
+
+
+def split_with_positions(command: str) -> List[SSHToken]:
+    tokens: List[SSHToken] = []
+    stream = io.StringIO(command)
+    lexer = shlex.shlex(stream, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    while True:
+        # Position of the token is known only after it is read, its start
+        # is found by skipping whitespace after the previous token
+        start = stream.tell()
+        while start < len(command) and command[start].isspace():
+            start += 1
+        value = lexer.get_token()
+        if value is None:
+            return tokens
+        # Lexer stops after the whitespace which ends the token
+        end = stream.tell()
+        while end > start and command[end - 1].isspace():
+            end -= 1
+        tokens.append(SSHToken(value, start, end))
+
+
+class ProxyOption:
+    """ProxyCommand or ProxyJump option found in ssh options
+
+    :param kind: proxycommand or proxyjump
+    :param value: Command or jump host specification
+    :param start: Index of the first character of the option in the options string
+    :param end: Index after the last character of the option in the options string
+    """
+
+    def __init__(self, kind: str, value: str, start: int, end: int):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+
+def find_proxy_option(ssh_options: str) -> Optional[ProxyOption]:
+    """First ProxyCommand/ProxyJump option, like ssh, which uses the first obtained value"""
+    try:
+        tokens = split_with_positions(ssh_options)
+    except ValueError:
+        return None
+    for index, token in enumerate(tokens):
+        if token.value in ('-o', '-J'):
+            if index + 1 == len(tokens):
+                return None
+            next_token = tokens[index + 1]
+            if token.value == '-J':
+                return ProxyOption(PROXY_JUMP, next_token.value, token.start, next_token.end)
+            option, end = next_token.value, next_token.end
+        elif token.value.startswith('-J'):
+            return ProxyOption(PROXY_JUMP, token.value[2:], token.start, token.end)
+        elif token.value.startswith('-o'):
+            option, end = token.value[2:], token.end
+        else:
+            continue
+        option_match = PROXY_OPTION_RE.match(option)
+        if option_match:
+            return ProxyOption(option_match.group(1).lower(), option_match.group(2).strip(),
+                               token.start, end)
+    return None
+
+
+class Bastion:
+    """Jump host which connections to the target hosts go through"""
+
+    def __init__(self, host: str, user: Optional[str] = None, port: Optional[str] = None,
+                 executable: str = 'ssh', options: Tuple[str, ...] = ()):
+        self.host = host
+        self.user = user
+        self.port = port
+        self.executable = executable
+        self.options = options
+
+    @property
+    def key(self) -> tuple:
+        return self.executable, self.user, self.host, self.port, self.options
+
+    @property
+    def destination(self) -> str:
+        return '{}@{}'.format(self.user, self.host) if self.user else self.host
+
+    def __eq__(self, other):
+        return isinstance(other, Bastion) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return self.destination if not self.port else '{}:{}'.format(self.destination, self.port)
+
+    def _ssh_command(self, control_path: str, extra_options: List[str],
+                     control_persist: int = DEFAULT_CONTROL_PERSIST) -> str:
+        words = [self.executable] + list(self.options)
+        words += ['-o', 'ControlMaster=auto', '-o', 'ControlPersist={}s'.format(control_persist),
+                  '-o', 'ControlPath={}'.format(control_path)]
+        if self.port:
+            words += ['-p', self.port]
+        return ' '.join(words + extra_options + [self.destination])
+
+    def proxy_command(self, control_path: str) -> str:
+        """ProxyCommand reusing the multiplexed master connection to the bastion
+
+        :param control_path: ControlPath of the bastion connection, escaped for
+                             ProxyCommand, e.g. %%C for the hash of the bastion
+        """
+        return self._ssh_command(control_path, ['-W', '%h:%p'])
+
+    def master_connection_command(self, control_path: str, timeout: int,
+                                  control_persist: Optional[int] = None) -> str:
+        """Command starting the background master connection to the bastion
+
+        :param control_persist: Seconds the connection stays open without clients,
+                                DEFAULT_CONTROL_PERSIST if None
+        :type control_persist: int
+        """
+        # Outside of ProxyCommand %% is not an escape sequence anymore
+        return self._ssh_command(control_path.replace('%%', '%'), [
+            '-o', 'ConnectTimeout={}'.format(timeout), '-o', 'BatchMode=yes', '-f', '-N'],
+            DEFAULT_CONTROL_PERSIST if control_persist is None else control_persist)
+
+
+def _parse_jump_host(jump_host: str) -> Optional[Bastion]:
+    # Multiple jump hosts are separated with commas and are not shared
+    jump_host_match = JUMP_HOST_RE.match(jump_host)
+    if not jump_host_match or ',' in jump_host or jump_host.lower() == 'none':
+        return None
+    user, host, port = jump_host_match.groups()
+    return Bastion(host, user, port)
+
+
+def _parse_proxy_command(proxy_command: str) -> Optional[Bastion]:
+    """Bastion of a 'ssh [options] -W %h:%p [user@]bastion' proxy command"""
+    try:
+        words = shlex.split(proxy_command)
+    except ValueError:
+        return None
+    if not words or os.path.basename(words[0]) != 'ssh':
+        return None
+    options: List[str] = []
+    user = port = destination = None
+    forwards_stdio = False
+    index = 1
+    while index < len(words):
+        word = words[index]
+        index += 1
+        if destination is not None:
+            # Remote command after the destination
+            return None
+        if not word.startswith('-') or len(word) < 2:
+            destination = word
+            continue
+        flags = word[1:]
+        for flag_index, flag in enumerate(flags):
+            if flag not in SSH_OPTIONS_WITH_ARGUMENT:
+                options.append('-' + flag)
+                continue
+            argument = flags[flag_index + 1:]
+            if not argument:
+                if index >= len(words):
+                    return None
+                argument = words[index]
+                index += 1
+            if flag == 'W':
+                forwards_stdio = argument == '%h:%p'
+            elif flag == 'l':
+                user = argument
+            elif flag == 'p':
+                port = argument
+            elif flag == 'J':
+                # Chains of jump hosts are not shared
+                return None
+            elif not (flag == 'o' and argument.split('=')[0].strip().lower()
+                      in MULTIPLEXING_OPTIONS):
+                options.extend(['-' + flag, argument])
+            break
+    if not forwards_stdio or destination is None:
+        return None
+    if '@' in destination:
+        user, destination = destination.rsplit('@', 1)
+    # Words are put back into a double quoted ProxyCommand, so only plain words are supported
+    if any(UNSAFE_CHARACTERS_RE.search(word) for word in options):
+        return None
+    return Bastion(destination, user, port, words[0], tuple(options))
+
+
+def parse_bastion(proxy_option: ProxyOption) -> Optional[Bastion]:
+    """Bastion which the proxy option connects through
+
+    :return: Bastion or None when the proxy option is not a single ssh jump host
+    :rtype: Bastion
+    """
+    if proxy_option.kind == PROXY_JUMP:
+        return _parse_jump_host(proxy_option.value)
+    return _parse_proxy_command(proxy_option.value)
+
+
+def replace_proxy_option(ssh_options: str, proxy_option: ProxyOption,
+                         proxy_command: str) -> str:
+    return '{}-o ProxyCommand="{}"{}'.format(
+        ssh_options[:proxy_option.start], proxy_command, ssh_options[proxy_option.end:])
+
+
+class BastionPlan:
+    """Hosts connected through jump hosts, grouped by their bastion"""
+
+    def __init__(self, bastion_hosts: Dict[Bastion, List[str]], unshared_hosts: List[str]):
+        self.bastion_hosts = bastion_hosts
+        self.unshared_hosts = unshared_hosts
+
+    @property
+    def connections_before(self) -> int:
+        # Every host opens its own connection to its bastion
+        shared_hosts_count = sum(len(host_names) for host_names in self.bastion_hosts.values())
+        return shared_hosts_count + len(self.unshared_hosts)
+
+    @property
+    def connections_after(self) -> int:
+        return len(self.bastion_hosts) + len(self.unshared_hosts)
+
+
+def plan_bastion_connections(hosts: list) -> BastionPlan:
+    """Group hosts which connect through a jump host by their bastion
+
+    :param hosts: Host adapters
+    :type hosts: list
+
+    :return: Plan with hosts of each bastion and hosts which proxy cannot be shared
+    :rtype: BastionPlan
+    """
+    bastion_hosts: Dict[Bastion, List[str]] = OrderedDict()
+    unshared_hosts = []
+    for host in hosts:
+        connection = host.connection
+        bastion = connection.get_bastion()
+        if bastion is not None:
+            bastion_hosts.setdefault(bastion, []).append(host.host_name)
+        elif connection.uses_proxy():
+            unshared_hosts.append(host.host_name)
+    return BastionPlan(bastion_hosts, unshared_hosts)
+
+
+def report_bastion_plan(plan: BastionPlan, output: TextIO) -> None:
+    for bastion, host_names in plan.bastion_hosts.items():
+        print("bastions: {} shared by {} hosts".format(bastion, len(host_names)), file=output)
+    if plan.unshared_hosts:
+        print("bastions: proxy of {} hosts cannot be shared: {}".format(
+            len(plan.unshared_hosts), ', '.join(plan.unshared_hosts)), file=output)
+    print("bastions: {} connections to jump hosts before, {} after".format(
+        plan.connections_before, plan.connections_after), file=output)
@@ -0,0 +1,178 @@
+import os
+import shlex
+import sys
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.commandrenderer import ConnectionCommandRenderer
+from ansibleconnect.hostpattern import HostPatternError, compile_host_pattern
+from ansibleconnect.hostselection import filter_hosts_by_variables, select_hosts, \
+    skip_unsupported_hosts
+from ansibleconnect.inventoryadapter import SOURCE_FAILED, \
+    SOURCE_STALE, \
+    InventoryAdapter, \
+    InventorySourceError, \
+    SourceLoadResult, \
+    check_sources_loaded, \
+    iter_inventory_sources, \
+    report_source_results
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.tmuxcontrol import TmuxControlClient, TmuxControlError, attach_command
+from ansibleconnect.tmuxlayout import get_terminal_size
+from ansibleconnect.tmuxpresenter import host_pane_commands, \
+    session_environment_commands, \
+    tmux_session_or_window_name
+from ansibleconnect.vault import VaultDecryptor, VaultError
+
+STREAM_WINDOW_NAME = 'ansibleconnect'
+
+
+def iter_selected_hosts(args, indexed_results: Iterable[Tuple[int, SourceLoadResult]]
+                        ) -> Iterator[Tuple[SourceLoadResult, List[SnapshotHost]]]:
+    """Select hosts from the inventory sources as soon as each of them is loaded
+
+    Selection runs on all the sources loaded so far, merged in the order of
+    the sources, and yields only the hosts which were not selected before.
+    Hosts already yielded stay selected, even if a source loaded later would
+    deselect them, e.g. by adding them to an excluded group.
+
+    :param args: Parsed command line arguments
+    :param indexed_results: Iterator of (index of the source, load result) tuples
+    :type indexed_results: iterator
+
+    :return: Iterator of (load result, newly selected hosts) tuples
+    :rtype: iterator
+    """
+    # Sources are merged into one inventory as they load, not all over again for each of them
+    inventory = InventoryAdapter(args.inventory, source_results=[])
+    selected_host_names: Set[str] = set()
+    for index, result in indexed_results:
+        inventory.add_source_result(result, index)
+        if result.snapshot is None:
+            yield result, []
+            continue
+        hosts_list = filter_hosts_by_variables(args, inventory, select_hosts(args, inventory))
+        new_hosts = [host for host in hosts_list if host.name not in selected_host_names]
+        selected_host_names.update(host.name for host in new_hosts)
+        yield result, skip_unsupported_hosts(new_hosts, sys.stderr)
+
+
+class StreamingLayout:
+    """Places panes of hosts which come one batch after another
+
+    Panes are tiled again after each of them is added, as the number of
+    hosts is not known up front.
+    """
+
+    def __init__(self, max_panes_per_window: int = 0):
+        self.max_panes_per_window = max_panes_per_window
+        self._windows_count = 0
+        self._window_panes_count = 0
+
+    def commands(self, hosts: List[AnsibleHostAdapter]) -> List[str]:
+        tmux_commands = []
+        for host in hosts:
+            if self._windows_count == 0:
+                # First host gets the pane of the new session
+                self._windows_count = 1
+                if self.max_panes_per_window:
+                    tmux_commands.append('rename-window {}-1'.format(STREAM_WINDOW_NAME))
+            elif self.max_panes_per_window and \
+                    self._window_panes_count >= self.max_panes_per_window:
+                self._windows_count += 1
+                self._window_panes_count = 0
+                tmux_commands.append('new-window -n {}-{}'.format(
+                    STREAM_WINDOW_NAME, self._windows_count))
+            else:
+                # Panes are evened out first, so that the active one has room to be split
+                tmux_commands.extend(['select-layout tiled', 'split-window'])
+            tmux_commands.extend(host_pane_commands(host, export_auth_socket=False))
+            self._window_panes_count += 1
+        if tmux_commands:
+            tmux_commands.append('select-layout tiled')
+        return tmux_commands
+
+
+def release_output() -> None:
+    """Let the shell run the already printed command, while this process goes on
+
+    Shell reading the output, e.g. with source <(...), runs it only once the
+    output is closed. Errors written later would garble the attached session,
+    so they are discarded.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.dup2(devnull, sys.stderr.fileno())
+    os.close(devnull)
+
+
+def _source_message_command(result: SourceLoadResult) -> str:
+    message = 'ansibleconnect: inventory {} {}'.format(result.source, result.status)
+    if result.error:
+        message += ' ({})'.format(result.error)
+    return 'display-message {}'.format(shlex.quote(message))
+
+
+def stream_connect(args) -> None:
+    """Open panes of hosts of each inventory source as soon as it is loaded
+
+    The command attaching to the new tmux session is printed with the panes
+    of the first loaded source which has matching hosts, panes of the hosts
+    of the other sources are added to the session as they load.
+    """
+    try:
+        compile_host_pattern(args.groups or '')
+    except HostPatternError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+    renderer = ConnectionCommandRenderer()
+    decryptor = VaultDecryptor(args.vault_id, args.vault_password_file)
+    layout = StreamingLayout(args.max_panes_per_window)
+    client: Optional[TmuxControlClient] = None
+    loaded_results = []
+    try:
+        for result, hosts_list in iter_selected_hosts(args, iter_inventory_sources(
+                args.inventory, not args.no_cache, args.refresh_cache, args.source_timeout)):
+            loaded_results.append(result)
+            hosts_adapters = [AnsibleHostAdapter(host, renderer=renderer, decryptor=decryptor)
+                              for host in hosts_list]
+            if client is not None:
+                if result.status in (SOURCE_STALE, SOURCE_FAILED):
+                    client.send([_source_message_command(result)])
+                client.send(layout.commands(hosts_adapters))
+                continue
+            if len(args.inventory) > 1:
+                report_source_results([result], sys.stderr)
+            if not hosts_adapters:
+                continue
+            new_client = TmuxControlClient(tmux_session_or_window_name(),
+                                           get_terminal_size() or (80, 24))
+            try:
+                new_client.start()
+            except TmuxControlError as error:
+                print("echo '{}'".format(error))
+                exit(1)
+            client = new_client
+            client.send(session_environment_commands() + layout.commands(hosts_adapters))
+            print(attach_command(client.session_name))
+            release_output()
+    except VaultError as error:
+        print("echo '{}'".format(error))
+        exit(1)
+    finally:
+        if client is not None:
+            # Results cannot be reported anymore, the output is already released
+            try:
+                client.close()
+            except TmuxControlError:
+                pass
+    if client is None:
+        try:
+            check_sources_loaded(loaded_results)
+        except InventorySourceError as error:
+            print("echo '{}'".format(error))
+            exit(1)
+        print("echo 'No hosts matched given criteria'")
+        exit(1)
@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, TextIO
+
+from ansibleconnect.importprofile import ImportProfiler
+
+
+class StageRecord:
+    def __init__(self, name: str):
+        self.name = name
+        self.elapsed = 0.0
+        # Number of hosts the stage ended with, None if the stage does not deal with hosts
+        self.hosts_count: Optional[int] = None
+        # Time spent importing modules which were not imported before the stage
+        self.imports_time: Optional[float] = None
+
+
+class StageTimings:
+    """Durations and host counts of the stages of a run
+
+    Stages are always timed, as it costs next to nothing. Imports are
+    measured only when enabled, because it replaces the import function.
+    """
+
+    def __init__(self, measure_imports: bool = False):
+        self.records: List[StageRecord] = []
+        self.measure_imports = measure_imports
+
+    @contextmanager
+    def stage(self, name: str, hosts_count: Optional[int] = None) -> Iterator[StageRecord]:
+        """Time the code run in the context
+
+        :param name: Name of the stage
+        :type name: str
+        :param hosts_count: Number of hosts, can also be set on the yielded record
+        :type hosts_count: int
+        """
+        record = StageRecord(name)
+        record.hosts_count = hosts_count
+        import_profiler = ImportProfiler() if self.measure_imports else None
+        if import_profiler:
+            import_profiler.start()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.elapsed = time.perf_counter() - start
+            if import_profiler:
+                import_profiler.stop()
+                record.imports_time = import_profiler.total_time()
+            self.records.append(record)
+
+    def total_time(self) -> float:
+        return sum(record.elapsed for record in self.records)
+
+    def report(self, output: TextIO) -> None:
+        for record in self.records:
+            message = "timings: {:<20} {:>9.1f} ms".format(record.name, record.elapsed * 1000)
+            if record.hosts_count is not None:
+                message += " {:>7} hosts".format(record.hosts_count)
+            if record.imports_time:
+                message += " (imports {:.1f} ms)".format(record.imports_time * 1000)
+            print(message, file=output)
+        print("timings: {:<20} {:>9.1f} ms".format('total', self.total_time() * 1000),
+              file=output)
+
+
+@contextmanager
+def write_profile(path: str) -> Iterator[None]:
+    """Profile the code run in the context with cProfile and write the stats to a file
+
+    The file can be read with pstats, e.g. ``python -m pstats FILE``.
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,188 @@
+import os
+import subprocess
+import threading
+from typing import IO, List, Optional, Tuple, cast
+
+# Control mode sends results of each command between %begin and %end (or %error) lines,
+# the last field of these lines is 1 for commands sent by the control client itself
+BLOCK_BEGIN = '%begin'
+BLOCK_END = '%end'
+BLOCK_ERROR = '%error'
+CLIENT_COMMAND_FLAG = '1'
+CONTROL_MODE_TIMEOUT = 60
+
+
+class TmuxControlError(Exception):
+    pass
+
+
+class TmuxCommandResult:
+    def __init__(self, command: str, output: List[str], failed: bool):
+        self.command = command
+        self.output = output
+        self.failed = failed
+
+
+def tmux_server_args() -> List[str]:
+    # Inside tmux the control client connects to the server of the current session
+    tmux_env = os.environ.get('TMUX', '')
+    if tmux_env:
+        return ['-S', tmux_env.split(',')[0]]
+    return []
+
+
+def parse_control_mode_output(output: str) -> List[Tuple[List[str], bool]]:
+    """Parse output blocks of the commands sent by the control client
+
+    :param output: Output of the tmux control mode client
+    :type output: str
+
+    :return: List of (output lines, failed) tuples, in the order of the commands
+    :rtype: list
+    """
+    blocks = []
+    block_lines: Optional[List[str]] = None
+    for line in output.splitlines():
+        fields = line.split(' ')
+        if fields[0] == BLOCK_BEGIN:
+            block_lines = []
+        elif fields[0] in (BLOCK_END, BLOCK_ERROR) and block_lines is not None:
+            if fields[-1] == CLIENT_COMMAND_FLAG:
+                blocks.append((block_lines, fields[0] == BLOCK_ERROR))
+            block_lines = None
+        elif block_lines is not None:
+            block_lines.append(line)
+    return blocks
+
+
+def _read_initial_block(output: IO[str]) -> None:
+    # Commands written before the new session exists would run in another
+    # session of the server, so they are sent only after new-session finished
+    lines = []
+    for line in output:
+        line = line.rstrip('\n')
+        fields = line.split(' ')
+        if fields[0] == BLOCK_END and fields[-1] != CLIENT_COMMAND_FLAG:
+            return
+        if fields[0] == BLOCK_ERROR and fields[-1] != CLIENT_COMMAND_FLAG:
+            break
+        if fields[0] != BLOCK_BEGIN:
+            lines.append(line)
+    raise TmuxControlError('tmux could not create the session: {}'.format(
+        ' '.join(lines).strip() or 'no output'))
+
+
+class TmuxControlClient:
+    """Control mode client of a new detached tmux session
+
+    Commands are run by tmux one after another, without a shell or a separate
+    tmux client for each of them, as soon as they are sent. Results of all
+    the commands are returned when the client is closed.
+    """
+
+    def __init__(self, session_name: str, size: Tuple[int, int] = (80, 24)):
+        self.session_name = session_name
+        self.size = size
+        self._commands: List[str] = []
+        self._output: List[str] = []
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Create the session, commands can be sent once it exists"""
+        columns, lines = self.size
+        tmux_command = ['tmux'] + tmux_server_args() + [
+            '-C', 'new-session', '-s', self.session_name, '-x', str(columns), '-y', str(lines)]
+        env = dict(os.environ)
+        # Otherwise tmux refuses to create a session from inside of another one
+        env.pop('TMUX', None)
+        try:
+            self._process = subprocess.Popen(tmux_command, stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                             universal_newlines=True, env=env)
+        except OSError as error:
+            raise TmuxControlError('tmux control mode client failed: {}'.format(error))
+        timer = threading.Timer(CONTROL_MODE_TIMEOUT, self._process.kill)
+        timer.start()
+        try:
+            _read_initial_block(cast(IO[str], self._process.stdout))
+        except TmuxControlError:
+            self._process.kill()
+            raise
+        finally:
+            timer.cancel()
+        # Output is read all the time, so that pane output filling
+        # the pipe cannot block tmux while commands are written
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+        self.send(['refresh-client -C {}x{}'.format(columns, lines)])
+
+    def _read_output(self) -> None:
+        self._output.append(cast(IO[str], cast(subprocess.Popen, self._process).stdout).read())
+
+    def send(self, commands: List[str]) -> None:
+        self._commands.extend(commands)
+        command_input = cast(IO[str], cast(subprocess.Popen, self._process).stdin)
+        try:
+            command_input.write(''.join(command + '\n' for command in commands))
+            command_input.flush()
+        except OSError:
+            # Client died, missing results are reported by close
+            pass
+
+    def close(self) -> List[TmuxCommandResult]:
+        """Wait until all the commands are done and return their results
+
+        :return: Results of the sent commands
+        :rtype: list
+        """
+        process = cast(subprocess.Popen, self._process)
+        # Control client exits after its standard input is closed and all commands are done
+        timer = threading.Timer(CONTROL_MODE_TIMEOUT, process.kill)
+        timer.start()
+        try:
+            try:
+                cast(IO[str], process.stdin).close()
+            except OSError:
+                pass
+            cast(threading.Thread, self._reader).join()
+            process.wait()
+        finally:
+            timer.cancel()
+        output = ''.join(self._output)
+        blocks = parse_control_mode_output(output)
+        if len(blocks) != len(self._commands):
+            raise TmuxControlError('tmux control mode client returned {} results for {} '
+                                   'commands: {}'.format(len(blocks), len(self._commands),
+                                                         output.strip()))
+        return [TmuxCommandResult(command, block_output, failed)
+                for command, (block_output, failed) in zip(self._commands, blocks)][1:]
+
+
+def run_in_new_session(session_name: str, commands: List[str],
+                       size: Tuple[int, int] = (80, 24)) -> List[TmuxCommandResult]:
+    """Create detached tmux session and run commands in it through one control mode client
+
+    All the commands are written at once and tmux runs them one after another
+    without waiting for a shell or a separate tmux client for each of them.
+
+    :param session_name: Name of the new tmux session
+    :type session_name: str
+    :param commands: Tmux commands to run in the session
+    :type commands: list
+    :param size: Size (columns, lines) of the session's windows
+    :type size: tuple
+
+    :return: Results of the commands
+    :rtype: list
+    """
+    client = TmuxControlClient(session_name, size)
+    client.start()
+    client.send(commands)
+    return client.close()
+
+
+def attach_command(session_name: str) -> str:
+    if os.environ.get('TMUX'):
+        return 'tmux switch-client -t {}'.format(session_name)
+    return 'tmux attach-session -t {}'.format(session_name)
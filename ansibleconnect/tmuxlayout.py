@@ -0,0 +1,129 @@
+import os
+from typing import List, Optional, Tuple, Union
+
+# Smallest pane size accepted by tmux, panes are also separated by one cell wide borders
+PANE_MINIMUM_SIZE = 1
+STATUS_LINES = 1
+# Command, or list of commands, run in one pane
+PaneCommands = Union[str, List[str]]
+
+
+def plan_grid(panes_count: int) -> List[int]:
+    """Plan rows of the pane grid the same way as tmux's tiled layout does
+
+    :param panes_count: Number of panes
+    :type panes_count: int
+
+    :return: Number of panes in each row, only the last row can be shorter
+    :rtype: list
+    """
+    if panes_count < 1:
+        return []
+    rows = columns = 1
+    while rows * columns < panes_count:
+        rows += 1
+        if rows * columns < panes_count:
+            columns += 1
+    return [columns] * (rows - 1) + [panes_count - columns * (rows - 1)]
+
+
+def _split_percentage(remaining_parts: int) -> int:
+    # Percentage of the current pane given to the new pane, so that the current
+    # pane keeps exactly one of the remaining equal parts
+    return round(100 * (remaining_parts - 1) / remaining_parts)
+
+
+def create_grid_commands(pane_commands: List[PaneCommands]) -> List[str]:
+    """Tmux commands splitting the current pane into a balanced grid of panes
+
+    Each pane's commands (like send-keys) are run while its pane is the active one.
+    Panes are created with sizes of the final grid, so splits never run out
+    of space before the last pane is created and the layout is applied once.
+
+    :param pane_commands: Command, or list of commands, to run in each of the panes
+    :type pane_commands: list
+
+    :return: List of tmux commands
+    :rtype: list
+    """
+    columns_per_row = plan_grid(len(pane_commands))
+    commands = []
+    pane_index = 0
+    for row_index, columns in enumerate(columns_per_row):
+        remaining_rows = len(columns_per_row) - row_index
+        if remaining_rows > 1:
+            # New pane below holds all remaining rows, current pane stays active
+            commands.append('split-window -v -d -p {}'.format(_split_percentage(remaining_rows)))
+        for column_index in range(columns):
+            pane_command = pane_commands[pane_index]
+            commands.extend([pane_command] if isinstance(pane_command, str) else pane_command)
+            pane_index += 1
+            remaining_columns = columns - column_index
+            if remaining_columns > 1:
+                commands.append('split-window -h -p {}'.format(
+                    _split_percentage(remaining_columns)))
+        if remaining_rows > 1:
+            commands.append('select-pane -D')
+    if len(pane_commands) > 1:
+        commands.append('select-layout tiled')
+    return commands
+
+
+def get_required_terminal_size(panes_count: int) -> Tuple[int, int]:
+    """Smallest terminal size (columns, lines) that fits the grid of panes"""
+    columns_per_row = plan_grid(panes_count)
+    if not columns_per_row:
+        return 0, 0
+    columns = max(columns_per_row) * (PANE_MINIMUM_SIZE + 1) - 1
+    lines = len(columns_per_row) * (PANE_MINIMUM_SIZE + 1) - 1 + STATUS_LINES
+    return columns, lines
+
+
+def get_terminal_size() -> Optional[Tuple[int, int]]:
+    # COLUMNS and LINES take precedence like in shutil.get_terminal_size, the daemon
+    # has no terminal and gets the size of the client's terminal through them
+    try:
+        return int(os.environ['COLUMNS']), int(os.environ['LINES'])
+    except (KeyError, ValueError):
+        pass
+    # Standard output is usually a pipe read by the shell, so the terminal
+    # size is taken from the first standard stream connected to a terminal
+    for file_descriptor in (2, 0, 1):
+        try:
+            terminal_size = os.get_terminal_size(file_descriptor)
+        except OSError:
+            continue
+        return terminal_size.columns, terminal_size.lines
+    return None
+
+
+def get_max_panes_count(columns: int, lines: int) -> int:
+    max_columns = (columns + 1) // (PANE_MINIMUM_SIZE + 1)
+    max_rows = (lines - STATUS_LINES + 1) // (PANE_MINIMUM_SIZE + 1)
+    panes_count = max(max_columns * max_rows, 0)
+    # Grid of tmux's tiled layout can be less dense than rows times columns
+    while panes_count and not _fits(panes_count, columns, lines):
+        panes_count -= 1
+    return panes_count
+
+
+def _fits(panes_count: int, columns: int, lines: int) -> bool:
+    required_columns, required_lines = get_required_terminal_size(panes_count)
+    return required_columns <= columns and required_lines <= lines
+
+
+def check_terminal_fits_panes(panes_count: int) -> Optional[str]:
+    """Error message if the current terminal is too small for the given number of panes
+
+    :return: Error message or None if panes fit or the terminal size is unknown
+    :rtype: str
+    """
+    terminal_size = get_terminal_size()
+    if terminal_size is None or _fits(panes_count, *terminal_size):
+        return None
+    columns, lines = terminal_size
+    required_columns, required_lines = get_required_terminal_size(panes_count)
+    return ("Terminal of size {}x{} fits at most {} panes, {} panes need at least {}x{}. "
+            "Use a bigger terminal or the -w option".format(
+                columns, lines, get_max_panes_count(columns, lines), panes_count,
+                required_columns, required_lines))
@@ -1,20 +1,60 @@
 import os
+import re
 import datetime
-from typing import List
+import functools
+import shlex
+import tempfile
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.tmuxlayout import create_grid_commands
+
+UNDEFINED_GROUP_NAME = 'undefined'
+# Window holding panes of hosts that did not respond to the reachability probe
+DOWN_WINDOW_NAME = 'down'
+WINDOW_NAME_FORBIDDEN_CHARACTERS_RE = re.compile(r'[^A-Za-z0-9_.@-]')
+# Pane option holding the name of the host connected in the pane, read by --update
+HOST_PANE_OPTION = '@ansibleconnect_host'
+# Pane options are supported since tmux 3.0, panes are not tagged by older ones
+PANE_OPTIONS_TMUX_VERSION = (3, 0)
+TMUX_VERSION_RE = re.compile(r'(\d+)\.(\d+)')
 
 
 def in_tmux() -> bool:
     return 'TMUX' in os.environ
 
 
+@functools.lru_cache(maxsize=None)
+def tmux_version() -> Optional[Tuple[int, int]]:
+    """Version of the installed tmux, None if it is not known, e.g. of development builds"""
+    # Imported only when tmux is asked for its version, not when the module is imported
+    import subprocess
+
+    try:
+        output = subprocess.run(['tmux', '-V'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return None
+    match = TMUX_VERSION_RE.search(output)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def tmux_supports_pane_options() -> bool:
+    version = tmux_version()
+    return version is None or version >= PANE_OPTIONS_TMUX_VERSION
+
+
+def tmux_session_or_window_name() -> str:
+    return datetime.datetime.now().strftime("ansibleconnect-%Y-%m-%d-%H-%M")
+
+
 def tmux_start_command() -> str:
-    tmux_session_or_window_name = datetime.datetime.now().strftime("ansibleconnect-%Y-%m-%d-%H-%M")
+    name = tmux_session_or_window_name()
     if in_tmux():
-        start_command = "tmux new-window -n {}".format(tmux_session_or_window_name)
+        start_command = "tmux new-window -n {}".format(name)
     else:
-        start_command = "tmux new-session -s {}".format(tmux_session_or_window_name)
+        start_command = "tmux new-session -s {}".format(name)
     return start_command
 
 
@@ -26,24 +66,190 @@ def ssh_auth_socket_env_var_command() -> str:
         return ""
 
 
-def create_tmux_script(hosts: List[AnsibleHostAdapter], use_windows: bool) -> str:
-    tmux_file_lines = [tmux_start_command()]
-    for index, host in enumerate(hosts):
-        first_line = "send-keys '"
-        extra_commands = ssh_auth_socket_env_var_command()
-        if extra_commands != "":
-            first_line += "{extra_commands};".format(
-                extra_commands=ssh_auth_socket_env_var_command())
-        first_line += "{conn_command}' C-m".format(
-            conn_command=host.connection_command)
-        tmux_file_lines.append(first_line)
-        if index != len(hosts) - 1:
-            if use_windows:
-                tmux_file_lines.append(f"new-window -n {hosts[index+1].host_name}")
+def session_environment_commands() -> List[str]:
+    auth_socket = os.environ.get("SSH_AUTH_SOCK", "")
+    if auth_socket != "":
+        return ["set-environment SSH_AUTH_SOCK {}".format(shlex.quote(auth_socket))]
+    return []
+
+
+def _target_flag(target: Optional[str]) -> str:
+    return "-t {} ".format(shlex.quote(target)) if target else ""
+
+
+def send_keys_command(host: AnsibleHostAdapter, export_auth_socket: bool = True,
+                      target: Optional[str] = None) -> str:
+    send_keys = "send-keys {}'".format(_target_flag(target))
+    extra_commands = ssh_auth_socket_env_var_command() if export_auth_socket else ""
+    if extra_commands != "":
+        send_keys += "{extra_commands};".format(extra_commands=extra_commands)
+    if host.launch_delay > 0:
+        send_keys += "sleep {:.2f};".format(host.launch_delay)
+    send_keys += "{conn_command}' C-m".format(conn_command=host.connection_command)
+    return send_keys
+
+
+def tag_pane_command(host: AnsibleHostAdapter, target: Optional[str] = None) -> str:
+    return "set-option -p {}{} {}".format(_target_flag(target), HOST_PANE_OPTION,
+                                          shlex.quote(host.host_name))
+
+
+def host_pane_commands(host: AnsibleHostAdapter, export_auth_socket: bool = True,
+                       target: Optional[str] = None) -> List[str]:
+    """Commands tagging the pane with the host and connecting to the host in it
+
+    Panes are tagged, for --update, only by tmux versions which support pane options.
+
+    :param target: Pane which the commands are run in, the active one if None
+    :type target: str
+    """
+    commands = [tag_pane_command(host, target)] if tmux_supports_pane_options() else []
+    commands.append(send_keys_command(host, export_auth_socket, target))
+    return commands
+
+
+def _window_name(name: str) -> str:
+    return WINDOW_NAME_FORBIDDEN_CHARACTERS_RE.sub('_', name)
+
+
+def _split_evenly(hosts: List[AnsibleHostAdapter],
+                  max_panes_per_window: int) -> List[List[AnsibleHostAdapter]]:
+    if not max_panes_per_window or len(hosts) <= max_panes_per_window:
+        return [hosts]
+    windows_count = -(-len(hosts) // max_panes_per_window)
+    window_size, bigger_windows_count = divmod(len(hosts), windows_count)
+    shards = []
+    start = 0
+    for window_index in range(windows_count):
+        end = start + window_size + (1 if window_index < bigger_windows_count else 0)
+        shards.append(hosts[start:end])
+        start = end
+    return shards
+
+
+def _group_value(host: AnsibleHostAdapter, group_by: str) -> str:
+    value = host.get_variable(group_by)
+    # List values, like group_names, are grouped by their first item
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return UNDEFINED_GROUP_NAME if value is None else str(value)
+
+
+def shard_hosts(hosts: List[AnsibleHostAdapter], max_panes_per_window: int = 0,
+                group_by: Optional[str] = None) -> List[Tuple[str, List[AnsibleHostAdapter]]]:
+    """Split hosts into windows of balanced size
+
+    :param hosts: Hosts to split
+    :type hosts: list
+    :param max_panes_per_window: Maximum number of hosts in a window, 0 means no limit
+    :type max_panes_per_window: int
+    :param group_by: Host variable which value hosts are grouped by into separate windows,
+                     for example group_names groups hosts by their (first) inventory group
+    :type group_by: str
+
+    :return: List of (window name, hosts) tuples
+    :rtype: list
+    """
+    if group_by:
+        grouped_hosts: OrderedDict = OrderedDict()
+        for host in hosts:
+            grouped_hosts.setdefault(_group_value(host, group_by), []).append(host)
+        groups = list(grouped_hosts.items())
+    else:
+        groups = [('ansibleconnect', hosts)]
+    windows = []
+    for group_name, group_hosts in groups:
+        shards = _split_evenly(group_hosts, max_panes_per_window)
+        for shard_index, shard in enumerate(shards, 1):
+            window_name = group_name
+            if len(shards) > 1:
+                window_name += '-{}'.format(shard_index)
+            windows.append((_window_name(window_name), shard))
+    return windows
+
+
+def create_tmux_commands(hosts: List[AnsibleHostAdapter], use_windows: bool,
+                         max_panes_per_window: int = 0, group_by: Optional[str] = None,
+                         export_auth_socket: bool = True,
+                         down_hosts: Optional[List[AnsibleHostAdapter]] = None) -> List[str]:
+    """Tmux commands creating panes or windows for the hosts in the current window
+
+    Down hosts, if any, get panes in a separate window created after all the other hosts.
+    """
+    tmux_commands = []
+    if use_windows:
+        for index, host in enumerate(hosts):
+            if index != 0:
+                tmux_commands.append(f"new-window -n {host.host_name}")
+            tmux_commands.extend(host_pane_commands(host, export_auth_socket))
+    elif max_panes_per_window or group_by:
+        for index, (window_name, window_hosts) in enumerate(
+                shard_hosts(hosts, max_panes_per_window, group_by)):
+            if index == 0:
+                tmux_commands.append(f"rename-window {window_name}")
             else:
-                tmux_file_lines.append("split-window -h")
-            # tiled layout rearranges panes so that each pane has the same size
-            tmux_file_lines.append("select-layout tiled")
+                tmux_commands.append(f"new-window -n {window_name}")
+            tmux_commands.extend(create_grid_commands(
+                [host_pane_commands(host, export_auth_socket) for host in window_hosts]))
+    else:
+        # Grid of panes is planned up front and tiled once, at the end
+        tmux_commands.extend(create_grid_commands(
+            [host_pane_commands(host, export_auth_socket) for host in hosts]))
+    if down_hosts:
+        tmux_commands.append(f"new-window -n {DOWN_WINDOW_NAME}")
+        tmux_commands.extend(create_grid_commands(
+            [host_pane_commands(host, export_auth_socket) for host in down_hosts]))
+    return tmux_commands
+
+
+def create_tmux_script(hosts: List[AnsibleHostAdapter], use_windows: bool,
+                       max_panes_per_window: int = 0, group_by: Optional[str] = None,
+                       down_hosts: Optional[List[AnsibleHostAdapter]] = None) -> str:
+    tmux_file_lines = [tmux_start_command()]
+    tmux_file_lines.extend(create_tmux_commands(hosts, use_windows, max_panes_per_window,
+                                                group_by, down_hosts=down_hosts))
     # \; is printed so that ; can be interpreted by tmux instead of shell
     tmux_script = " \\; ".join(tmux_file_lines)
     return tmux_script
+
+
+def create_tmux_source_file_script(hosts: List[AnsibleHostAdapter], use_windows: bool,
+                                   max_panes_per_window: int = 0,
+                                   group_by: Optional[str] = None,
+                                   down_hosts: Optional[List[AnsibleHostAdapter]] = None) -> str:
+    """Write tmux commands to a file and return shell command which loads it with source-file
+
+    Tmux reads all the commands at once, instead of the shell parsing them from
+    one long command line. SSH_AUTH_SOCK is set once in the session environment
+    instead of being exported in every pane.
+    """
+    tmux_commands = session_environment_commands()
+    start_command = tmux_start_command()
+    if in_tmux():
+        # Window is created after the environment is set, so that its first pane gets it too
+        tmux_commands.append(start_command[len("tmux "):])
+        shell_command = "tmux"
+    else:
+        shell_command = start_command + " \\;"
+    tmux_commands.extend(create_tmux_commands(hosts, use_windows, max_panes_per_window,
+                                              group_by, export_auth_socket=False,
+                                              down_hosts=down_hosts))
+    file_descriptor, source_filepath = tempfile.mkstemp(prefix="ansibleconnect-",
+                                                        suffix=".tmux")
+    # File holds connection commands, which can contain passwords, so it removes itself
+    tmux_commands.append("run-shell {}".format(
+        shlex.quote("rm -f {}".format(shlex.quote(source_filepath)))))
+    with os.fdopen(file_descriptor, "w") as source_file:
+        source_file.write("\n".join(tmux_commands) + "\n")
+    return "{} source-file {}".format(shell_command, shlex.quote(source_filepath))
+
+
+def create_tmux_control_commands(hosts: List[AnsibleHostAdapter], use_windows: bool,
+                                 max_panes_per_window: int = 0,
+                                 group_by: Optional[str] = None,
+                                 down_hosts: Optional[List[AnsibleHostAdapter]] = None
+                                 ) -> List[str]:
+    """Tmux commands run by the control mode client in its new session"""
+    return session_environment_commands() + create_tmux_commands(
+        hosts, use_windows, max_panes_per_window, group_by, export_auth_socket=False,
+        down_hosts=down_hosts)
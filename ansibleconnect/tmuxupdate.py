@@ -0,0 +1,208 @@
+import os
+import shlex
+import subprocess
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, TextIO
+
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.tmuxcontrol import tmux_server_args
+from ansibleconnect.tmuxpresenter import HOST_PANE_OPTION, PANE_OPTIONS_TMUX_VERSION, \
+    host_pane_commands, \
+    send_keys_command, \
+    tmux_supports_pane_options
+
+UPDATE_WINDOW_NAME = 'ansibleconnect'
+PANE_FIELDS_SEPARATOR = '\t'
+PANE_FORMAT = PANE_FIELDS_SEPARATOR.join([
+    '#{session_id}', '#{session_name}', '#{session_created}', '#{window_id}',
+    '#{window_index}', '#{pane_id}', '#{pane_dead}', '#{pane_current_command}',
+    '#{default-shell}', '#{' + HOST_PANE_OPTION + '}'])
+
+
+class TmuxSessionError(Exception):
+    pass
+
+
+class HostPane:
+    """Pane of a tmux session, with the host it was opened for, if any"""
+
+    def __init__(self, session_id: str, session_name: str, session_created: int,
+                 window_id: str, window_index: int, pane_id: str, host_name: Optional[str],
+                 dead: bool):
+        self.session_id = session_id
+        self.session_name = session_name
+        self.session_created = session_created
+        self.window_id = window_id
+        self.window_index = window_index
+        self.pane_id = pane_id
+        self.host_name = host_name
+        # Connection has ended, e.g. the pane is back in its shell after ssh exited
+        self.dead = dead
+
+    @classmethod
+    def from_line(cls, line: str) -> 'HostPane':
+        (session_id, session_name, session_created, window_id, window_index, pane_id,
+         pane_dead, current_command, default_shell, host_name) = line.split(
+            PANE_FIELDS_SEPARATOR, 9)
+        dead = pane_dead == '1' or current_command == os.path.basename(default_shell)
+        return cls(session_id, session_name, int(session_created or 0), window_id,
+                   int(window_index or 0), pane_id, host_name or None, dead)
+
+
+def list_panes() -> List[HostPane]:
+    """All panes of the tmux server, empty if the server is not running
+
+    :raises TmuxSessionError: if tmux cannot be run or does not support pane options
+    """
+    if not tmux_supports_pane_options():
+        raise TmuxSessionError('--update needs tmux {}.{} or later'.format(
+            *PANE_OPTIONS_TMUX_VERSION))
+    try:
+        result = subprocess.run(['tmux'] + tmux_server_args() + ['list-panes', '-a', '-F',
+                                                                 PANE_FORMAT],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True)
+    except OSError as error:
+        raise TmuxSessionError('tmux could not be run: {}'.format(error))
+    if result.returncode != 0:
+        return []
+    return [HostPane.from_line(line) for line in result.stdout.splitlines() if line]
+
+
+def find_session_panes(panes: List[HostPane],
+                       session_name: Optional[str] = None) -> List[HostPane]:
+    """Panes of the ansibleconnect session which is updated
+
+    :param panes: All panes of the tmux server
+    :type panes: list
+    :param session_name: Name or id of the session, if not given the current session,
+                         or else the most recently created one, with host panes is used
+    :type session_name: str
+
+    :return: Panes of the session, empty if there is no session with host panes
+    :rtype: list
+    """
+    host_sessions = {pane.session_id for pane in panes if pane.host_name}
+    session_id = None
+    if session_name:
+        session_id = next((pane.session_id for pane in panes
+                           if session_name in (pane.session_id, pane.session_name)), None)
+    else:
+        current_pane_id = os.environ.get('TMUX_PANE')
+        session_id = next((pane.session_id for pane in panes if pane.pane_id == current_pane_id
+                           and pane.session_id in host_sessions), None)
+        if session_id is None and host_sessions:
+            session_id = max((pane for pane in panes if pane.session_id in host_sessions),
+                             key=lambda pane: pane.session_created).session_id
+    return [pane for pane in panes if pane.session_id == session_id]
+
+
+class SessionUpdate:
+    """Tmux commands bringing panes of a session in line with the selected hosts"""
+
+    def __init__(self, session_id: str, session_name: str):
+        self.session_id = session_id
+        self.session_name = session_name
+        self.commands: List[str] = []
+        self.added_hosts: List[str] = []
+        self.removed_hosts: List[str] = []
+        self.respawned_hosts: List[str] = []
+        self.unchanged_count = 0
+
+
+def plan_session_update(session_panes: List[HostPane], hosts: List[AnsibleHostAdapter],
+                        use_windows: bool = False,
+                        max_panes_per_window: int = 0) -> SessionUpdate:
+    """Plan commands adding panes of new hosts, killing panes of removed hosts and
+    respawning panes of hosts which connections have ended
+
+    New panes are added to the last window holding host panes, until it has
+    max_panes_per_window panes, and to new windows after that.
+
+    :param session_panes: Panes of the updated session
+    :type session_panes: list
+    :param hosts: Selected hosts
+    :type hosts: list
+    :param use_windows: Add a window instead of a pane for each new host
+    :type use_windows: bool
+    :param max_panes_per_window: Maximum number of panes in a window, 0 means no limit
+    :type max_panes_per_window: int
+    """
+    first_pane = session_panes[0]
+    update = SessionUpdate(first_pane.session_id, first_pane.session_name)
+    selected_hosts = OrderedDict((host.host_name, host) for host in hosts)
+    host_panes: Dict[str, HostPane] = {}
+    removed_panes = []
+    for pane in session_panes:
+        if not pane.host_name:
+            continue
+        if pane.host_name in selected_hosts and pane.host_name not in host_panes:
+            host_panes[pane.host_name] = pane
+        else:
+            # Hosts which are not selected anymore and duplicated panes of the same host
+            removed_panes.append(pane)
+    for host_name, pane in host_panes.items():
+        if pane.dead:
+            update.commands.append('respawn-pane -k -t {}'.format(pane.pane_id))
+            update.commands.append(send_keys_command(selected_hosts[host_name],
+                                                     target=pane.pane_id))
+            update.respawned_hosts.append(host_name)
+        else:
+            update.unchanged_count += 1
+    panes_counts = Counter(pane.window_id for pane in session_panes)
+    host_windows = [pane.window_id for pane in session_panes if pane.host_name]
+    # Session given by its name may have no host panes yet
+    window_id = host_windows[-1] if host_windows else session_panes[-1].window_id
+    next_window_index = max(pane.window_index for pane in session_panes) + 1
+    changed_windows: Set[str] = set()
+    for host_name, host in selected_hosts.items():
+        if host_name in host_panes:
+            continue
+        if use_windows or (max_panes_per_window and
+                           panes_counts[window_id] >= max_panes_per_window):
+            # Windows created here are targeted by their index, their ids are not known yet
+            window_id = '{}:{}'.format(update.session_id, next_window_index)
+            next_window_index += 1
+            window_name = host_name if use_windows else UPDATE_WINDOW_NAME
+            update.commands.append('new-window -d -t {} -n {}'.format(
+                shlex.quote(window_id), shlex.quote(window_name)))
+        else:
+            # Panes are evened out first, so that the active one has room to be split
+            update.commands.extend([
+                'select-layout -t {} tiled'.format(shlex.quote(window_id)),
+                'split-window -t {}'.format(shlex.quote(window_id))])
+        update.commands.extend(host_pane_commands(host, target=window_id))
+        panes_counts[window_id] += 1
+        changed_windows.add(window_id)
+        update.added_hosts.append(host_name)
+    for pane in removed_panes:
+        update.commands.append('kill-pane -t {}'.format(pane.pane_id))
+        panes_counts[pane.window_id] -= 1
+        changed_windows.add(pane.window_id)
+        update.removed_hosts.append(pane.host_name or '')
+    # Windows which lost all their panes are closed by tmux
+    update.commands.extend('select-layout -t {} tiled'.format(shlex.quote(window))
+                           for window in sorted(changed_windows) if panes_counts[window] > 0)
+    return update
+
+
+def apply_session_update(update: SessionUpdate) -> None:
+    """Run the commands of the update, all of them read by one tmux client"""
+    if not update.commands:
+        return
+    try:
+        result = subprocess.run(['tmux'] + tmux_server_args() + ['source-file', '-'],
+                                input=''.join(command + '\n' for command in update.commands),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+    except OSError as error:
+        raise TmuxSessionError('tmux could not be run: {}'.format(error))
+    if result.returncode != 0:
+        raise TmuxSessionError('tmux could not update session {}: {}'.format(
+            update.session_name, ' '.join(result.stdout.split())))
+
+
+def report_session_update(update: SessionUpdate, output: TextIO) -> None:
+    print("update: session {}: {} added, {} removed, {} respawned, {} unchanged".format(
+        update.session_name, len(update.added_hosts), len(update.removed_hosts),
+        len(update.respawned_hosts), update.unchanged_count), file=output)
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+# Most values are held by a single host (e.g. ansible_host), such entries keep
+# the host name itself instead of a set, which takes several times more memory
+ValueEntry = Union[str, Set[str]]
+
+
+def _compact(host_names: Set[str]) -> ValueEntry:
+    return next(iter(host_names)) if len(host_names) == 1 else host_names
+
+
+class VariableIndex:
+    """Inverted index of host variables
+
+    Maps variable names and (name, value) pairs to the names of hosts
+    that have them. Values that are not hashable (lists, dicts) are indexed
+    only by the variable name.
+    """
+
+    def __init__(self, key_index: Dict[str, Set[str]],
+                 value_index: Dict[Tuple[str, Hashable], ValueEntry]):
+        self._key_index = key_index
+        self._value_index = value_index
+
+    @classmethod
+    def from_hosts(cls, hosts: Iterable) -> 'VariableIndex':
+        key_index: Dict[str, Set[str]] = defaultdict(set)
+        value_index: Dict[Tuple[str, Hashable], Set[str]] = defaultdict(set)
+        for host in hosts:
+            for key, value in host.get_vars().items():
+                key_index[key].add(host.name)
+                if isinstance(value, Hashable):
+                    value_index[(key, value)].add(host.name)
+        return cls(dict(key_index), {index_key: _compact(host_names)
+                                     for index_key, host_names in value_index.items()})
+
+    @classmethod
+    def from_dict(cls, index_dict: dict,
+                  strings: Optional[Dict[str, str]] = None) -> 'VariableIndex':
+        """Restore index saved with to_dict
+
+        :param index_dict: Dictionary created by to_dict
+        :type index_dict: dict
+        :param strings: Host names and values by themselves, so that equal strings
+                        decoded from JSON are replaced by the ones already in use
+        :type strings: dict
+        """
+        strings = strings if strings is not None else {}
+        key_index = {key: {strings.get(name, name) for name in host_names}
+                     for key, host_names in index_dict['keys'].items()}
+        value_index = {}
+        for key, value, host_names in index_dict['values']:
+            if isinstance(value, str):
+                value = strings.get(value, value)
+            if len(host_names) == 1:
+                value_index[(key, value)] = strings.get(host_names[0], host_names[0])
+            else:
+                value_index[(key, value)] = {strings.get(name, name) for name in host_names}
+        return cls(key_index, value_index)
+
+    def to_dict(self) -> dict:
+        return {
+            'keys': {key: sorted(host_names) for key, host_names in self._key_index.items()},
+            'values': [[key, value, sorted(self._entry_host_names(entry))]
+                       for (key, value), entry in self._value_index.items()],
+        }
+
+    @staticmethod
+    def _entry_host_names(entry: Optional[ValueEntry]) -> Set[str]:
+        if entry is None:
+            return set()
+        if isinstance(entry, str):
+            return {entry}
+        return entry
+
+    def add_host(self, host) -> None:
+        for key, value in host.get_vars().items():
+            self._key_index.setdefault(key, set()).add(host.name)
+            if isinstance(value, Hashable):
+                entry = self._value_index.get((key, value))
+                if entry is None:
+                    self._value_index[(key, value)] = host.name
+                elif isinstance(entry, str):
+                    self._value_index[(key, value)] = {entry, host.name}
+                else:
+                    entry.add(host.name)
+
+    def remove_host(self, host_name: str, host_vars: dict) -> None:
+        """Remove host from the index
+
+        :param host_name: Name of the host
+        :type host_name: str
+        :param host_vars: Variables with which the host was added
+        :type host_vars: dict
+        """
+        for key, value in host_vars.items():
+            key_host_names = self._key_index.get(key)
+            if key_host_names is not None:
+                key_host_names.discard(host_name)
+                if not key_host_names:
+                    del self._key_index[key]
+            if not isinstance(value, Hashable) or (key, value) not in self._value_index:
+                continue
+            entry = self._value_index[(key, value)]
+            if isinstance(entry, str):
+                if entry == host_name:
+                    del self._value_index[(key, value)]
+                continue
+            entry.discard(host_name)
+            if len(entry) == 1:
+                self._value_index[(key, value)] = _compact(entry)
+
+    def get_host_names(self, key: str, value=None) -> Set[str]:
+        """Names of hosts that have the variable defined
+
+        :param key: Variable name
+        :type key: str
+        :param value: Required variable value, any value matches if it is empty or None,
+                      like for -vars key:
+        :type value: object
+
+        :return: Set of host names
+        :rtype: set
+        """
+        if not value:
+            return self._key_index.get(key, set())
+        if not isinstance(value, Hashable):
+            return set()
+        return self._entry_host_names(self._value_index.get((key, value)))
+
+    def get_host_names_matching_any(self, variables: List[Tuple]) -> Set[str]:
+        host_names: Set[str] = set()
+        for variable in variables:
+            host_names.update(self.get_host_names(variable[0], variable[1]))
+        return host_names
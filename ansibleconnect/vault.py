@@ -0,0 +1,212 @@
+import os
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig, get_ansible_config_filepath, \
+    load_ansible_config
+
+# Vault encrypted values are kept the way ansible encodes them in JSON, so that
+# they are cached with the inventory snapshot without ever being decrypted
+VAULT_VALUE_KEY = '__ansible_vault'
+
+
+class VaultError(Exception):
+    pass
+
+
+def is_vault_value(value) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and VAULT_VALUE_KEY in value
+
+
+@lru_cache(maxsize=None)
+def _vault_encrypted_type() -> type:
+    try:
+        from ansible.parsing.vault import EncryptedString  # type: ignore
+        return EncryptedString
+    except ImportError:
+        # Ansible before 2.19
+        from ansible.parsing.yaml.objects import AnsibleVaultEncryptedUnicode  # type: ignore
+        return AnsibleVaultEncryptedUnicode
+
+
+def vault_ciphertext(value) -> str:
+    """Ciphertext of the vault encrypted value parsed by ansible, without decrypting it"""
+    try:
+        from ansible.parsing.vault import VaultHelper  # type: ignore
+    except ImportError:
+        # Ansible before 2.19 has no public accessor of the ciphertext
+        ciphertext = getattr(value, '_ciphertext', None)
+        if ciphertext is None:
+            # Value as ansible reads it, in case the attribute is renamed
+            return str(value)
+    else:
+        ciphertext = VaultHelper.get_ciphertext(value, with_tags=False)
+    return ciphertext.decode() if isinstance(ciphertext, bytes) else ciphertext
+
+
+def encode_vault_values(value):
+    """Replace vault encrypted values parsed by ansible with their ciphertext
+
+    :param value: Variables of a host, or any of their values
+    :return: Value with the same structure and vault values as {'__ansible_vault': ciphertext}
+    """
+    if isinstance(value, _vault_encrypted_type()):
+        return {VAULT_VALUE_KEY: vault_ciphertext(value)}
+    if isinstance(value, dict):
+        return {key: encode_vault_values(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_vault_values(item) for item in value]
+    return value
+
+
+def _split_vault_id(vault_id: str) -> Tuple[str, str]:
+    if '@' not in vault_id:
+        return '', vault_id
+    identity, _, source = vault_id.partition('@')
+    return identity, source
+
+
+def _split_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def default_vault_ids() -> List[str]:
+    """Vault ids set with ANSIBLE_VAULT_IDENTITY_LIST, ANSIBLE_VAULT_PASSWORD_FILE or ansible.cfg
+
+    The settings are read when called rather than when ansible is imported, so that the
+    daemon uses the ones of each client. Relative password files set in ansible.cfg are
+    relative to its directory, like in ansible.
+
+    :return: Vault ids as passed to ansible's --vault-id
+    :rtype: list
+    """
+    config = load_ansible_config()
+    defaults: Dict[str, str] = dict(config.sections.get(AnsibleConfig.DEFAULTS_SECTION, {}))
+    config_directory = os.path.dirname(os.path.abspath(get_ansible_config_filepath()))
+
+    def from_config(vault_id: str) -> str:
+        identity, source = _split_vault_id(vault_id)
+        if source != 'prompt':
+            source = os.path.join(config_directory, os.path.expanduser(source))
+        return '{}@{}'.format(identity, source) if identity else source
+
+    vault_ids = []
+    if 'ANSIBLE_VAULT_IDENTITY_LIST' in os.environ:
+        vault_ids += _split_list(os.environ['ANSIBLE_VAULT_IDENTITY_LIST'])
+    elif 'vault_identity_list' in defaults:
+        vault_ids += [from_config(vault_id)
+                      for vault_id in _split_list(defaults['vault_identity_list'])]
+    if os.environ.get('ANSIBLE_VAULT_PASSWORD_FILE'):
+        vault_ids.append(os.environ['ANSIBLE_VAULT_PASSWORD_FILE'])
+    elif defaults.get('vault_password_file'):
+        vault_ids.append(from_config(defaults['vault_password_file']))
+    return vault_ids
+
+
+class VaultDecryptor:
+    """Decrypts vault values read during the run, each distinct ciphertext only once
+
+    Vault secrets are loaded when the first value is decrypted, runs which read
+    no encrypted value do not load them, nor import the ansible modules needed.
+    """
+
+    def __init__(self, vault_ids: Optional[List[str]] = None,
+                 vault_password_files: Optional[List[str]] = None):
+        """
+        :param vault_ids: Vault ids as passed to ansible's --vault-id, e.g. dev@~/.vault_pass
+        :type vault_ids: list
+        :param vault_password_files: Files with vault passwords or scripts printing them
+        :type vault_password_files: list
+        """
+        self._vault_ids = list(vault_ids or [])
+        self._vault_password_files = list(vault_password_files or [])
+        self._vault: Optional[Any] = None
+        self._plaintexts: Dict[str, str] = {}
+        self.read_count = 0
+
+    def _load_vault(self):
+        # ansible.cli is not used, it refuses to be imported when stdout is not blocking
+        from ansible import constants  # type: ignore
+        from ansible.parsing.dataloader import DataLoader  # type: ignore
+        from ansible.parsing.vault import VaultLib, get_file_vault_secret  # type: ignore
+
+        loader = DataLoader()
+        vault_sources = [_split_vault_id(vault_id) for vault_id in self._vault_ids]
+        vault_sources += [('', password_file) for password_file in self._vault_password_files]
+        if not vault_sources:
+            vault_sources = [_split_vault_id(vault_id) for vault_id in default_vault_ids()]
+        secrets = []
+        for identity, source in vault_sources:
+            if source == 'prompt':
+                raise VaultError('Vault password prompt is not supported, '
+                                 'use a vault password file')
+            identity = identity or constants.DEFAULT_VAULT_IDENTITY
+            secret = get_file_vault_secret(filename=source, vault_id=identity, loader=loader)
+            secret.load()
+            secrets.append((identity, secret))
+        return VaultLib(secrets)
+
+    def decrypt(self, value: dict) -> str:
+        """Plain text of the vault value
+
+        :raises VaultError: if the secrets cannot be loaded or none of them decrypts the value
+        """
+        self.read_count += 1
+        ciphertext = value[VAULT_VALUE_KEY]
+        plaintext = self._plaintexts.get(ciphertext)
+        if plaintext is None:
+            from ansible.errors import AnsibleError  # type: ignore
+
+            try:
+                if self._vault is None:
+                    self._vault = self._load_vault()
+                plaintext = self._vault.decrypt(ciphertext).decode()
+            except AnsibleError as error:
+                raise VaultError('Vault value could not be decrypted: {}'.format(error))
+            self._plaintexts[ciphertext] = plaintext
+        return plaintext
+
+    def report(self, output: TextIO) -> None:
+        if self.read_count:
+            print("vault: {} values read, {} decrypted".format(
+                self.read_count, len(self._plaintexts)), file=output)
+
+
+class DecryptedVariables(Mapping):
+    """Variables of a host which vault values are decrypted when they are read
+
+    Only the variables which are actually read get decrypted, checking
+    whether a variable is set does not decrypt it.
+    """
+
+    def __init__(self, variables: Mapping, decryptor: Optional[VaultDecryptor]):
+        """
+        :param decryptor: Decryptor shared by the hosts of the run,
+                          vault values cannot be read if None
+        :type decryptor: VaultDecryptor
+        """
+        self._variables = variables
+        self._decryptor = decryptor
+
+    def __getitem__(self, key):
+        """
+        :raises VaultError: if the value is vault encrypted and cannot be decrypted
+        """
+        value = self._variables[key]
+        if is_vault_value(value):
+            if self._decryptor is None:
+                # Encoded ciphertext must never end up in a command, e.g. as the password
+                raise VaultError('Vault encrypted variable {} cannot be read without '
+                                 'vault secrets'.format(key))
+            return self._decryptor.decrypt(value)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self._variables
+
+    def __iter__(self) -> Iterator:
+        return iter(self._variables)
+
+    def __len__(self) -> int:
+        return len(self._variables)
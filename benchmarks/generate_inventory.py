@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Generate a synthetic ansible inventory
+
+Hosts are spread evenly over the leaf groups, which are nested under
+``depth`` levels of parent groups. Every host gets ``vars_per_host``
+variables: ansible_host, which is unique, and others with few distinct values.
+
+Layouts:
+  yaml      - hosts.yml with variables inline
+  ini       - hosts.ini with variables inline
+  host_vars - hosts.yml listing hosts only, variables in host_vars/<host>.yml
+
+Usage: python benchmarks/generate_inventory.py DIRECTORY [--hosts 1000] [--groups 50]
+                                               [--depth 2] [--vars-per-host 10]
+                                               [--layout yaml|ini|host_vars]
+"""
+import argparse
+import os
+from typing import Dict, List
+
+YAML_LAYOUT = 'yaml'
+INI_LAYOUT = 'ini'
+HOST_VARS_LAYOUT = 'host_vars'
+LAYOUTS = (YAML_LAYOUT, INI_LAYOUT, HOST_VARS_LAYOUT)
+# Distinct values of the variables other than ansible_host
+VALUES_PER_VARIABLE = 8
+
+
+class InventorySpec:
+    def __init__(self, hosts: int = 1000, groups: int = 50, depth: int = 2,
+                 vars_per_host: int = 10, layout: str = YAML_LAYOUT):
+        self.hosts = hosts
+        self.groups = groups
+        self.depth = depth
+        self.vars_per_host = vars_per_host
+        self.layout = layout
+
+    def to_dict(self) -> dict:
+        return {'hosts': self.hosts, 'groups': self.groups, 'depth': self.depth,
+                'vars_per_host': self.vars_per_host, 'layout': self.layout}
+
+
+def host_name(index: int) -> str:
+    return 'host{:06d}.example.com'.format(index)
+
+
+def leaf_group_name(index: int) -> str:
+    return 'group{:04d}'.format(index)
+
+
+def host_variables(index: int, vars_per_host: int) -> Dict[str, str]:
+    variables = {
+        'ansible_host': '10.{}.{}.{}'.format(index >> 16, (index >> 8) & 255, index & 255)}
+    for var_index in range(1, vars_per_host):
+        variables['var{}'.format(var_index)] = 'value{}'.format(
+            (index + var_index) % VALUES_PER_VARIABLE)
+    return variables
+
+
+def group_tree(groups: int, depth: int) -> Dict[str, List[str]]:
+    """Children of each parent group, every level has four times fewer groups"""
+    children: Dict[str, List[str]] = {}
+    level_groups = [leaf_group_name(index) for index in range(groups)]
+    for level in range(1, depth + 1):
+        parents = ['level{}_{:04d}'.format(level, index)
+                   for index in range(max(len(level_groups) // 4, 1))]
+        for index, group in enumerate(level_groups):
+            children.setdefault(parents[index % len(parents)], []).append(group)
+        level_groups = parents
+    return children
+
+
+def _group_hosts(spec: InventorySpec) -> Dict[str, List[int]]:
+    group_hosts: Dict[str, List[int]] = {leaf_group_name(index): []
+                                         for index in range(spec.groups)}
+    for index in range(spec.hosts):
+        group_hosts[leaf_group_name(index % spec.groups)].append(index)
+    return group_hosts
+
+
+def _write_yaml(path: str, spec: InventorySpec, inline_vars: bool) -> None:
+    lines = []
+    for group, host_indices in _group_hosts(spec).items():
+        lines += ['{}:'.format(group), '  hosts:']
+        for index in host_indices:
+            lines.append('    {}:'.format(host_name(index)))
+            if inline_vars:
+                lines += ['      {}: {}'.format(key, value)
+                          for key, value in host_variables(index, spec.vars_per_host).items()]
+    for parent, children in group_tree(spec.groups, spec.depth).items():
+        lines += ['{}:'.format(parent), '  children:']
+        lines += ['    {}:'.format(child) for child in children]
+    with open(path, 'w') as inventory_file:
+        inventory_file.write('\n'.join(lines) + '\n')
+
+
+def _write_ini(path: str, spec: InventorySpec) -> None:
+    lines = []
+    for group, host_indices in _group_hosts(spec).items():
+        lines.append('[{}]'.format(group))
+        lines += [' '.join([host_name(index)] + [
+            '{}={}'.format(key, value)
+            for key, value in host_variables(index, spec.vars_per_host).items()])
+            for index in host_indices]
+    for parent, children in group_tree(spec.groups, spec.depth).items():
+        lines.append('[{}:children]'.format(parent))
+        lines += children
+    with open(path, 'w') as inventory_file:
+        inventory_file.write('\n'.join(lines) + '\n')
+
+
+def _write_host_vars(directory: str, spec: InventorySpec) -> None:
+    host_vars_dir = os.path.join(directory, 'host_vars')
+    os.makedirs(host_vars_dir, exist_ok=True)
+    for index in range(spec.hosts):
+        with open(os.path.join(host_vars_dir, host_name(index) + '.yml'), 'w') as vars_file:
+            vars_file.write(''.join('{}: {}\n'.format(key, value) for key, value in
+                                    host_variables(index, spec.vars_per_host).items()))
+
+
+def generate_inventory(directory: str, spec: InventorySpec) -> str:
+    """Write the inventory into the directory
+
+    :return: Path of the inventory file to pass to ansible
+    :rtype: str
+    """
+    os.makedirs(directory, exist_ok=True)
+    if spec.layout == INI_LAYOUT:
+        path = os.path.join(directory, 'hosts.ini')
+        _write_ini(path, spec)
+        return path
+    path = os.path.join(directory, 'hosts.yml')
+    _write_yaml(path, spec, inline_vars=spec.layout == YAML_LAYOUT)
+    if spec.layout == HOST_VARS_LAYOUT:
+        _write_host_vars(directory, spec)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory')
+    parser.add_argument('--hosts', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--vars-per-host', type=int, default=10)
+    parser.add_argument('--layout', choices=LAYOUTS, default=YAML_LAYOUT)
+    args = parser.parse_args()
+    print(generate_inventory(args.directory, InventorySpec(
+        args.hosts, args.groups, args.depth, args.vars_per_host, args.layout)))
+
+
+if __name__ == "__main__":
+    main()
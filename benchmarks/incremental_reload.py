@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Reload time of an inventory directory against the number of changed files
+
+Compares parsing the whole directory with ansible against the incremental
+reload, which parses only the changed files.
+
+Usage: python benchmarks/incremental_reload.py [--files 200] [--hosts-per-file 20]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from ansibleconnect.incrementalinventory import IncrementalInventory
+from ansibleconnect.inventoryadapter import parse_inventory
+
+
+def write_inventory_file(path: str, file_index: int, hosts_count: int, revision: int) -> None:
+    lines = ['group{}:'.format(file_index), '  hosts:']
+    for host_index in range(hosts_count):
+        lines += ['    host{}-{}:'.format(file_index, host_index),
+                  '      rack: {}'.format(host_index % 10),
+                  '      revision: {}'.format(revision)]
+    with open(path, 'w') as inventory_file:
+        inventory_file.write('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--hosts-per-file', type=int, default=20)
+    args = parser.parse_args()
+
+    inventory_dir = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(inventory_dir, 'hosts{:05d}.yml'.format(index))
+                 for index in range(args.files)]
+        for index, path in enumerate(paths):
+            write_inventory_file(path, index, args.hosts_per_file, 0)
+        start = time.perf_counter()
+        parse_inventory(inventory_dir)
+        print("full parse of {} files, {} hosts: {:.0f} ms".format(
+            args.files, args.files * args.hosts_per_file, (time.perf_counter() - start) * 1000))
+        inventory = IncrementalInventory(inventory_dir)
+        print("initial incremental load: {:.0f} ms".format(inventory.update().elapsed * 1000))
+        print("{:>14} {:>14} {:>10}".format('changed files', 'updated hosts', 'reload ms'))
+        changed_counts = sorted({count for count in (0, 1, 10, args.files // 10, args.files)
+                                 if count <= args.files})
+        for revision, changed_count in enumerate(changed_counts, start=1):
+            for index, path in enumerate(paths[:changed_count]):
+                write_inventory_file(path, index, args.hosts_per_file, revision)
+                # Same size and modification time within the file system's resolution
+                # would make the change undetectable
+                os.utime(path, ns=(0, os.stat(path).st_mtime_ns + revision * 10 ** 9))
+            update = inventory.update()
+            print("{:>14} {:>14} {:>10.1f}".format(
+                len(update.parsed_files), update.updated_hosts_count, update.elapsed * 1000))
+    finally:
+        shutil.rmtree(inventory_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Time each stage of ansibleconnect on synthetic inventories
+
+Every inventory is benchmarked in a separate process, so that the ansible
+import and peak memory are measured from a clean start. Results are written
+as JSON, which can be compared with results of another commit.
+
+Usage: python benchmarks/run_benchmarks.py [--hosts 1000 10000 100000]
+                                           [--layouts yaml ini host_vars]
+                                           [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from generate_inventory import LAYOUTS, InventorySpec, generate_inventory, leaf_group_name
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.stages[name] = {'seconds': time.perf_counter() - start,
+                             'peak_rss_mb': _peak_rss_mb()}
+
+
+def run_stages(spec: InventorySpec, work_dir: str) -> dict:
+    inventory_path = generate_inventory(os.path.join(work_dir, 'inventory'), spec)
+    os.environ['XDG_CACHE_HOME'] = os.path.join(work_dir, 'cache')
+    timer = StageTimer()
+    with timer.stage('ansible_import'):
+        import ansible.inventory.manager  # noqa: F401
+        import ansible.parsing.dataloader  # noqa: F401
+    from ansible import __version__ as ansible_version
+
+    from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+    from ansibleconnect.commandrenderer import ConnectionCommandRenderer
+    from ansibleconnect.inventoryadapter import InventoryAdapter
+    from ansibleconnect.tmuxpresenter import create_tmux_script
+
+    # Both loads go through the inventory cache, like ansibleconnect runs by default
+    with timer.stage('inventory_load'):
+        InventoryAdapter(inventory_path, use_cache=True, refresh_cache=True)
+    with timer.stage('inventory_cache_load'):
+        inventory = InventoryAdapter(inventory_path, use_cache=True)
+    with timer.stage('get_hosts_by_group'):
+        inventory.get_hosts_by_group([leaf_group_name(0), 'level1_0000'], [leaf_group_name(1)])
+    all_hosts = inventory.get_hosts_by_group([], [])
+    with timer.stage('get_hosts_by_variables'):
+        inventory.get_hosts_by_variables(all_hosts, [('var1', 'value1'), ('var2', None)],
+                                         [('var3', 'value3')])
+    with timer.stage('host_adapters'):
+        renderer = ConnectionCommandRenderer()
+        hosts_adapters = [AnsibleHostAdapter(host, renderer=renderer) for host in all_hosts]
+    with timer.stage('create_tmux_script'):
+        create_tmux_script(hosts_adapters, use_windows=False, max_panes_per_window=25)
+    return {'spec': spec.to_dict(), 'ansible': ansible_version, 'hosts_loaded': len(all_hosts),
+            'stages': timer.stages, 'peak_rss_mb': _peak_rss_mb()}
+
+
+def run_worker(spec: InventorySpec) -> dict:
+    """Benchmark the inventory in a new process"""
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(spec.to_dict())],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError('Benchmark of {} failed:\n{}'.format(spec.to_dict(), process.stderr))
+    return json.loads(process.stdout)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_result(result: dict) -> None:
+    print("{hosts} hosts, {groups} groups, depth {depth}, {vars_per_host} vars, "
+          "{layout}:".format(**result['spec']))
+    for name, stage in result['stages'].items():
+        print("  {:<24} {:>10.1f} ms {:>8.0f} MB".format(name, stage['seconds'] * 1000,
+                                                         stage['peak_rss_mb']))
+
+
+def print_comparison(results: List[dict], baseline: dict) -> None:
+    baseline_results = {json.dumps(result['spec'], sort_keys=True): result
+                        for result in baseline['results']}
+    print("compared with {}:".format(baseline.get('commit') or 'baseline'))
+    for result in results:
+        baseline_result = baseline_results.get(json.dumps(result['spec'], sort_keys=True))
+        if baseline_result is None:
+            continue
+        print("{hosts} hosts, {layout}:".format(**result['spec']))
+        for name, stage in result['stages'].items():
+            baseline_stage = baseline_result['stages'].get(name)
+            if not baseline_stage or not baseline_stage['seconds']:
+                continue
+            change = stage['seconds'] / baseline_stage['seconds'] - 1
+            print("  {:<24} {:>10.1f} ms -> {:>10.1f} ms {:>+7.0%}".format(
+                name, baseline_stage['seconds'] * 1000, stage['seconds'] * 1000, change))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--vars-per-host', type=int, default=10)
+    parser.add_argument('--layouts', nargs='+', choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None,
+                        help='Results of a previous run to compare with')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_stages(InventorySpec(**json.loads(args.worker)), work_dir)
+        json.dump(result, sys.stdout)
+        return
+    results = []
+    for hosts in args.hosts:
+        for layout in args.layouts:
+            result = run_worker(InventorySpec(hosts, args.groups, args.depth,
+                                              args.vars_per_host, layout))
+            print_result(result)
+            results.append(result)
+    report = {
+        'commit': _git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print("results written to {}".format(args.output))
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print_comparison(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -37,5 +37,6 @@ setup(
     entry_points='''
     [console_scripts]
     ansibleconnect=ansibleconnect.main:main
+    ansibleconnect-complete=ansibleconnect.completion:main
     '''
 )
@@ -0,0 +1,42 @@
+import os
+import stat
+from typing import Optional, Tuple
+from unittest.mock import Mock
+
+from ansibleconnect.connections import SSHConnectionCommand
+
+# Fake ssh logs its arguments, sleeps for hosts named slow and fails for hosts
+# named unreachable. Otherwise it runs the remote command, which ssh gets as
+# the last argument, unless it only opens a master connection (-N).
+FAKE_SSH = """#!/bin/sh
+echo "$@" >> {log}
+for last; do :; done
+case "$*" in
+    *slow*) sleep 5;;
+    *unreachable*) echo "connection refused" >&2; exit 255;;
+esac
+case " $* " in
+    *" -N "*) ;;
+    *) sh -c "$last";;
+esac
+"""
+
+
+def create_host(host_name: str, host_variables: Optional[dict] = None) -> Mock:
+    """Stand-in for AnsibleHostAdapter with the ssh connection of the host variables"""
+    return Mock(host_name=host_name,
+                connection=SSHConnectionCommand(host_name, host_variables or {}))
+
+
+def write_fake_ssh(directory: str) -> Tuple[str, str]:
+    """Write the FAKE_SSH executable to the directory
+
+    :return: Paths of the executable and of the log of its calls
+    :rtype: tuple
+    """
+    ssh_path = os.path.join(directory, 'ssh')
+    log_path = os.path.join(directory, 'ssh.log')
+    with open(ssh_path, 'w') as ssh_file:
+        ssh_file.write(FAKE_SSH.format(log=log_path))
+    os.chmod(ssh_path, stat.S_IRWXU)
+    return ssh_path, log_path
@@ -1,15 +1,22 @@
 import unittest
 import os
+import tempfile
 
 from unittest.mock import Mock, patch
 
-from ansibleconnect.ansible_config_adapter import get_dict_of_ansible_config_options
+from ansibleconnect.ansible_config_adapter import AnsibleConfig, \
+    get_dict_of_ansible_config_options, \
+    load_ansible_config
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'files')
 TEST_ANSIBLE_CFG = os.path.join(TEST_DATA_DIR, 'test_ansible_config.cfg')
 
 
 class TestGetDictOfAnsibleConfigOptions(unittest.TestCase):
+    def setUp(self) -> None:
+        load_ansible_config.cache_clear()
+        self.addCleanup(load_ansible_config.cache_clear)
+
     @patch('ansibleconnect.ansible_config_adapter.get_ansible_config_filepath',
            Mock(return_value=TEST_ANSIBLE_CFG))
     def test_options_from_all_sections_are_put_as_dict_items(self):
@@ -18,3 +25,55 @@ class TestGetDictOfAnsibleConfigOptions(unittest.TestCase):
                          'test': 'option'}
         result_dict = get_dict_of_ansible_config_options()
         self.assertDictEqual(expected_dict, result_dict)
+
+
+class TestLoadAnsibleConfig(unittest.TestCase):
+    def setUp(self) -> None:
+        load_ansible_config.cache_clear()
+        self.addCleanup(load_ansible_config.cache_clear)
+
+    @patch('ansibleconnect.ansible_config_adapter.get_ansible_config_filepath',
+           Mock(return_value=TEST_ANSIBLE_CFG))
+    def test_config_file_is_parsed_once(self):
+        with patch('configparser.ConfigParser.read') as read_mock:
+            load_ansible_config()
+            load_ansible_config()
+        read_mock.assert_called_once_with(TEST_ANSIBLE_CFG)
+
+    @patch('ansibleconnect.ansible_config_adapter.get_ansible_config_filepath',
+           Mock(return_value=''))
+    def test_empty_config_when_there_is_no_config_file(self):
+        self.assertDictEqual({}, dict(load_ansible_config().connection_options('ssh')))
+
+    def test_values_are_not_interpolated(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.cfg') as config_file:
+            config_file.write('[ssh_connection]\ncontrol_path = %(directory)s/%%h-%%r\n')
+            config_file.flush()
+            with patch('ansibleconnect.ansible_config_adapter.get_ansible_config_filepath',
+                       Mock(return_value=config_file.name)):
+                options = load_ansible_config().connection_options('ssh')
+        self.assertEqual('%(directory)s/%%h-%%r', options['control_path'])
+
+
+class TestAnsibleConfig(unittest.TestCase):
+    def test_connection_section_takes_precedence_over_defaults(self):
+        config = AnsibleConfig({'defaults': {'ssh_args': 'defaults_arg', 'remote_user': 'user'},
+                                'ssh_connection': {'ssh_args': 'connection_arg'}})
+        connection_options = config.connection_options('ssh')
+        self.assertEqual('connection_arg', connection_options['ssh_args'])
+        self.assertEqual('user', connection_options['remote_user'])
+
+    def test_sections_of_other_connection_plugins_are_ignored(self):
+        config = AnsibleConfig({'defaults': {'ssh_args': 'defaults_arg'},
+                                'paramiko_connection': {'ssh_args': 'paramiko_arg',
+                                                        'record_host_keys': 'False'},
+                                'persistent_connection': {'command_timeout': '30'}})
+        connection_options = config.connection_options('ssh')
+        self.assertEqual('defaults_arg', connection_options['ssh_args'])
+        self.assertNotIn('record_host_keys', connection_options)
+        self.assertNotIn('command_timeout', connection_options)
+
+    def test_connection_options_are_read_only(self):
+        config = AnsibleConfig({'defaults': {'remote_user': 'user'}})
+        with self.assertRaises(TypeError):
+            config.connection_options('ssh')['remote_user'] = 'other'
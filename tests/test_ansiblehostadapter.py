@@ -0,0 +1,31 @@
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.inventorysnapshot import SnapshotHost
+
+TEST_CONFIG = AnsibleConfig({'defaults': {'remote_user': 'config_user'}})
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config', Mock(return_value=TEST_CONFIG))
+class TestAnsibleHostAdapter(unittest.TestCase):
+    def test_config_options_are_used_in_connection_command(self):
+        host = SnapshotHost('test_host', {'ansible_host': '10.0.0.1'}, [])
+        self.assertIn('config_user@10.0.0.1', AnsibleHostAdapter(host).connection_command)
+
+    def test_host_variables_take_precedence_over_config_options(self):
+        host = SnapshotHost('test_host', {'ansible_host': '10.0.0.1', 'remote_user': 'host_user'},
+                            [])
+        self.assertIn('host_user@10.0.0.1', AnsibleHostAdapter(host).connection_command)
+
+    def test_host_variables_are_not_modified(self):
+        host_vars = {'ansible_host': '10.0.0.1'}
+        AnsibleHostAdapter(SnapshotHost('test_host', host_vars, []))
+        self.assertDictEqual({'ansible_host': '10.0.0.1'}, host_vars)
+
+    def test_get_variable_returns_magic_variables(self):
+        host = SnapshotHost('test_host', {}, ['groupB', 'groupA', 'all'])
+        self.assertListEqual(['groupA', 'groupB'],
+                             AnsibleHostAdapter(host).get_variable('group_names'))
@@ -0,0 +1,88 @@
+import io
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.commandrenderer import ConnectionCommandRenderer
+from ansibleconnect.inventorysnapshot import SnapshotHost
+
+TEST_CONFIG = AnsibleConfig({'defaults': {'remote_user': 'config_user'}})
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config', Mock(return_value=TEST_CONFIG))
+class TestConnectionCommandRenderer(unittest.TestCase):
+    def assert_rendered_as_built_from_scratch(self, hosts, **adapter_kwargs):
+        renderer = ConnectionCommandRenderer()
+        expected_commands = [AnsibleHostAdapter(host, **adapter_kwargs).connection_command
+                             for host in hosts]
+        commands = renderer.render_all([AnsibleHostAdapter(host, renderer=renderer,
+                                                           **adapter_kwargs)
+                                        for host in hosts])
+        self.assertListEqual(expected_commands, commands)
+        return renderer
+
+    def test_hosts_of_the_same_profile_share_template(self):
+        hosts = [SnapshotHost('host{}'.format(index),
+                              {'ansible_host': '10.0.0.{}'.format(index),
+                               'ansible_user': 'admin', 'ansible_port': 2222,
+                               'rack': index}, [])
+                 for index in range(10)]
+        renderer = self.assert_rendered_as_built_from_scratch(hosts)
+        self.assertEqual(1, renderer.profiles_count)
+        self.assertEqual(9, renderer.cache_hits)
+
+    def test_hosts_of_different_profiles_get_their_own_templates(self):
+        hosts = [
+            SnapshotHost('host1', {'ansible_host': '10.0.0.1', 'ansible_user': 'admin'}, []),
+            SnapshotHost('host2', {'ansible_host': '10.0.0.2', 'ansible_user': 'other'}, []),
+            SnapshotHost('host3', {'ansible_host': '10.0.0.3',
+                                   'ansible_ssh_private_key_file': 'key.pem'}, []),
+            SnapshotHost('host4', {'ansible_host': '10.0.0.4', 'ansible_password': 'secret'}, []),
+            SnapshotHost('host5', {'ansible_host': '10.0.0.5', 'ansible_user': 'admin'}, []),
+        ]
+        renderer = self.assert_rendered_as_built_from_scratch(hosts)
+        self.assertEqual(4, renderer.profiles_count)
+        self.assertEqual(1, renderer.cache_hits)
+
+    def test_hosts_without_address_are_connected_by_name(self):
+        hosts = [SnapshotHost('host1', {}, []), SnapshotHost('host2', {}, []),
+                 SnapshotHost('host3', {'ansible_ssh_host': '10.0.0.3'}, []),
+                 SnapshotHost('host4', {'ansible_ssh_host': '10.0.0.4',
+                                        'ansible_host': '10.0.1.4'}, [])]
+        renderer = self.assert_rendered_as_built_from_scratch(hosts)
+        self.assertEqual(3, renderer.profiles_count)
+
+    def test_address_of_default_variables_takes_precedence_over_lower_priority_key(self):
+        hosts = [SnapshotHost('host{}'.format(index),
+                              {'ansible_host': '10.0.0.{}'.format(index)}, [])
+                 for index in range(3)]
+        self.assert_rendered_as_built_from_scratch(
+            hosts, default_variables={'ansible_ssh_host': 'shared.example.com'})
+
+    def test_shared_bastion_connections_use_separate_templates(self):
+        host_vars = {'ansible_ssh_common_args': '-o ProxyJump=jump.example.com'}
+        renderer = ConnectionCommandRenderer()
+        hosts = [AnsibleHostAdapter(SnapshotHost('host', host_vars, []), share_bastions=True,
+                                    renderer=renderer),
+                 AnsibleHostAdapter(SnapshotHost('host', host_vars, []), renderer=renderer)]
+        commands = renderer.render_all(hosts)
+        self.assertNotEqual(commands[0], commands[1])
+        self.assertEqual(2, renderer.profiles_count)
+
+    def test_host_with_unhashable_variables_is_rendered_without_template(self):
+        hosts = [SnapshotHost('host1', {'ansible_host': '10.0.0.1',
+                                        'ansible_port': [2222]}, []),
+                 SnapshotHost('host2', {'ansible_host': '10.0.0.2'}, [])]
+        renderer = self.assert_rendered_as_built_from_scratch(hosts)
+        self.assertEqual(1, renderer.uncached_count)
+        self.assertEqual(1, renderer.profiles_count)
+
+    def test_report_contains_cache_hits(self):
+        renderer = ConnectionCommandRenderer()
+        renderer.render_all([AnsibleHostAdapter(SnapshotHost('host{}'.format(index), {}, []),
+                                                renderer=renderer) for index in range(3)])
+        report = io.StringIO()
+        renderer.report(report)
+        self.assertIn('3 rendered from 1 templates, 2 template cache hits', report.getvalue())
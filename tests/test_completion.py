@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from ansibleconnect.completion import complete, load_completion_indexes, split_command_line, \
+    strip_wordbreaks
+from ansibleconnect.completionindex import MAX_VALUES_PER_VARIABLE, CompletionIndex
+from ansibleconnect.inventoryadapter import InventoryAdapter
+from ansibleconnect.inventorysnapshot import InventorySnapshot, SnapshotHost
+
+TEST_INVENTORY_FILE = os.path.join(os.path.dirname(__file__), 'files', 'inventory.yml')
+TEST_INDEX = CompletionIndex(['groupA', 'groupB', 'web'], ['10.0.0.4', 'web1', 'web2'],
+                             {'hostvar': ['test', 'test2'], 'myname': ['Dhost1']})
+
+
+class TestCompletionIndex(unittest.TestCase):
+    def test_index_holds_groups_hosts_and_typeable_values(self):
+        snapshot = InventorySnapshot({
+            'host1': SnapshotHost('host1', {'role': 'web', 'port': 22, 'url': 'http://x'}, []),
+            'host2': SnapshotHost('host2', {'role': 'db', 'zones': ['a']}, []),
+        }, {})
+        index = CompletionIndex.from_snapshot(snapshot)
+        self.assertListEqual(['host1', 'host2'], index.hosts)
+        self.assertDictEqual({'port': [], 'role': ['db', 'web'], 'url': [], 'zones': []},
+                             index.variables)
+
+    def test_variables_with_too_many_values_keep_only_their_names(self):
+        hosts = {str(number): SnapshotHost(str(number), {'id': str(number)}, [])
+                 for number in range(MAX_VALUES_PER_VARIABLE + 1)}
+        index = CompletionIndex.from_snapshot(InventorySnapshot(hosts, {}))
+        self.assertListEqual([], index.variables['id'])
+
+
+class TestComplete(unittest.TestCase):
+    def test_groups_and_hosts_are_completed_after_last_pattern_separator(self):
+        self.assertListEqual(['groupA:!web', 'groupA:!web1', 'groupA:!web2'],
+                             complete(['-g', 'groupA:!we'], TEST_INDEX))
+
+    def test_hosts_are_completed_in_comma_separated_list(self):
+        self.assertListEqual(['web1,web2'], complete(['--hosts', 'web1,web2'], TEST_INDEX))
+
+    def test_variable_names_and_values_are_completed(self):
+        self.assertListEqual(['hostvar'], complete(['-vars', 'host'], TEST_INDEX))
+        self.assertListEqual(['myname:Dhost1,hostvar:test', 'myname:Dhost1,hostvar:test2'],
+                             complete(['-vars', 'myname:Dhost1,hostvar:'], TEST_INDEX))
+
+    def test_long_flag_with_equal_sign_is_completed(self):
+        self.assertListEqual(['--groups=groupA', '--groups=groupB'],
+                             complete(['--groups=gro'], TEST_INDEX))
+
+    def test_other_arguments_are_not_completed(self):
+        self.assertListEqual([], complete(['-i', 'inv'], TEST_INDEX))
+
+    def test_words_of_command_are_split_after_program_name(self):
+        self.assertListEqual(['-i', 'inventory.yml', '-g', 'group 1'],
+                             split_command_line("source <(ansibleconnect -i inventory.yml "
+                                                "-g 'group 1"))
+        self.assertListEqual(['-g', ''], split_command_line('ansibleconnect -g '))
+
+    def test_completions_are_stripped_to_the_word_completed_by_bash(self):
+        self.assertListEqual(['!web1', '!web2'],
+                             strip_wordbreaks('groupA:!we', ['groupA:!web1', 'groupA:!web2'],
+                                              ':'))
+
+
+class TestCompletionIndexCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.inventory_file = os.path.join(self.temp_dir, 'inventory.yml')
+        shutil.copy(TEST_INVENTORY_FILE, self.inventory_file)
+        env_patcher = patch.dict(os.environ,
+                                 {'XDG_CACHE_HOME': os.path.join(self.temp_dir, 'cache')})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    @patch('ansibleconnect.completion._refresh_in_background')
+    def test_index_is_saved_with_cached_inventory(self, refresh_mock):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        index = load_completion_indexes([self.inventory_file])
+        self.assertIn('groupA', index.groups)
+        self.assertIn('192.168.0.3', index.hosts)
+        self.assertListEqual(['test', 'test2'], index.variables['hostvar'])
+        refresh_mock.assert_not_called()
+
+    @patch('ansibleconnect.completion._refresh_in_background')
+    def test_stale_index_is_used_and_refreshed(self, refresh_mock):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        with open(self.inventory_file, 'a') as inventory_file:
+            inventory_file.write('\n')
+        self.assertIn('groupA', load_completion_indexes([self.inventory_file]).groups)
+        refresh_mock.assert_called_once_with(self.inventory_file)
+
+    @patch('ansibleconnect.completion._refresh_in_background')
+    def test_missing_index_is_refreshed(self, refresh_mock):
+        self.assertListEqual([], load_completion_indexes([self.inventory_file]).hosts)
+        refresh_mock.assert_called_once_with(self.inventory_file)
+
+    def test_completion_does_not_import_ansible(self):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        check_script = ("import sys; "
+                        "from ansibleconnect.completion import main; "
+                        "main([sys.argv[1]]); "
+                        "print('ansible' in sys.modules)")
+        output = subprocess.check_output(
+            [sys.executable, '-c', check_script,
+             'ansibleconnect -i {} -g groupA:gr'.format(self.inventory_file)])
+        self.assertListEqual(['groupA', 'groupB', 'groupC', 'groupD', 'groupE', 'groupF',
+                              'False'], output.decode().split())
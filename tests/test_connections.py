@@ -157,3 +157,77 @@ class TestSSHConnectionCommand(unittest.TestCase):
         test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
         expected_executable = '/test/exec'
         self.assertIn(expected_executable, str(test_ssh_connection_command))
+
+    def test_get_address_returns_ansible_host_and_port(self):
+        test_host_vars = {
+            'ansible_host': '10.0.0.1',
+            'ansible_port': '2222'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        self.assertEqual(('10.0.0.1', 2222), test_ssh_connection_command.get_address())
+
+    def test_get_address_returns_host_name_and_default_port(self):
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', {})
+        self.assertEqual(('test_hostname', 22), test_ssh_connection_command.get_address())
+
+    def test_uses_proxy_when_proxy_command_is_in_ssh_common_args(self):
+        test_host_vars = {
+            'ansible_ssh_common_args': '-o ProxyCommand="ssh -W %h:%p -q root@1.2.3.4"'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        self.assertTrue(test_ssh_connection_command.uses_proxy())
+
+    def test_uses_proxy_when_jump_host_is_in_ssh_extra_args(self):
+        test_host_vars = {
+            'ansible_ssh_extra_args': '-J root@1.2.3.4'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        self.assertTrue(test_ssh_connection_command.uses_proxy())
+
+    def test_does_not_use_proxy_by_default(self):
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', {})
+        self.assertFalse(test_ssh_connection_command.uses_proxy())
+
+    def test_control_path_option_is_added_when_control_path_is_set(self):
+        test_host_vars = {
+            'control_path': '%(directory)s/%%h-%%r',
+            'control_path_dir': '/test/cp'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        self.assertIn('-o ControlPath=/test/cp/%h-%r', str(test_ssh_connection_command))
+
+    def test_no_control_path_option_when_control_path_is_not_set(self):
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', {})
+        self.assertNotIn('ControlPath', str(test_ssh_connection_command))
+
+    def test_master_connection_command_runs_in_background_without_prompts(self):
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', {})
+        master_command = test_ssh_connection_command.master_connection_command(5)
+        self.assertTrue(master_command.endswith('-o ConnectTimeout=5 -o BatchMode=yes'
+                                                ' -f -N test_hostname'))
+
+    def test_control_persist_of_master_connection_takes_precedence(self):
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', {})
+        master_command = test_ssh_connection_command.master_connection_command(5, 90)
+        self.assertLess(master_command.index('ControlPersist=90s'),
+                        master_command.index('ControlPersist=60s'))
+
+    def test_master_connection_command_allows_password_prompt_with_sshpass(self):
+        test_host_vars = {
+            'ansible_password': 'testpass'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        master_command = test_ssh_connection_command.master_connection_command(5)
+        self.assertIn('sshpass -p "testpass"', master_command)
+        self.assertNotIn('BatchMode', master_command)
+
+    def test_proxy_command_is_replaced_when_bastion_connection_is_shared(self):
+        test_host_vars = {
+            'ansible_ssh_common_args': '-J admin@jump'
+        }
+        test_ssh_connection_command = SSHConnectionCommand('test_hostname', test_host_vars)
+        test_ssh_connection_command.share_bastion_connection('/test/%%C')
+        self.assertIn('-o ProxyCommand="ssh -o ControlMaster=auto -o ControlPersist=60s '
+                      '-o ControlPath=/test/%%C -W %h:%p admin@jump"',
+                      str(test_ssh_connection_command))
+        self.assertNotIn('-J', str(test_ssh_connection_command))
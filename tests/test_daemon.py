@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from ansibleconnect.daemon import DaemonError, \
+    HotInventory, \
+    InventoryDaemon, \
+    request_daemon, \
+    serve
+from ansibleconnect.inventoryadapter import parse_inventory
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'files')
+TEST_INVENTORY_FILE = os.path.join(TEST_DATA_DIR, 'inventory.yml')
+
+
+class TestHotInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory_dir = tempfile.TemporaryDirectory()
+        self.inventory_path = os.path.join(self.inventory_dir.name, 'inventory.yml')
+        shutil.copy(TEST_INVENTORY_FILE, self.inventory_path)
+        self.hot_inventory = HotInventory([self.inventory_path], False, None)
+
+    def tearDown(self):
+        self.inventory_dir.cleanup()
+
+    def test_inventory_is_outdated_until_loaded(self):
+        self.assertTrue(self.hot_inventory.is_outdated())
+        self.hot_inventory.reload()
+        self.assertFalse(self.hot_inventory.is_outdated())
+
+    def test_inventory_is_outdated_after_its_file_changes(self):
+        self.hot_inventory.reload()
+        with open(self.inventory_path, 'a') as inventory_file:
+            inventory_file.write('groupD:\n  hosts:\n    10.0.0.99:\n')
+        self.assertTrue(self.hot_inventory.is_outdated())
+        inventory = self.hot_inventory.reload()
+        self.assertEqual(['10.0.0.99'], [host.name for host in
+                                         inventory.get_hosts_by_pattern('groupD')])
+
+    def test_only_changed_files_of_inventory_directory_are_parsed(self):
+        other_path = os.path.join(self.inventory_dir.name, 'other.yml')
+        with open(other_path, 'w') as inventory_file:
+            inventory_file.write('groupZ:\n  hosts:\n    10.0.0.99:\n')
+        hot_inventory = HotInventory([self.inventory_dir.name], False, None)
+        hot_inventory.reload()
+        with open(other_path, 'a') as inventory_file:
+            inventory_file.write('    10.0.0.100:\n')
+        with patch('ansibleconnect.incrementalinventory.parse_inventory',
+                   wraps=parse_inventory) as parse_inventory_mock:
+            inventory = hot_inventory.reload()
+        parse_inventory_mock.assert_called_once_with(other_path)
+        self.assertEqual(['10.0.0.99', '10.0.0.100'],
+                         [host.name for host in inventory.get_hosts_by_pattern('groupZ')])
+
+
+class TestInventoryDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory_daemon = InventoryDaemon()
+
+    def _run(self, *argv):
+        return self.inventory_daemon.handle_request({
+            'argv': list(argv), 'cwd': TEST_DATA_DIR,
+            'environment': {'SSH_AUTH_SOCK': '/tmp/client-agent'}})
+
+    def test_script_is_created_with_the_environment_of_the_client(self):
+        response = self._run('-i', 'inventory.yml', '--no-cache', '-g', 'groupA')
+        self.assertEqual(0, response['exit_code'])
+        self.assertIn('tmux', response['stdout'])
+        self.assertIn('/tmp/client-agent', response['stdout'])
+        self.assertNotEqual('/tmp/client-agent', os.environ.get('SSH_AUTH_SOCK'))
+
+    def test_inventory_is_loaded_once_for_the_same_sources(self):
+        self._run('-i', 'inventory.yml', '--no-cache', '-g', 'groupA')
+        with patch('ansibleconnect.daemon.InventoryAdapter') as inventory_adapter:
+            response = self._run('-i', TEST_INVENTORY_FILE, '--no-cache', '-g', 'groupB')
+        inventory_adapter.assert_not_called()
+        self.assertEqual(0, response['exit_code'])
+
+    def test_exit_code_and_output_of_failed_run_are_returned(self):
+        response = self._run('-i', 'inventory.yml', '--no-cache', '-g', 'missing')
+        self.assertEqual(1, response['exit_code'])
+        self.assertIn('echo', response['stdout'])
+
+    def test_ansible_config_of_client_directory_is_used(self):
+        with tempfile.TemporaryDirectory() as client_dir:
+            shutil.copy(TEST_INVENTORY_FILE, client_dir)
+            with open(os.path.join(client_dir, 'ansible.cfg'), 'w') as config_file:
+                config_file.write('[ssh_connection]\nssh_args = -o ClientConfig=yes\n')
+            response = self.inventory_daemon.handle_request({
+                'argv': ['-i', 'inventory.yml', '--no-cache', '-g', 'groupA'],
+                'cwd': client_dir, 'environment': {}})
+        self.assertEqual(0, response['exit_code'])
+        self.assertIn('ClientConfig=yes', response['stdout'])
+        self.assertNotEqual(client_dir, os.getcwd())
+        response = self._run('-i', 'inventory.yml', '--no-cache', '-g', 'groupA')
+        self.assertNotIn('ClientConfig=yes', response['stdout'])
+
+    def test_relative_vault_password_file_is_read_from_client_directory(self):
+        response = self._run('-i', 'vault_inventory.yml', '--no-cache',
+                             '--vault-password-file', 'vault_password')
+        self.assertEqual(0, response['exit_code'])
+        self.assertIn('hunter2', response['stdout'])
+
+    def test_invalid_arguments_are_reported(self):
+        response = self._run('--bogus')
+        self.assertEqual(2, response['exit_code'])
+        self.assertIn('unrecognized arguments', response['stderr'])
+
+
+class TestServe(unittest.TestCase):
+
+    def setUp(self):
+        self.socket_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.socket_dir.name, 'daemon.sock')
+
+    def tearDown(self):
+        self.socket_dir.cleanup()
+
+    def test_socket_is_removed_when_daemon_stops(self):
+        with patch('socketserver.BaseServer.serve_forever', side_effect=KeyboardInterrupt):
+            serve(self.socket_path, 60)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_request_fails_without_daemon(self):
+        with self.assertRaises(DaemonError):
+            request_daemon({'argv': []}, self.socket_path)
+
+    def test_request_is_answered_by_the_daemon(self):
+        server_thread = threading.Thread(target=serve, args=(self.socket_path, 60), daemon=True)
+        server_thread.start()
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.05)
+        response = request_daemon({'argv': ['-i', TEST_INVENTORY_FILE, '--no-cache'],
+                                   'cwd': TEST_DATA_DIR}, self.socket_path)
+        self.assertEqual(0, response['exit_code'])
+        self.assertIn('tmux', response['stdout'])
+        with self.assertRaises(DaemonError):
+            serve(self.socket_path, 60)
@@ -0,0 +1,82 @@
+import io
+import shlex
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from ansibleconnect.connections import SSHConnectionCommand
+from ansibleconnect.fanout import ExecResult, exec_on_hosts, report_exec_results
+from ansibleconnect.parser import parse_arguments
+from tests.helpers import create_host, write_fake_ssh
+
+
+class TestExecOnHosts(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.ssh_path, _ = write_fake_ssh(self.temp_dir.name)
+
+    def create_host(self, host_name: str) -> Mock:
+        return create_host(host_name, {'ansible_ssh_executable': self.ssh_path})
+
+    def test_output_lines_are_prefixed_with_host_names(self):
+        output = io.StringIO()
+        results = exec_on_hosts([self.create_host('host1'), self.create_host('host10')],
+                                "echo 'one two'; printf last", concurrency=2, timeout=None,
+                                output=output)
+        self.assertListEqual(['one two\nlast', 'one two\nlast'],
+                             [result.output for result in results])
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertIn('host1  | one two\n', output.getvalue())
+        self.assertIn('host10 | last\n', output.getvalue())
+
+    def test_exit_codes_and_error_output_are_collected(self):
+        results = exec_on_hosts([self.create_host('unreachable'), self.create_host('host')],
+                                'exit 3', concurrency=1, timeout=None, output=io.StringIO())
+        self.assertListEqual([255, 3], [result.exit_code for result in results])
+        self.assertEqual('connection refused', results[0].output)
+
+    def test_commands_running_after_closing_their_output_are_killed(self):
+        async def close_output(*args):
+            pass
+
+        # Output ends right away, while ssh of the slow host keeps running
+        with patch('ansibleconnect.fanout._read_lines', close_output):
+            results = exec_on_hosts([self.create_host('slow')], 'true', concurrency=1,
+                                    timeout=0.5, output=io.StringIO())
+        self.assertTrue(results[0].timed_out)
+        self.assertLess(results[0].elapsed, 3)
+
+    def test_commands_over_timeout_are_killed(self):
+        results = exec_on_hosts([self.create_host('slow'), self.create_host('host')],
+                                'true', concurrency=2, timeout=0.5, output=io.StringIO())
+        self.assertTrue(results[0].timed_out)
+        self.assertLess(results[0].elapsed, 3)
+        self.assertTrue(results[1].succeeded)
+
+    def test_remote_command_runs_without_terminal(self):
+        command = SSHConnectionCommand('host', {}).remote_command("echo 'a b'", 10)
+        self.assertTrue(command.endswith(
+            ' -T -o ConnectTimeout=10 -o BatchMode=yes host ' + shlex.quote("echo 'a b'")))
+
+
+class TestReportExecResults(unittest.TestCase):
+    def test_exit_codes_slowest_hosts_and_identical_outputs_are_reported(self):
+        output = io.StringIO()
+        report_exec_results([ExecResult('host0', 0, 0.1, 'ok'),
+                             ExecResult('host1', 0, 0.3, 'ok'),
+                             ExecResult('host2', 1, 0.2, 'error\ndetails'),
+                             ExecResult('host3', None, 2.0, '')], 2.5, output)
+        report = output.getvalue()
+        self.assertIn('2 succeeded, 1 failed, 1 timed out in 2500 ms', report)
+        self.assertIn('exit status 1 on 1 hosts: host2', report)
+        self.assertIn('timed out on 1 hosts: host3', report)
+        self.assertIn('slowest: host3 2000 ms, host1 300 ms, host2 200 ms', report)
+        self.assertIn('same output on 2 hosts (ok): host0, host1', report)
+        self.assertIn('same output on 1 hosts (error): host2', report)
+
+
+class TestExecArguments(unittest.TestCase):
+    def test_exec_cannot_be_used_with_control_mode(self):
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            parse_arguments(['-i', 'inventory.yml', '--exec', 'uptime', '--control-mode'])
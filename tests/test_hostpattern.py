@@ -0,0 +1,59 @@
+import unittest
+
+from parameterized import parameterized
+
+from ansibleconnect.hostpattern import EXCLUSION, \
+    INTERSECTION, \
+    UNION, \
+    HostMembership, \
+    HostPatternError, \
+    compile_host_pattern
+
+TEST_MEMBERSHIP = HostMembership(
+    ['web1', 'web2', 'web3', 'db1', 'db2'],
+    {'all': ['web', 'db', 'prod'], 'web': [], 'db': [], 'prod': ['db'], 'empty': []},
+    {'web': ['web1', 'web2', 'web3'], 'db': ['db1', 'db2'], 'prod': ['web1'], 'empty': []},
+)
+
+
+class TestHostMembership(unittest.TestCase):
+    def test_group_bits_include_hosts_of_child_groups(self):
+        host_names = TEST_MEMBERSHIP.host_names_of(TEST_MEMBERSHIP.group_bits['prod'])
+        self.assertListEqual(['web1', 'db1', 'db2'], host_names)
+
+    def test_host_names_of_empty_bitset(self):
+        self.assertListEqual([], TEST_MEMBERSHIP.host_names_of(0))
+
+
+class TestCompileHostPattern(unittest.TestCase):
+    @parameterized.expand([
+        ('web:!prod', [(UNION, 'web', None), (EXCLUSION, 'prod', None)]),
+        ('web:&prod', [(UNION, 'web', None), (INTERSECTION, 'prod', None)]),
+        ('web[0:1],db', [(UNION, 'web', slice(0, 2)), (UNION, 'db', None)]),
+        ('web[2]', [(UNION, 'web', slice(2, 3))]),
+        ('web[1:]', [(UNION, 'web', slice(1, None))]),
+        ('~web[0-9]', [(UNION, '~web[0-9]', None)]),
+    ])
+    def test_terms(self, pattern, expected_terms):
+        terms = [(term.operator, term.expression, term.subscript)
+                 for term in compile_host_pattern(pattern).terms]
+        self.assertListEqual(expected_terms, terms)
+
+    def test_invalid_regular_expression_raises_host_pattern_error(self):
+        with self.assertRaises(HostPatternError):
+            compile_host_pattern('~web(')
+
+    @parameterized.expand([
+        ('', ['web1', 'web2', 'web3', 'db1', 'db2']),
+        ('all', ['web1', 'web2', 'web3', 'db1', 'db2']),
+        ('prod:!db', ['web1']),
+        ('!prod:&web', ['web2', 'web3']),
+        ('web:db:&prod', ['web1', 'db1', 'db2']),
+        ('web*', ['web1', 'web2', 'web3']),
+        ('~(web|db)1', ['web1', 'db1']),
+        ('web[-1]:db[0]', ['web3', 'db1']),
+        ('empty', []),
+    ])
+    def test_get_host_names(self, pattern, expected_host_names):
+        host_names = compile_host_pattern(pattern).get_host_names(TEST_MEMBERSHIP)
+        self.assertListEqual(expected_host_names, host_names)
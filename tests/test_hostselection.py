@@ -0,0 +1,22 @@
+import io
+import unittest
+
+from ansibleconnect.hostselection import skip_unsupported_hosts
+from ansibleconnect.inventorysnapshot import SnapshotHost
+
+
+class TestSkipUnsupportedHosts(unittest.TestCase):
+    def test_hosts_without_connection_command_are_skipped(self):
+        hosts = [SnapshotHost('web1', {}, []),
+                 SnapshotHost('localhost', {'ansible_connection': 'local'}, []),
+                 SnapshotHost('web2', {'ansible_connection': 'ssh'}, [])]
+        output = io.StringIO()
+        self.assertListEqual(['web1', 'web2'],
+                             [host.name for host in skip_unsupported_hosts(hosts, output)])
+        self.assertEqual('connection: localhost skipped, ansible_connection local '
+                         'is not supported\n', output.getvalue())
+
+    def test_nothing_is_reported_when_all_hosts_are_supported(self):
+        output = io.StringIO()
+        skip_unsupported_hosts([SnapshotHost('web1', {}, [])], output)
+        self.assertEqual('', output.getvalue())
@@ -0,0 +1,38 @@
+import unittest
+import io
+import sys
+
+from ansibleconnect.importprofile import ImportProfiler
+
+
+class TestImportProfiler(unittest.TestCase):
+    def setUp(self) -> None:
+        sys.modules.pop('json.tool', None)
+        self.import_profiler = ImportProfiler()
+
+    def test_newly_imported_module_is_recorded(self):
+        self.import_profiler.start()
+        try:
+            import json.tool  # noqa: F401
+        finally:
+            self.import_profiler.stop()
+        module_names = [record.module_name for record in self.import_profiler.records]
+        self.assertIn('json.tool', module_names)
+
+    def test_already_imported_module_is_not_recorded(self):
+        self.import_profiler.start()
+        try:
+            import os  # noqa: F401
+        finally:
+            self.import_profiler.stop()
+        self.assertListEqual([], self.import_profiler.records)
+
+    def test_report_contains_module_name(self):
+        self.import_profiler.start()
+        try:
+            import json.tool  # noqa: F401
+        finally:
+            self.import_profiler.stop()
+        report = io.StringIO()
+        self.import_profiler.report(report)
+        self.assertIn('json.tool', report.getvalue())
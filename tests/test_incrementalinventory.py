@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ansibleconnect.incrementalinventory import IncrementalInventory, list_inventory_files
+from ansibleconnect.inventoryadapter import parse_inventory
+
+WEB_INVENTORY = """web:
+  hosts:
+    web1:
+      team: ui
+    web2:
+      team: ui
+"""
+DB_INVENTORY = """db:
+  hosts:
+    db1:
+      team: data
+    web2:
+      backup: true
+"""
+
+
+class TestIncrementalInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory_dir = tempfile.mkdtemp()
+        self._write('10-web.yml', WEB_INVENTORY)
+        self._write('20-db.yml', DB_INVENTORY)
+        os.makedirs(os.path.join(self.inventory_dir, 'group_vars'))
+        self._write(os.path.join('group_vars', 'web.yml'), 'port: 22\n')
+        self.inventory = IncrementalInventory(self.inventory_dir)
+        self.inventory.update()
+
+    def tearDown(self):
+        shutil.rmtree(self.inventory_dir)
+
+    def _write(self, filename, content):
+        path = os.path.join(self.inventory_dir, filename)
+        with open(path, 'w') as inventory_file:
+            inventory_file.write(content)
+        # Modification time alone can stay the same within the file system's resolution
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+        return path
+
+    def _assert_matches_full_parse(self):
+        full_snapshot = parse_inventory(self.inventory_dir)
+        snapshot = self.inventory.snapshot
+        self.assertEqual(list(full_snapshot.hosts), list(snapshot.hosts))
+        for name, host in full_snapshot.hosts.items():
+            self.assertEqual(host.vars, snapshot.hosts[name].vars)
+        for name, group in full_snapshot.groups.items():
+            if name != 'ungrouped':
+                self.assertEqual([host.name for host in group.hosts],
+                                 [host.name for host in snapshot.groups[name].hosts])
+
+    def test_vars_directories_are_not_inventory_files(self):
+        self.assertEqual(['10-web.yml', '20-db.yml'],
+                         [os.path.basename(path)
+                          for path in list_inventory_files(self.inventory_dir)])
+
+    def test_inventory_matches_inventory_parsed_at_once(self):
+        self._assert_matches_full_parse()
+
+    def test_hosts_remember_their_files(self):
+        self.assertEqual(['10-web.yml', '20-db.yml'],
+                         [os.path.basename(path) for path in self.inventory.get_host_files('web2')])
+        self.assertEqual(['20-db.yml'],
+                         [os.path.basename(path) for path in self.inventory.get_group_files('db')])
+
+    def test_only_changed_file_is_parsed_again(self):
+        changed_path = self._write('20-db.yml', DB_INVENTORY.replace('data', 'storage'))
+        update = self.inventory.update()
+        self.assertEqual([changed_path], update.parsed_files)
+        self.assertEqual('storage', self.inventory.snapshot.hosts['db1'].vars['team'])
+        variable_index = self.inventory.snapshot.variable_index
+        self.assertSetEqual({'db1'}, variable_index.get_host_names('team', 'storage'))
+        self.assertSetEqual(set(), variable_index.get_host_names('team', 'data'))
+        self._assert_matches_full_parse()
+
+    def test_unchanged_inventory_is_not_parsed(self):
+        update = self.inventory.update()
+        self.assertEqual([], update.parsed_files)
+
+    def test_hosts_of_removed_file_are_removed(self):
+        os.remove(os.path.join(self.inventory_dir, '20-db.yml'))
+        update = self.inventory.update()
+        self.assertEqual(1, len(update.removed_files))
+        self.assertNotIn('db1', self.inventory.snapshot.hosts)
+        self.assertNotIn('db', self.inventory.snapshot.groups)
+        self.assertNotIn('backup', self.inventory.snapshot.hosts['web2'].vars)
+        self.assertSetEqual(set(), self.inventory.snapshot.variable_index.get_host_names('backup'))
+        self._assert_matches_full_parse()
+
+    def test_hosts_of_new_file_keep_the_order_of_files(self):
+        self._write('00-app.yml', 'app:\n  hosts:\n    app1:\n    db1:\n')
+        self.inventory.update()
+        self.assertEqual(['app1', 'db1'], list(self.inventory.snapshot.hosts)[:2])
+        self.assertEqual(['app1', 'db1'], self.inventory.snapshot.host_membership.host_names_of(
+            self.inventory.snapshot.host_membership.group_bits['app']))
+        self._assert_matches_full_parse()
@@ -1,9 +1,22 @@
 import unittest
 import os
+import shutil
+import stat
+import sys
+import tempfile
 
 from parameterized import parameterized
+from unittest.mock import patch
 
-from ansibleconnect.inventoryadapter import InventoryAdapter
+from ansibleconnect.inventoryadapter import SOURCE_FAILED, \
+    SOURCE_PARSED, \
+    SOURCE_STALE, \
+    InventoryAdapter, \
+    InventorySourceError, \
+    SourceLoadResult, \
+    iter_inventory_sources
+from ansibleconnect.inventorysnapshot import InventorySnapshot, SnapshotGroup, SnapshotHost
+from ansibleconnect.parser import parse_vars
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'files')
 TEST_INVENTORY_FILE = os.path.join(TEST_DATA_DIR, 'inventory.yml')
@@ -65,3 +78,137 @@ class TestInventoryAdapter(unittest.TestCase):
                                                                      variables=var,
                                                                      no_variables=no_var)
         self.assertEqual(expected_len, len(output_hosts))
+
+    def test_variable_with_empty_value_only_has_to_be_defined(self):
+        variables = parse_vars('ansible_host:')
+        self.assertEqual(7, len(self.inventory_adapter.get_hosts_by_variables(
+            hosts=self.all_hosts, variables=variables, no_variables=[])))
+        self.assertEqual(1, len(self.inventory_adapter.get_hosts_by_variables(
+            hosts=self.all_hosts, variables=[], no_variables=variables)))
+
+    @parameterized.expand([
+        ('groupA:groupC', 4),
+        ('groupB:&groupD', 3),
+        ('groupB:!groupD', 4),
+        ('!groupB', 1),
+        ('&groupA', 3),
+        ('group[AC]', 4),
+        ('~group[AC]', 4),
+        ('172.16.0.*', 3),
+        ('groupF[0]', 1),
+        ('groupF[-1]', 1),
+        ('groupF[0:2]', 3),
+        ('groupF[5:]', 2),
+        ('groupA,groupC', 4),
+        ('all:!groupF', 1),
+        ('unknown_group', 0),
+        ('groupA:!unknown_group', 3),
+    ])
+    def test_get_hosts_by_pattern(self, pattern, expected_len):
+        output_hosts = self.inventory_adapter.get_hosts_by_pattern(pattern)
+        self.assertEqual(expected_len, len(output_hosts))
+
+    def test_get_hosts_by_pattern_returns_hosts_in_inventory_order(self):
+        output_hosts = self.inventory_adapter.get_hosts_by_pattern('groupF[0:2]')
+        self.assertListEqual(['10.0.0.5', '172.16.0.30', '192.168.0.2'],
+                             [host.name for host in output_hosts])
+
+    def test_get_hosts_by_group_does_not_raise_for_unknown_group(self):
+        output_hosts = self.inventory_adapter.get_hosts_by_group(['unknown_group'], [])
+        self.assertListEqual([], output_hosts)
+
+
+def create_source_result(source, port):
+    hosts = {name: SnapshotHost(name, {'ansible_port': port}, ['web'])
+             for name in ('web1', source)}
+    return SourceLoadResult(source, SOURCE_PARSED, 0.0, InventorySnapshot(
+        hosts, {'web': SnapshotGroup('web', list(hosts.values()), [])}))
+
+
+class TestAddSourceResult(unittest.TestCase):
+    def setUp(self):
+        self.results = [create_source_result('source{}'.format(index), 22 + index)
+                        for index in range(3)]
+
+    def test_sources_keep_their_precedence_whatever_order_they_load_in(self):
+        inventory_adapter = InventoryAdapter([], source_results=[])
+        for index in (1, 2, 0):
+            inventory_adapter.add_source_result(self.results[index], index)
+        self.assertListEqual(self.results, inventory_adapter.source_results)
+        hosts = inventory_adapter.get_hosts_by_pattern('web')
+        self.assertListEqual(['web1', 'source0', 'source1', 'source2'],
+                             [host.name for host in hosts])
+        self.assertEqual(24, hosts[0].vars['ansible_port'])
+
+    def test_failed_source_is_only_recorded(self):
+        inventory_adapter = InventoryAdapter([], source_results=self.results[:1])
+        failed_result = SourceLoadResult('source1', SOURCE_FAILED, 0.0, None, 'error')
+        inventory_adapter.add_source_result(failed_result, 1)
+        self.assertEqual(failed_result, inventory_adapter.source_results[-1])
+        self.assertEqual(2, inventory_adapter.hosts_count)
+
+
+SLOW_INVENTORY_SCRIPT = """#!{python}
+import json
+import time
+time.sleep({delay})
+print(json.dumps({{"slow": {{"hosts": ["slowhost"]}}, "_meta": {{"hostvars": {{}}}}}}))
+"""
+
+
+class TestLoadInventorySources(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        env_patcher = patch.dict(os.environ,
+                                 {'XDG_CACHE_HOME': os.path.join(self.temp_dir, 'cache')})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        self.script_source = os.path.join(self.temp_dir, 'slow.py')
+
+    def _write_script_source(self, delay: float):
+        with open(self.script_source, 'w') as script_file:
+            script_file.write(SLOW_INVENTORY_SCRIPT.format(python=sys.executable, delay=delay))
+        os.chmod(self.script_source, stat.S_IRWXU)
+
+    def test_hosts_of_all_sources_are_loaded(self):
+        self._write_script_source(0)
+        inventory_adapter = InventoryAdapter([TEST_INVENTORY_FILE, self.script_source])
+        self.assertEqual([SOURCE_PARSED, SOURCE_PARSED],
+                         [result.status for result in inventory_adapter.source_results])
+        self.assertEqual(['slowhost'],
+                         [host.name for host in inventory_adapter.get_hosts_by_pattern('slow')])
+        self.assertEqual(9, len(inventory_adapter.get_hosts_by_pattern('all')))
+
+    @patch('ansibleconnect.inventoryadapter.refresh_in_background')
+    def test_stale_cached_snapshot_is_used_when_source_times_out(self, refresh_mock):
+        self._write_script_source(0)
+        InventoryAdapter(self.script_source, use_cache=True)
+        self._write_script_source(10)
+        inventory_adapter = InventoryAdapter([TEST_INVENTORY_FILE, self.script_source],
+                                             use_cache=True, refresh_cache=True,
+                                             source_timeout=2)
+        self.assertEqual([SOURCE_PARSED, SOURCE_STALE],
+                         [result.status for result in inventory_adapter.source_results])
+        self.assertEqual(1, len(inventory_adapter.get_hosts_by_pattern('slow')))
+        refresh_mock.assert_called_once_with(self.script_source)
+
+    def test_source_which_times_out_without_cache_is_skipped(self):
+        self._write_script_source(10)
+        inventory_adapter = InventoryAdapter([TEST_INVENTORY_FILE, self.script_source],
+                                             source_timeout=2)
+        self.assertEqual([SOURCE_PARSED, SOURCE_FAILED],
+                         [result.status for result in inventory_adapter.source_results])
+        self.assertEqual(8, len(inventory_adapter.get_hosts_by_pattern('all')))
+
+    def test_sources_are_yielded_in_the_order_they_finish(self):
+        self._write_script_source(3)
+        indexed_results = list(iter_inventory_sources([self.script_source, TEST_INVENTORY_FILE]))
+        self.assertEqual([1, 0], [index for index, _ in indexed_results])
+        self.assertEqual([SOURCE_PARSED, SOURCE_PARSED],
+                         [result.status for _, result in indexed_results])
+
+    def test_error_is_raised_when_no_source_can_be_loaded(self):
+        self._write_script_source(10)
+        with self.assertRaises(InventorySourceError):
+            InventoryAdapter([self.script_source], source_timeout=1)
@@ -0,0 +1,129 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from unittest.mock import patch
+
+from ansibleconnect.inventorycache import DYNAMIC_SOURCE_CACHE_TTL, \
+    get_cache_dir, \
+    get_inventory_fingerprint, \
+    get_inventory_source_files, \
+    is_dynamic_inventory_source, \
+    load_cached_snapshot, \
+    save_snapshot
+from ansibleconnect.inventoryadapter import InventoryAdapter, parse_inventory
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'files')
+TEST_INVENTORY_FILE = os.path.join(TEST_DATA_DIR, 'inventory.yml')
+
+
+class TestInventoryCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.inventory_file = os.path.join(self.temp_dir, 'inventory.yml')
+        shutil.copy(TEST_INVENTORY_FILE, self.inventory_file)
+        env_patcher = patch.dict(os.environ,
+                                 {'XDG_CACHE_HOME': os.path.join(self.temp_dir, 'cache')})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def _touch_inventory(self):
+        with open(self.inventory_file, 'a') as inventory_file:
+            inventory_file.write('\n')
+
+    def test_source_files_include_host_vars_next_to_the_inventory_file(self):
+        os.mkdir(os.path.join(self.temp_dir, 'host_vars'))
+        host_vars_file = os.path.join(self.temp_dir, 'host_vars', '10.0.0.4.yml')
+        with open(host_vars_file, 'w') as vars_file:
+            vars_file.write('ansible_user: test\n')
+        source_files = get_inventory_source_files(self.inventory_file)
+        self.assertListEqual([self.inventory_file, host_vars_file], source_files)
+
+    def test_fingerprint_changes_when_inventory_file_changes(self):
+        fingerprint = get_inventory_fingerprint(self.inventory_file)
+        self._touch_inventory()
+        self.assertNotEqual(fingerprint, get_inventory_fingerprint(self.inventory_file))
+
+    def test_saved_snapshot_is_loaded_for_the_same_fingerprint(self):
+        fingerprint = get_inventory_fingerprint(self.inventory_file)
+        snapshot = InventoryAdapter(self.inventory_file)._inventory
+        save_snapshot(self.inventory_file, fingerprint, snapshot)
+        cached_snapshot = load_cached_snapshot(self.inventory_file, fingerprint)
+        self.assertDictEqual(snapshot.to_dict(), cached_snapshot.to_dict())
+
+    def test_snapshot_is_not_loaded_for_changed_fingerprint(self):
+        fingerprint = get_inventory_fingerprint(self.inventory_file)
+        save_snapshot(self.inventory_file, fingerprint,
+                      InventoryAdapter(self.inventory_file)._inventory)
+        self._touch_inventory()
+        self.assertIsNone(load_cached_snapshot(self.inventory_file,
+                                               get_inventory_fingerprint(self.inventory_file)))
+
+    def test_failed_cache_write_leaves_no_temporary_file(self):
+        snapshot = InventoryAdapter(self.inventory_file)._inventory
+        with patch('ansibleconnect.inventorycache.os.replace',
+                   side_effect=OSError(28, 'No space left on device')):
+            save_snapshot(self.inventory_file, 'fingerprint', snapshot)
+        self.assertListEqual([], os.listdir(get_cache_dir()))
+
+    @patch('ansibleconnect.inventoryadapter.parse_inventory', wraps=parse_inventory)
+    def test_inventory_is_not_parsed_when_cached(self, parse_inventory_mock):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        parse_inventory_mock.assert_called_once()
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        parse_inventory_mock.assert_called_once()
+
+    @patch('ansibleconnect.inventoryadapter.parse_inventory', wraps=parse_inventory)
+    def test_inventory_is_parsed_when_cache_is_refreshed(self, parse_inventory_mock):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        InventoryAdapter(self.inventory_file, use_cache=True, refresh_cache=True)
+        self.assertEqual(2, parse_inventory_mock.call_count)
+
+    def test_ansible_is_not_imported_when_inventory_is_cached(self):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        check_script = ("import sys; "
+                        "from ansibleconnect.inventoryadapter import InventoryAdapter; "
+                        "InventoryAdapter(sys.argv[1], use_cache=True); "
+                        "print('ansible' in sys.modules)")
+        output = subprocess.check_output([sys.executable, '-c', check_script,
+                                          self.inventory_file])
+        self.assertEqual(b'False', output.strip())
+
+    def test_process_modules_are_not_imported_when_inventory_is_cached(self):
+        InventoryAdapter(self.inventory_file, use_cache=True)
+        check_script = ("import sys; "
+                        "from ansibleconnect.main import InventoryAdapter; "
+                        "InventoryAdapter(sys.argv[1], use_cache=True); "
+                        "print('multiprocessing' in sys.modules or 'subprocess' in sys.modules)")
+        output = subprocess.check_output([sys.executable, '-c', check_script,
+                                          self.inventory_file])
+        self.assertEqual(b'False', output.strip())
+
+    def test_inventory_scripts_and_plugin_configs_are_dynamic(self):
+        script_file = os.path.join(self.temp_dir, 'hosts.sh')
+        with open(script_file, 'w') as inventory_script:
+            inventory_script.write('#!/bin/sh\necho \'{}\'\n')
+        os.chmod(script_file, 0o755)
+        plugin_file = os.path.join(self.temp_dir, 'hosts.aws_ec2.yml')
+        with open(plugin_file, 'w') as plugin_config:
+            plugin_config.write('---\nplugin: amazon.aws.aws_ec2\n')
+        self.assertTrue(is_dynamic_inventory_source(script_file))
+        self.assertTrue(is_dynamic_inventory_source(plugin_file))
+        self.assertTrue(is_dynamic_inventory_source(self.temp_dir))
+        self.assertFalse(is_dynamic_inventory_source(self.inventory_file))
+
+    def test_fingerprint_of_dynamic_source_expires(self):
+        script_file = os.path.join(self.temp_dir, 'hosts.sh')
+        with open(script_file, 'w') as inventory_script:
+            inventory_script.write('#!/bin/sh\necho \'{}\'\n')
+        os.chmod(script_file, 0o755)
+        with patch('time.time', return_value=DYNAMIC_SOURCE_CACHE_TTL * 10.0):
+            fingerprint = get_inventory_fingerprint(script_file)
+            static_fingerprint = get_inventory_fingerprint(self.inventory_file)
+        with patch('time.time', return_value=DYNAMIC_SOURCE_CACHE_TTL * 11.0):
+            self.assertNotEqual(fingerprint, get_inventory_fingerprint(script_file))
+            self.assertEqual(static_fingerprint, get_inventory_fingerprint(self.inventory_file))
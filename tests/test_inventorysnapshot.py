@@ -0,0 +1,86 @@
+import json
+import unittest
+
+from unittest.mock import patch
+
+from ansibleconnect.inventorysnapshot import InventorySnapshot, SnapshotHost
+
+TEST_SNAPSHOT = {
+    'hosts': {
+        'web1.example.com': {'vars': {'ansible_host': '10.0.0.1'}, 'groups': ['web', 'all']},
+        '10.0.0.2': {'vars': {}, 'groups': ['db', 'all']},
+    },
+    'groups': {
+        'all': {'hosts': [], 'children': ['web', 'db']},
+        'web': {'hosts': ['web1.example.com'], 'children': []},
+        'db': {'hosts': ['10.0.0.2'], 'children': []},
+    },
+}
+
+
+class TestSnapshotHost(unittest.TestCase):
+    def test_get_vars_contains_magic_vars(self):
+        host = SnapshotHost('web1.example.com', {'a': 1}, ['web', 'all'])
+        expected_vars = {'a': 1,
+                         'inventory_hostname': 'web1.example.com',
+                         'inventory_hostname_short': 'web1',
+                         'group_names': ['web']}
+        self.assertDictEqual(expected_vars, host.get_vars())
+
+    def test_short_hostname_of_ip_address_is_the_whole_address(self):
+        host = SnapshotHost('10.0.0.2', {}, [])
+        self.assertEqual('10.0.0.2', host.get_vars()['inventory_hostname_short'])
+
+
+class TestInventorySnapshot(unittest.TestCase):
+    def test_group_hosts_are_host_objects_of_the_snapshot(self):
+        snapshot = InventorySnapshot.from_dict(TEST_SNAPSHOT)
+        self.assertIs(snapshot.hosts['10.0.0.2'], snapshot.groups['db'].hosts[0])
+
+    def test_dict_round_trip(self):
+        snapshot_dict = InventorySnapshot.from_dict(TEST_SNAPSHOT).to_dict()
+        self.assertDictEqual(TEST_SNAPSHOT['hosts'], snapshot_dict['hosts'])
+        self.assertDictEqual(TEST_SNAPSHOT['groups'], snapshot_dict['groups'])
+        self.assertDictEqual(snapshot_dict, InventorySnapshot.from_dict(snapshot_dict).to_dict())
+
+    def test_variable_index_is_restored_from_dict(self):
+        snapshot_dict = InventorySnapshot.from_dict(TEST_SNAPSHOT).to_dict()
+        with patch('ansibleconnect.inventorysnapshot.VariableIndex.from_hosts') as from_hosts:
+            snapshot = InventorySnapshot.from_dict(snapshot_dict)
+            host_names = snapshot.variable_index.get_host_names('ansible_host', '10.0.0.1')
+        from_hosts.assert_not_called()
+        self.assertSetEqual({'web1.example.com'}, host_names)
+
+    def test_equal_strings_of_hosts_are_shared(self):
+        snapshot = InventorySnapshot.from_dict(json.loads(json.dumps(TEST_SNAPSHOT)))
+        web_host, db_host = snapshot.hosts.values()
+        self.assertIs(web_host.groups[-1], db_host.groups[-1])
+        self.assertFalse(hasattr(web_host, '__dict__'))
+
+    def test_merged_snapshots_combine_hosts_and_groups(self):
+        other_snapshot = InventorySnapshot.from_dict({
+            'hosts': {
+                '10.0.0.2': {'vars': {'ansible_user': 'admin'}, 'groups': ['cache', 'all']},
+                '10.0.0.3': {'vars': {}, 'groups': ['cache', 'all']},
+            },
+            'groups': {
+                'all': {'hosts': [], 'children': ['cache']},
+                'cache': {'hosts': ['10.0.0.2', '10.0.0.3'], 'children': []},
+            },
+        })
+        snapshot = InventorySnapshot.merge([InventorySnapshot.from_dict(TEST_SNAPSHOT),
+                                            other_snapshot])
+        self.assertListEqual(['web1.example.com', '10.0.0.2', '10.0.0.3'], list(snapshot.hosts))
+        self.assertTupleEqual(('db', 'all', 'cache'), snapshot.hosts['10.0.0.2'].groups)
+        self.assertDictEqual({'ansible_user': 'admin'}, snapshot.hosts['10.0.0.2'].vars)
+        self.assertListEqual(['web', 'db', 'cache'], snapshot.groups['all'].child_groups)
+        self.assertIs(snapshot.hosts['10.0.0.2'], snapshot.groups['cache'].hosts[0])
+
+    def test_merged_host_keeps_inventory_file_of_its_first_source(self):
+        snapshots = [InventorySnapshot({name: SnapshotHost(name, {'inventory_file': filename,
+                                                                  'port': port}, ['all'])},
+                                       {})
+                     for name, filename, port in (('web1', 'first.yml', 22),
+                                                  ('web1', 'second.yml', 2222))]
+        self.assertDictEqual({'inventory_file': 'first.yml', 'port': 2222},
+                             InventorySnapshot.merge(snapshots).hosts['web1'].vars)
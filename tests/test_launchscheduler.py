@@ -0,0 +1,45 @@
+import os
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.launchscheduler import schedule_host_launches, schedule_launches
+from ansibleconnect.tmuxpresenter import send_keys_command
+
+
+class TestScheduleLaunches(unittest.TestCase):
+    def test_connections_start_at_once_without_limits(self):
+        self.assertListEqual([0.0] * 4, schedule_launches([None] * 4))
+
+    def test_connections_start_at_rate_after_burst(self):
+        self.assertListEqual([0.0, 0.0, 0.5, 1.0, 1.5],
+                             schedule_launches([None] * 5, rate=2, burst=2))
+
+    def test_connections_of_group_wait_for_limit(self):
+        self.assertListEqual([0.0, 0.0, 2.0, 2.0, 4.0],
+                             schedule_launches(['a'] * 5, group_limit=2, connect_time=2))
+
+    def test_connections_of_other_groups_start_while_group_waits(self):
+        delays = schedule_launches(['a', 'a', 'b', None], rate=10, burst=1, group_limit=1)
+        self.assertListEqual([0.0, 1.0, 0.1, 0.2], [round(delay, 2) for delay in delays])
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config',
+       Mock(return_value=AnsibleConfig({})))
+@patch.dict(os.environ, {'SSH_AUTH_SOCK': ''})
+class TestScheduleHostLaunches(unittest.TestCase):
+    def test_hosts_behind_same_bastion_are_limited(self):
+        hosts = [AnsibleHostAdapter(SnapshotHost(name, variables, [])) for name, variables in (
+            ('host1', {'ansible_ssh_common_args': '-J jump'}),
+            ('host2', {'ansible_ssh_common_args': '-J jump'}),
+            ('host3', {}))]
+        self.assertListEqual([0.0, 1.0, 0.0], schedule_host_launches(hosts, group_limit=1))
+
+    def test_pane_waits_for_its_launch_delay(self):
+        host = AnsibleHostAdapter(SnapshotHost('host1', {}, []))
+        schedule_host_launches([AnsibleHostAdapter(SnapshotHost('host0', {}, [])), host],
+                               rate=4)
+        self.assertIn("'sleep 0.25; ssh", send_keys_command(host))
@@ -0,0 +1,61 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from ansibleconnect.prewarm import PrewarmResult, control_persist_for_launches, \
+    prewarm_hosts, \
+    report_prewarm_results
+from tests.helpers import create_host, write_fake_ssh
+
+
+class TestPrewarmHosts(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.ssh_path, self.log_path = write_fake_ssh(self.temp_dir.name)
+        self.control_path = os.path.join(self.temp_dir.name, 'cp', '%%C')
+
+    def create_host(self, host_name: str) -> Mock:
+        return create_host(host_name, {'ansible_ssh_executable': self.ssh_path,
+                                       'control_path': self.control_path})
+
+    def test_master_connections_are_started_for_all_hosts(self):
+        hosts = [self.create_host('host{}'.format(i)) for i in range(5)]
+        results = prewarm_hosts(hosts, concurrency=2, timeout=5)
+        self.assertEqual(['host{}'.format(i) for i in range(5)],
+                         [result.name for result in results])
+        self.assertTrue(all(result.succeeded for result in results))
+        with open(self.log_path) as log_file:
+            ssh_calls = log_file.read().splitlines()
+        self.assertEqual(5, len(ssh_calls))
+        self.assertTrue(all('-f -N' in ssh_call for ssh_call in ssh_calls))
+
+    def test_control_path_directory_is_created(self):
+        prewarm_hosts([self.create_host('host')], concurrency=1, timeout=5)
+        self.assertTrue(os.path.isdir(os.path.join(self.temp_dir.name, 'cp')))
+
+    def test_failed_master_connections_are_reported(self):
+        results = prewarm_hosts([self.create_host('unreachable')], concurrency=1, timeout=5)
+        self.assertFalse(results[0].succeeded)
+        self.assertEqual('ssh exited with status 255', results[0].error)
+
+
+class TestControlPersistForLaunches(unittest.TestCase):
+    def test_master_connections_outlive_the_longest_launch_delay(self):
+        hosts = [Mock(launch_delay=delay) for delay in (0.0, 12.5, 3.0)]
+        self.assertEqual(73, control_persist_for_launches(hosts))
+
+    def test_control_persist_is_not_changed_without_launch_delays(self):
+        self.assertIsNone(control_persist_for_launches([Mock(launch_delay=0.0)]))
+
+
+class TestReportPrewarmResults(unittest.TestCase):
+    def test_summary_and_failed_hosts_are_reported(self):
+        output = io.StringIO()
+        report_prewarm_results([PrewarmResult('host0', True, 0.1),
+                                PrewarmResult('host1', False, 2.0, 'timed out')], 2.5, output)
+        self.assertIn('host1 failed (2000 ms): timed out', output.getvalue())
+        self.assertNotIn('host0', output.getvalue())
+        self.assertIn('1 of 2 master connections established in 2500 ms', output.getvalue())
@@ -0,0 +1,58 @@
+import io
+import socket
+import unittest
+
+from ansibleconnect.reachability import REACHABLE, SKIPPED, UNREACHABLE, \
+    ProbeResult, \
+    probe_hosts, \
+    report_probe_results
+from tests.helpers import create_host
+
+
+class TestProbeHosts(unittest.TestCase):
+    def setUp(self):
+        self.listening_socket = socket.socket()
+        self.listening_socket.bind(('127.0.0.1', 0))
+        self.listening_socket.listen()
+        self.open_port = self.listening_socket.getsockname()[1]
+        # Port of a closed socket refuses connections
+        closed_socket = socket.socket()
+        closed_socket.bind(('127.0.0.1', 0))
+        self.closed_port = closed_socket.getsockname()[1]
+        closed_socket.close()
+
+    def tearDown(self):
+        self.listening_socket.close()
+
+    def test_hosts_are_probed_on_their_address_and_port(self):
+        hosts = [
+            create_host('up', {'ansible_host': '127.0.0.1', 'ansible_port': self.open_port}),
+            create_host('down', {'ansible_host': '127.0.0.1', 'ansible_port': self.closed_port}),
+        ]
+        results = probe_hosts(hosts, concurrency=1, timeout=1.0)
+        self.assertEqual([REACHABLE, UNREACHABLE], [result.status for result in results])
+        self.assertEqual(hosts, [result.host for result in results])
+        self.assertEqual([False, True], [result.is_down for result in results])
+
+    def test_hosts_behind_proxy_are_skipped(self):
+        hosts = [create_host('proxied', {
+            'ansible_host': '127.0.0.1', 'ansible_port': self.closed_port,
+            'ansible_ssh_common_args': '-o ProxyCommand="ssh -W %h:%p bastion"'})]
+        results = probe_hosts(hosts, concurrency=10, timeout=1.0)
+        self.assertEqual(SKIPPED, results[0].status)
+        self.assertFalse(results[0].is_down)
+
+    def test_no_hosts_are_probed_for_empty_list(self):
+        self.assertEqual([], probe_hosts([], concurrency=10, timeout=1.0))
+
+
+class TestReportProbeResults(unittest.TestCase):
+    def test_summary_and_failed_hosts_are_reported(self):
+        hosts = [create_host('host{}'.format(i), {}) for i in range(2)]
+        output = io.StringIO()
+        results = [ProbeResult(hosts[0], REACHABLE, 0.01),
+                   ProbeResult(hosts[1], UNREACHABLE, 1.0, 'timed out')]
+        report_probe_results(results, 1.5, output)
+        self.assertIn('host1 unreachable (1000 ms): timed out', output.getvalue())
+        self.assertNotIn('host0', output.getvalue())
+        self.assertIn('1 reachable, 1 unreachable, 0 skipped in 1500 ms', output.getvalue())
@@ -0,0 +1,109 @@
+import io
+import unittest
+
+from parameterized import parameterized
+
+from ansibleconnect.sshproxy import PROXY_COMMAND, PROXY_JUMP, \
+    Bastion, \
+    find_proxy_option, \
+    parse_bastion, \
+    plan_bastion_connections, \
+    replace_proxy_option, \
+    report_bastion_plan
+from tests.helpers import create_host
+
+PROXY_COMMAND_OPTIONS = ('-o UserKnownHostsFile=/dev/null -o ProxyCommand="ssh -o '
+                         'StrictHostKeyChecking=no -W %h:%p -q root@1.2.3.4" -p 22')
+
+
+class TestFindProxyOption(unittest.TestCase):
+    def test_proxy_command_is_found_with_its_position(self):
+        proxy_option = find_proxy_option(PROXY_COMMAND_OPTIONS)
+        self.assertEqual(PROXY_COMMAND, proxy_option.kind)
+        self.assertEqual('ssh -o StrictHostKeyChecking=no -W %h:%p -q root@1.2.3.4',
+                         proxy_option.value)
+        self.assertEqual(PROXY_COMMAND_OPTIONS[PROXY_COMMAND_OPTIONS.index('-o Proxy'):
+                                               PROXY_COMMAND_OPTIONS.index(' -p 22')],
+                         PROXY_COMMAND_OPTIONS[proxy_option.start:proxy_option.end])
+
+    @parameterized.expand([
+        ('-J admin@jump:2222', 'admin@jump:2222'),
+        ('-Jjump', 'jump'),
+        ('-o ProxyJump=jump', 'jump'),
+        ("-o 'ProxyJump jump'", 'jump'),
+    ])
+    def test_proxy_jump_is_found(self, ssh_options, expected_value):
+        proxy_option = find_proxy_option(ssh_options)
+        self.assertEqual(PROXY_JUMP, proxy_option.kind)
+        self.assertEqual(expected_value, proxy_option.value)
+
+    def test_none_without_proxy_option(self):
+        self.assertIsNone(find_proxy_option('-C -o ControlMaster=auto -p 22'))
+
+
+class TestParseBastion(unittest.TestCase):
+    def test_bastion_of_ssh_proxy_command(self):
+        bastion = parse_bastion(find_proxy_option(PROXY_COMMAND_OPTIONS))
+        self.assertEqual(Bastion('1.2.3.4', 'root', None, 'ssh',
+                                 ('-o', 'StrictHostKeyChecking=no', '-q')), bastion)
+
+    def test_user_and_port_options_of_proxy_command(self):
+        bastion = parse_bastion(find_proxy_option(
+            '-o ProxyCommand="ssh -l admin -p 2222 -W %h:%p jump"'))
+        self.assertEqual(Bastion('jump', 'admin', '2222'), bastion)
+
+    def test_bastion_of_jump_host(self):
+        self.assertEqual(Bastion('jump', 'admin', '2222'),
+                         parse_bastion(find_proxy_option('-J admin@jump:2222')))
+
+    @parameterized.expand([
+        ('-o ProxyCommand="nc -X connect %h %p"',),
+        ('-o ProxyCommand="ssh -W %h:%p jump nc"',),
+        ('-o ProxyCommand="ssh jump nc %h %p"',),
+        ('-J first,second',),
+    ])
+    def test_none_for_proxies_which_cannot_be_shared(self, ssh_options):
+        self.assertIsNone(parse_bastion(find_proxy_option(ssh_options)))
+
+    def test_multiplexing_options_of_proxy_command_are_replaced(self):
+        bastion = parse_bastion(find_proxy_option(
+            '-o ProxyCommand="ssh -o ControlPath=/tmp/cp -W %h:%p jump"'))
+        proxy_command = bastion.proxy_command('~/.ssh/shared-%%C')
+        self.assertNotIn('/tmp/cp', proxy_command)
+        self.assertIn('-o ControlPath=~/.ssh/shared-%%C -W %h:%p jump', proxy_command)
+
+    def test_master_connection_command_uses_unescaped_control_path(self):
+        bastion = Bastion('jump')
+        master_command = bastion.master_connection_command('~/.ssh/shared-%%C', 5)
+        self.assertIn('-o ControlPath=~/.ssh/shared-%C', master_command)
+        self.assertTrue(master_command.endswith('-f -N jump'))
+
+
+class TestReplaceProxyOption(unittest.TestCase):
+    def test_only_proxy_option_is_replaced(self):
+        self.assertEqual('-o UserKnownHostsFile=/dev/null -o ProxyCommand="new" -p 22',
+                         replace_proxy_option(PROXY_COMMAND_OPTIONS,
+                                              find_proxy_option(PROXY_COMMAND_OPTIONS), 'new'))
+
+
+class TestPlanBastionConnections(unittest.TestCase):
+    def setUp(self):
+        ssh_args = {
+            'host1': {'ansible_ssh_common_args': '-J jump1'},
+            'host2': {'ansible_ssh_common_args': '-J jump1'},
+            'host3': {'ansible_ssh_common_args': '-J jump2'},
+            'host4': {'ansible_ssh_common_args': '-o ProxyCommand="nc %h %p"'},
+            'host5': {},
+        }
+        self.hosts = [create_host(name, variables) for name, variables in ssh_args.items()]
+
+    def test_hosts_are_grouped_by_bastion(self):
+        plan = plan_bastion_connections(self.hosts)
+        self.assertEqual({Bastion('jump1'): ['host1', 'host2'], Bastion('jump2'): ['host3']},
+                         dict(plan.bastion_hosts))
+        self.assertEqual(['host4'], plan.unshared_hosts)
+
+    def test_connections_before_and_after_are_reported(self):
+        output = io.StringIO()
+        report_bastion_plan(plan_bastion_connections(self.hosts), output)
+        self.assertIn('4 connections to jump hosts before, 3 after', output.getvalue())
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.inventoryadapter import SOURCE_FAILED, SOURCE_PARSED, SourceLoadResult, \
+    parse_inventory
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.parser import parse_arguments
+from ansibleconnect.streaming import StreamingLayout, iter_selected_hosts
+
+TEST_INVENTORY_FILE = os.path.join(os.path.dirname(__file__), 'files', 'inventory.yml')
+EXTRA_INVENTORY = """groupA:
+  hosts:
+    extra1:
+    10.0.0.5:
+groupZ:
+  hosts:
+    extra2:
+"""
+
+
+class TestIterSelectedHosts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        temp_dir = tempfile.mkdtemp()
+        cls.extra_inventory_file = os.path.join(temp_dir, 'extra.yml')
+        with open(cls.extra_inventory_file, 'w') as inventory_file:
+            inventory_file.write(EXTRA_INVENTORY)
+        cls.results = [
+            SourceLoadResult(TEST_INVENTORY_FILE, SOURCE_PARSED, 0.0,
+                             parse_inventory(TEST_INVENTORY_FILE)),
+            SourceLoadResult(cls.extra_inventory_file, SOURCE_PARSED, 0.0,
+                             parse_inventory(cls.extra_inventory_file)),
+        ]
+        shutil.rmtree(temp_dir)
+
+    def _select(self, argv, indexed_results):
+        args = parse_arguments(['-i', TEST_INVENTORY_FILE, '-i', self.extra_inventory_file]
+                               + argv)
+        return [(result.source, [host.name for host in hosts])
+                for result, hosts in iter_selected_hosts(args, indexed_results)]
+
+    def test_only_newly_selected_hosts_are_yielded(self):
+        self.assertListEqual(
+            [(self.extra_inventory_file, ['extra1', '10.0.0.5']),
+             (TEST_INVENTORY_FILE, ['172.16.0.30', '192.168.0.2'])],
+            self._select(['-g', 'groupA'], [(1, self.results[1]), (0, self.results[0])]))
+
+    def test_variables_filter_is_applied(self):
+        self.assertListEqual(
+            [(TEST_INVENTORY_FILE, ['10.0.0.5', '172.16.0.30']),
+             (self.extra_inventory_file, [])],
+            self._select(['-g', 'groupA', '-vars', 'hostvar:test'],
+                         [(0, self.results[0]), (1, self.results[1])]))
+
+    def test_failed_source_yields_no_hosts(self):
+        failed_result = SourceLoadResult(self.extra_inventory_file, SOURCE_FAILED, 0.0,
+                                         error='timed out')
+        self.assertListEqual(
+            [(self.extra_inventory_file, []),
+             (TEST_INVENTORY_FILE, ['10.0.0.5', '172.16.0.30', '192.168.0.2'])],
+            self._select(['-g', 'groupA'], [(1, failed_result), (0, self.results[0])]))
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config',
+       Mock(return_value=AnsibleConfig({})))
+class TestStreamingLayout(unittest.TestCase):
+    @staticmethod
+    def _hosts(count):
+        return [AnsibleHostAdapter(SnapshotHost('host{}'.format(index), {}, []))
+                for index in range(count)]
+
+    def test_first_host_gets_the_pane_of_the_session(self):
+        commands = StreamingLayout().commands(self._hosts(2))
+        self.assertTrue(commands[0].startswith('set-option -p @ansibleconnect_host host0'))
+        self.assertTrue(commands[1].startswith('send-keys'))
+        self.assertListEqual(['select-layout tiled', 'split-window'], commands[2:4])
+        self.assertEqual('select-layout tiled', commands[-1])
+
+    def test_later_batches_split_the_window(self):
+        layout = StreamingLayout()
+        layout.commands(self._hosts(1))
+        commands = layout.commands(self._hosts(1))
+        self.assertListEqual(['select-layout tiled', 'split-window'], commands[:2])
+
+    def test_new_window_is_created_when_window_is_full(self):
+        layout = StreamingLayout(max_panes_per_window=2)
+        commands = layout.commands(self._hosts(2)) + layout.commands(self._hosts(1))
+        self.assertEqual('rename-window ansibleconnect-1', commands[0])
+        self.assertIn('new-window -n ansibleconnect-2', commands)
+        self.assertEqual(1, commands.count('split-window'))
+
+    def test_empty_batch_has_no_commands(self):
+        self.assertListEqual([], StreamingLayout().commands([]))
+
+
+class TestStreamArguments(unittest.TestCase):
+    def test_stream_cannot_be_used_with_windows(self):
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            parse_arguments(['-i', TEST_INVENTORY_FILE, '--stream', '--windows'])
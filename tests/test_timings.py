@@ -0,0 +1,62 @@
+import io
+import os
+import pstats
+import sys
+import tempfile
+import unittest
+
+from ansibleconnect.timings import StageTimings, write_profile
+
+
+class TestStageTimings(unittest.TestCase):
+    def test_stages_are_recorded_in_order_with_host_counts(self):
+        timings = StageTimings()
+        with timings.stage('first', 10):
+            pass
+        with timings.stage('second') as stage:
+            stage.hosts_count = 3
+        self.assertListEqual(['first', 'second'], [record.name for record in timings.records])
+        self.assertListEqual([10, 3], [record.hosts_count for record in timings.records])
+
+    def test_stage_is_recorded_when_run_stops(self):
+        timings = StageTimings()
+        with self.assertRaises(SystemExit):
+            with timings.stage('selection'):
+                exit(1)
+        self.assertEqual('selection', timings.records[0].name)
+
+    def test_imports_are_measured_only_when_enabled(self):
+        sys.modules.pop('json.tool', None)
+        timings = StageTimings()
+        with timings.stage('load'):
+            import json.tool  # noqa: F401
+        self.assertIsNone(timings.records[0].imports_time)
+        sys.modules.pop('json.tool', None)
+        timings = StageTimings(measure_imports=True)
+        with timings.stage('load'):
+            import json.tool  # noqa: F401, F811
+        self.assertGreater(timings.records[0].imports_time, 0)
+
+    def test_report_contains_stages_and_total(self):
+        timings = StageTimings()
+        with timings.stage('host_selection', 42):
+            pass
+        report = io.StringIO()
+        timings.report(report)
+        lines = report.getvalue().splitlines()
+        self.assertIn('host_selection', lines[0])
+        self.assertIn('42 hosts', lines[0])
+        self.assertIn('total', lines[1])
+
+
+class TestWriteProfile(unittest.TestCase):
+    def test_profile_is_written_when_run_stops(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.prof')
+            with self.assertRaises(SystemExit):
+                with write_profile(path):
+                    sorted(range(100))
+                    exit(1)
+            stats = pstats.Stats(path)
+        self.assertTrue(any(function_name == '<built-in method builtins.sorted>'
+                            for _, _, function_name in stats.stats))
@@ -0,0 +1,106 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ansibleconnect.tmuxcontrol import TmuxControlClient, \
+    TmuxControlError, \
+    attach_command, \
+    parse_control_mode_output, \
+    run_in_new_session, \
+    tmux_server_args
+
+CONTROL_MODE_OUTPUT = """%begin 1 10 0
+%end 1 10 0
+%session-changed $1 test
+%begin 1 11 1
+%end 1 11 1
+%begin 1 12 1
+test
+%end 1 12 1
+%output %1 prompt
+%begin 1 13 1
+parse error: unknown command: bogus
+%error 1 13 1
+%exit
+"""
+
+
+class TestParseControlModeOutput(unittest.TestCase):
+
+    def test_blocks_of_client_commands_are_returned_in_order(self):
+        self.assertEqual([([], False), (['test'], False),
+                          (['parse error: unknown command: bogus'], True)],
+                         parse_control_mode_output(CONTROL_MODE_OUTPUT))
+
+    def test_empty_output_has_no_blocks(self):
+        self.assertEqual([], parse_control_mode_output(''))
+
+
+class TestTmuxServerArgs(unittest.TestCase):
+
+    @patch.dict(os.environ, {'TMUX': '/tmp/tmux-1000/default,1234,0'})
+    def test_socket_of_current_server_is_used_inside_tmux(self):
+        self.assertEqual(['-S', '/tmp/tmux-1000/default'], tmux_server_args())
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_default_server_is_used_outside_tmux(self):
+        self.assertEqual([], tmux_server_args())
+
+
+class TestAttachCommand(unittest.TestCase):
+
+    @patch.dict(os.environ, {'TMUX': '/tmp/tmux-1000/default,1234,0'})
+    def test_client_is_switched_inside_tmux(self):
+        self.assertEqual('tmux switch-client -t test', attach_command('test'))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_session_is_attached_outside_tmux(self):
+        self.assertEqual('tmux attach-session -t test', attach_command('test'))
+
+
+@unittest.skipIf(shutil.which('tmux') is None, 'tmux is not installed')
+class TestRunInNewSession(unittest.TestCase):
+
+    def setUp(self):
+        self.socket_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.socket_dir.name, 'socket')
+        subprocess.run(['tmux', '-S', self.socket_path, 'new-session', '-d', '-s', 'other'],
+                       check=True)
+        self.tmux_env = patch.dict(os.environ, {'TMUX': '{},1,0'.format(self.socket_path)})
+        self.tmux_env.start()
+
+    def tearDown(self):
+        self.tmux_env.stop()
+        subprocess.run(['tmux', '-S', self.socket_path, 'kill-server'])
+        self.socket_dir.cleanup()
+
+    def test_commands_run_in_the_new_session(self):
+        results = run_in_new_session('test', ['split-window', 'display-message -p "#S"',
+                                              'bogus-command'])
+        self.assertEqual(['split-window', 'display-message -p "#S"', 'bogus-command'],
+                         [result.command for result in results])
+        self.assertEqual([False, False, True], [result.failed for result in results])
+        self.assertEqual(['test'], results[1].output)
+        panes = subprocess.run(['tmux', '-S', self.socket_path, 'list-panes', '-t', 'test'],
+                               stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual(2, len(panes.splitlines()))
+
+    def test_commands_sent_in_batches_are_all_run(self):
+        client = TmuxControlClient('test')
+        client.start()
+        client.send(['split-window'])
+        client.send(['split-window', 'display-message -p "#S"'])
+        results = client.close()
+        self.assertEqual(['split-window', 'split-window', 'display-message -p "#S"'],
+                         [result.command for result in results])
+        self.assertEqual(['test'], results[2].output)
+        panes = subprocess.run(['tmux', '-S', self.socket_path, 'list-panes', '-t', 'test'],
+                               stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual(3, len(panes.splitlines()))
+
+    def test_error_is_raised_when_session_cannot_be_created(self):
+        with self.assertRaises(TmuxControlError):
+            run_in_new_session('other', ['split-window'])
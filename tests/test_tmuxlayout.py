@@ -0,0 +1,71 @@
+import unittest
+
+from parameterized import parameterized
+from unittest.mock import Mock, patch
+
+from ansibleconnect.tmuxlayout import check_terminal_fits_panes, \
+    create_grid_commands, \
+    get_max_panes_count, \
+    get_required_terminal_size, \
+    plan_grid
+
+
+class TestTmuxLayout(unittest.TestCase):
+    @parameterized.expand([
+        (0, []),
+        (1, [1]),
+        (2, [1, 1]),
+        (3, [2, 1]),
+        (5, [2, 2, 1]),
+        (9, [3, 3, 3]),
+        (10, [3, 3, 3, 1]),
+    ])
+    def test_plan_grid(self, panes_count, expected_columns_per_row):
+        self.assertListEqual(expected_columns_per_row, plan_grid(panes_count))
+
+    def test_create_grid_commands_single_pane_has_no_layout_commands(self):
+        self.assertListEqual(['cmd0'], create_grid_commands(['cmd0']))
+
+    def test_create_grid_commands_layout_is_applied_once_at_the_end(self):
+        commands = create_grid_commands(['cmd{}'.format(i) for i in range(10)])
+        self.assertEqual(1, commands.count('select-layout tiled'))
+        self.assertEqual('select-layout tiled', commands[-1])
+
+    def test_create_grid_commands_for_three_panes(self):
+        expected_commands = ['split-window -v -d -p 50',
+                             'cmd0',
+                             'split-window -h -p 50',
+                             'cmd1',
+                             'select-pane -D',
+                             'cmd2',
+                             'select-layout tiled']
+        self.assertListEqual(expected_commands, create_grid_commands(['cmd0', 'cmd1', 'cmd2']))
+
+    def test_create_grid_commands_splits_leave_equal_parts(self):
+        commands = create_grid_commands(['cmd{}'.format(i) for i in range(9)])
+        vertical_splits = [command for command in commands if command.startswith('split-window -v')]
+        self.assertListEqual(['split-window -v -d -p 67', 'split-window -v -d -p 50'],
+                             vertical_splits)
+
+    def test_required_terminal_size(self):
+        self.assertEqual((5, 6), get_required_terminal_size(9))
+
+    def test_max_panes_count_fits_the_terminal(self):
+        max_panes_count = get_max_panes_count(80, 24)
+        required_columns, required_lines = get_required_terminal_size(max_panes_count)
+        self.assertLessEqual(required_columns, 80)
+        self.assertLessEqual(required_lines, 24)
+        required_columns, required_lines = get_required_terminal_size(max_panes_count + 1)
+        self.assertTrue(required_columns > 80 or required_lines > 24)
+
+    @patch('ansibleconnect.tmuxlayout.get_terminal_size', Mock(return_value=(10, 10)))
+    def test_check_terminal_fits_panes_returns_error_for_small_terminal(self):
+        self.assertIn('10x10', check_terminal_fits_panes(100))
+
+    @patch('ansibleconnect.tmuxlayout.get_terminal_size', Mock(return_value=(10, 10)))
+    def test_check_terminal_fits_panes_returns_none_when_panes_fit(self):
+        self.assertIsNone(check_terminal_fits_panes(4))
+
+    @patch('ansibleconnect.tmuxlayout.get_terminal_size', Mock(return_value=None))
+    def test_check_terminal_fits_panes_returns_none_for_unknown_terminal_size(self):
+        self.assertIsNone(check_terminal_fits_panes(10000))
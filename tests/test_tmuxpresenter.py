@@ -1,9 +1,15 @@
 import unittest
 import os
 
-from unittest.mock import patch
+from parameterized import parameterized
+from unittest.mock import Mock, patch
 
-from ansibleconnect.tmuxpresenter import tmux_start_command, ssh_auth_socket_env_var_command
+from ansibleconnect.tmuxpresenter import create_tmux_script, \
+    create_tmux_source_file_script, \
+    host_pane_commands, \
+    shard_hosts, \
+    tmux_start_command, \
+    ssh_auth_socket_env_var_command
 
 
 class TestTmuxPresenter(unittest.TestCase):
@@ -30,3 +36,138 @@ class TestTmuxPresenter(unittest.TestCase):
         expected_auth_sock_command = ''
         result_auth_sock_command = ssh_auth_socket_env_var_command()
         self.assertEqual(expected_auth_sock_command, result_auth_sock_command)
+
+
+class TestCreateTmuxScript(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hosts = [Mock(host_name='host{}'.format(i), connection_command='ssh host{}'.format(i),
+                           launch_delay=0.0)
+                      for i in range(3)]
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_panes_are_tiled_once(self):
+        tmux_script = create_tmux_script(self.hosts, use_windows=False)
+        self.assertEqual(1, tmux_script.count('select-layout tiled'))
+        self.assertEqual(3, tmux_script.count('send-keys'))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_windows_are_created_for_each_host_but_the_first_one(self):
+        tmux_script = create_tmux_script(self.hosts, use_windows=True)
+        self.assertNotIn('new-window -n host0', tmux_script)
+        self.assertIn('new-window -n host2', tmux_script)
+        self.assertNotIn('select-layout', tmux_script)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_windows_are_created_for_each_shard(self):
+        tmux_script = create_tmux_script(self.hosts, use_windows=False, max_panes_per_window=2)
+        self.assertIn('rename-window ansibleconnect-1', tmux_script)
+        self.assertIn('new-window -n ansibleconnect-2', tmux_script)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_down_hosts_are_opened_in_separate_window_after_other_hosts(self):
+        tmux_script = create_tmux_script(self.hosts[:2], use_windows=False,
+                                         down_hosts=self.hosts[2:])
+        self.assertIn('new-window -n down', tmux_script)
+        self.assertGreater(tmux_script.index('ssh host2'), tmux_script.index('new-window -n down'))
+        self.assertLess(tmux_script.index('ssh host1'), tmux_script.index('new-window -n down'))
+
+
+class TestShardHosts(unittest.TestCase):
+    @staticmethod
+    def _hosts(variables_list):
+        hosts = []
+        for index, variables in enumerate(variables_list):
+            host = Mock(host_name='host{}'.format(index))
+            host.get_variable.side_effect = lambda key, default=None, v=variables: v.get(key,
+                                                                                         default)
+            hosts.append(host)
+        return hosts
+
+    def test_hosts_are_in_one_window_without_limits(self):
+        windows = shard_hosts(self._hosts([{}] * 5))
+        self.assertListEqual([('ansibleconnect', 5)],
+                             [(name, len(hosts)) for name, hosts in windows])
+
+    @parameterized.expand([
+        (10, 4, [4, 3, 3]),
+        (8, 4, [4, 4]),
+        (500, 25, [25] * 20),
+        (3, 5, [3]),
+    ])
+    def test_windows_are_balanced(self, hosts_count, max_panes, expected_window_sizes):
+        windows = shard_hosts(self._hosts([{}] * hosts_count), max_panes)
+        self.assertListEqual(expected_window_sizes, [len(hosts) for _, hosts in windows])
+
+    def test_hosts_are_grouped_by_variable_value(self):
+        hosts = self._hosts([{'team': 'ui'}, {'team': 'db'}, {'team': 'ui'}, {}])
+        windows = shard_hosts(hosts, group_by='team')
+        self.assertListEqual([('ui', ['host0', 'host2']), ('db', ['host1']),
+                              ('undefined', ['host3'])],
+                             [(name, [host.host_name for host in window_hosts])
+                              for name, window_hosts in windows])
+
+    def test_groups_are_split_into_windows_named_after_the_group(self):
+        hosts = self._hosts([{'group_names': ['web', 'prod']}] * 3 + [{'group_names': ['db']}])
+        windows = shard_hosts(hosts, max_panes_per_window=2, group_by='group_names')
+        self.assertListEqual(['web-1', 'web-2', 'db'], [name for name, _ in windows])
+
+    def test_window_names_do_not_contain_special_characters(self):
+        windows = shard_hosts(self._hosts([{'zone': "eu west;'1"}]), group_by='zone')
+        self.assertEqual('eu_west__1', windows[0][0])
+
+
+class TestCreateTmuxSourceFileScript(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hosts = [Mock(host_name='host{}'.format(i), connection_command='ssh host{}'.format(i),
+                           launch_delay=0.0)
+                      for i in range(3)]
+
+    def _source_file_content(self, shell_command):
+        source_filepath = shell_command.split()[-1]
+        self.addCleanup(os.remove, source_filepath)
+        with open(source_filepath) as source_file:
+            return source_file.read()
+
+    @patch.dict(os.environ, {'SSH_AUTH_SOCK': '/test/auth_sock'}, clear=True)
+    def test_auth_socket_is_set_once_in_session_environment(self):
+        shell_command = create_tmux_source_file_script(self.hosts, use_windows=False)
+        content = self._source_file_content(shell_command)
+        self.assertTrue(content.startswith('set-environment SSH_AUTH_SOCK /test/auth_sock\n'))
+        self.assertNotIn('export', content)
+        self.assertEqual(3, content.count('send-keys'))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_new_session_is_started_from_the_shell_outside_of_tmux(self):
+        shell_command = create_tmux_source_file_script(self.hosts, use_windows=False)
+        self._source_file_content(shell_command)
+        self.assertRegex(shell_command, r'^tmux new-session -s \S+ \\; source-file \S+$')
+
+    @patch.dict(os.environ, {'TMUX': '1'}, clear=True)
+    def test_new_window_is_created_from_the_file_inside_of_tmux(self):
+        shell_command = create_tmux_source_file_script(self.hosts, use_windows=False)
+        content = self._source_file_content(shell_command)
+        self.assertRegex(shell_command, r'^tmux source-file \S+$')
+        self.assertTrue(content.startswith('new-window -n ansibleconnect-'))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_source_file_removes_itself(self):
+        shell_command = create_tmux_source_file_script(self.hosts, use_windows=False)
+        source_filepath = shell_command.split()[-1]
+        content = self._source_file_content(shell_command)
+        self.assertTrue(content.endswith("run-shell 'rm -f {}'\n".format(source_filepath)))
+
+
+class TestHostPaneCommands(unittest.TestCase):
+    def setUp(self):
+        self.host = Mock(host_name='host0', connection_command='ssh host0', launch_delay=0.0)
+
+    @patch('ansibleconnect.tmuxpresenter.tmux_version', Mock(return_value=(3, 0)))
+    def test_pane_is_tagged_with_its_host(self):
+        self.assertEqual('set-option -p @ansibleconnect_host host0',
+                         host_pane_commands(self.host)[0])
+
+    @patch('ansibleconnect.tmuxpresenter.tmux_version', Mock(return_value=(2, 9)))
+    def test_pane_is_not_tagged_by_tmux_without_pane_options(self):
+        commands = host_pane_commands(self.host)
+        self.assertEqual(1, len(commands))
+        self.assertTrue(commands[0].startswith('send-keys'))
@@ -0,0 +1,112 @@
+import os
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.tmuxupdate import HostPane, TmuxSessionError, find_session_panes, \
+    list_panes, plan_session_update
+
+
+def create_pane(pane_id, host_name=None, dead=False, window_id='@1', window_index=0,
+                session_id='$1', session_created=100):
+    return HostPane(session_id, 'session{}'.format(session_id[1:]), session_created, window_id,
+                    window_index, pane_id, host_name, dead)
+
+
+class TestHostPane(unittest.TestCase):
+    def test_pane_back_in_its_shell_is_dead(self):
+        pane = HostPane.from_line('$1\tansibleconnect\t100\t@2\t1\t%3\t0\tbash\t/bin/bash\thost1')
+        self.assertEqual('host1', pane.host_name)
+        self.assertTrue(pane.dead)
+
+    def test_pane_running_ssh_is_alive_and_untagged_pane_has_no_host(self):
+        pane = HostPane.from_line('$1\tmain\t100\t@2\t1\t%3\t0\tssh\t/bin/bash\t')
+        self.assertIsNone(pane.host_name)
+        self.assertFalse(pane.dead)
+
+
+class TestListPanes(unittest.TestCase):
+    @patch('ansibleconnect.tmuxpresenter.tmux_version', Mock(return_value=(2, 9)))
+    def test_tmux_without_pane_options_is_reported(self):
+        with self.assertRaisesRegex(TmuxSessionError, 'tmux 3.0 or later'):
+            list_panes()
+
+
+class TestFindSessionPanes(unittest.TestCase):
+    def setUp(self):
+        self.panes = [create_pane('%1', session_id='$1', session_created=100),
+                      create_pane('%2', 'host1', session_id='$2', session_created=200),
+                      create_pane('%3', 'host1', session_id='$3', session_created=300),
+                      create_pane('%4', session_id='$4', session_created=400)]
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_latest_session_with_host_panes_is_found(self):
+        self.assertListEqual(['%3'], [pane.pane_id for pane in find_session_panes(self.panes)])
+
+    @patch.dict(os.environ, {'TMUX_PANE': '%2'})
+    def test_current_session_is_preferred(self):
+        self.assertListEqual(['%2'], [pane.pane_id for pane in find_session_panes(self.panes)])
+
+    def test_session_is_found_by_name(self):
+        self.assertListEqual(['%4'], [pane.pane_id for pane in
+                                      find_session_panes(self.panes, 'session4')])
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_no_panes_without_host_panes(self):
+        self.assertListEqual([], find_session_panes(self.panes[:1]))
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config',
+       Mock(return_value=AnsibleConfig({})))
+@patch.dict(os.environ, {'SSH_AUTH_SOCK': ''})
+class TestPlanSessionUpdate(unittest.TestCase):
+    @staticmethod
+    def _hosts(*names):
+        return [AnsibleHostAdapter(SnapshotHost(name, {}, [])) for name in names]
+
+    def test_unchanged_session_has_no_commands(self):
+        update = plan_session_update([create_pane('%1', 'host1'), create_pane('%2', 'host2')],
+                                     self._hosts('host1', 'host2'))
+        self.assertListEqual([], update.commands)
+        self.assertEqual(2, update.unchanged_count)
+
+    def test_only_changed_hosts_get_commands(self):
+        update = plan_session_update(
+            [create_pane('%1', 'host1'), create_pane('%2', 'host2', dead=True),
+             create_pane('%3', 'host3'), create_pane('%4')],
+            self._hosts('host1', 'host2', 'host4'))
+        self.assertListEqual(['host4'], update.added_hosts)
+        self.assertListEqual(['host3'], update.removed_hosts)
+        self.assertListEqual(['host2'], update.respawned_hosts)
+        self.assertEqual(1, update.unchanged_count)
+        self.assertEqual('respawn-pane -k -t %2', update.commands[0])
+        self.assertTrue(update.commands[1].startswith("send-keys -t %2 '"))
+        self.assertIn('split-window -t @1', update.commands)
+        self.assertIn('set-option -p -t @1 @ansibleconnect_host host4', update.commands)
+        self.assertListEqual(['kill-pane -t %3', 'select-layout -t @1 tiled'],
+                             update.commands[-2:])
+        self.assertFalse(any('%1' in command for command in update.commands))
+
+    def test_new_window_is_created_when_window_is_full(self):
+        update = plan_session_update(
+            [create_pane('%1', 'host1', window_id='@1', window_index=0),
+             create_pane('%2', 'host2', window_id='@2', window_index=3)],
+            self._hosts('host1', 'host2', 'host3', 'host4'), max_panes_per_window=2)
+        self.assertIn('split-window -t @2', update.commands)
+        self.assertIn("new-window -d -t '$1:4' -n ansibleconnect", update.commands)
+        self.assertIn("send-keys -t '$1:4' ' ssh -C -o ControlMaster=auto "
+                      "-o ControlPersist=60s   host4' C-m", update.commands)
+
+    def test_windows_are_created_for_new_hosts_with_windows_option(self):
+        update = plan_session_update([create_pane('%1', 'host1')],
+                                     self._hosts('host1', 'host2'), use_windows=True)
+        self.assertEqual("new-window -d -t '$1:1' -n host2", update.commands[0])
+        self.assertNotIn('split-window', ' '.join(update.commands))
+
+    def test_duplicated_panes_of_host_are_removed(self):
+        update = plan_session_update([create_pane('%1', 'host1'), create_pane('%2', 'host1')],
+                                     self._hosts('host1'))
+        self.assertListEqual(['kill-pane -t %2', 'select-layout -t @1 tiled'], update.commands)
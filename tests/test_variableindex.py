@@ -0,0 +1,60 @@
+import unittest
+
+from parameterized import parameterized
+
+from ansibleconnect.inventorysnapshot import SnapshotHost
+from ansibleconnect.variableindex import VariableIndex
+
+TEST_HOSTS = [
+    SnapshotHost('host1', {'type': 'dev', 'deploy': True, 'zones': ['a', 'b']}, ['all']),
+    SnapshotHost('host2', {'type': 'prod', 'deploy': False}, ['all']),
+    SnapshotHost('host3', {'type': 'dev', 'team': None}, ['all']),
+]
+
+
+class TestVariableIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.variable_index = VariableIndex.from_hosts(TEST_HOSTS)
+
+    @parameterized.expand([
+        ('type', 'dev', {'host1', 'host3'}),
+        ('type', None, {'host1', 'host2', 'host3'}),
+        ('deploy', True, {'host1'}),
+        ('team', None, {'host3'}),
+        ('zones', None, {'host1'}),
+        ('zones', ['a', 'b'], set()),
+        ('missing', None, set()),
+        ('inventory_hostname', 'host2', {'host2'}),
+    ])
+    def test_get_host_names(self, key, value, expected_host_names):
+        self.assertSetEqual(expected_host_names, self.variable_index.get_host_names(key, value))
+
+    def test_get_host_names_matching_any_is_a_union(self):
+        host_names = self.variable_index.get_host_names_matching_any([('type', 'prod'),
+                                                                      ('team', None)])
+        self.assertSetEqual({'host2', 'host3'}, host_names)
+
+    def test_dict_round_trip(self):
+        restored_index = VariableIndex.from_dict(self.variable_index.to_dict())
+        self.assertSetEqual({'host1'}, restored_index.get_host_names('deploy', True))
+        self.assertSetEqual({'host1'}, restored_index.get_host_names('zones'))
+
+    def test_removed_host_is_not_found(self):
+        self.variable_index.remove_host('host1', TEST_HOSTS[0].get_vars())
+        self.assertSetEqual({'host3'}, self.variable_index.get_host_names('type', 'dev'))
+        self.assertSetEqual(set(), self.variable_index.get_host_names('zones'))
+        self.assertNotIn('zones', self.variable_index.to_dict()['keys'])
+
+    def test_added_host_is_found(self):
+        self.variable_index.add_host(SnapshotHost('host4', {'type': 'dev'}, ['all']))
+        self.assertSetEqual({'host1', 'host3', 'host4'},
+                            self.variable_index.get_host_names('type', 'dev'))
+
+    def test_value_of_single_host_is_kept_after_other_host_is_removed(self):
+        self.variable_index.add_host(SnapshotHost('host4', {'type': 'prod'}, ['all']))
+        self.assertSetEqual({'host2', 'host4'}, self.variable_index.get_host_names('type', 'prod'))
+        self.variable_index.remove_host('host2', TEST_HOSTS[1].get_vars())
+        self.assertSetEqual({'host4'}, self.variable_index.get_host_names('type', 'prod'))
+        self.variable_index.remove_host('host4', {'type': 'prod'})
+        self.assertSetEqual(set(), self.variable_index.get_host_names('type', 'prod'))
+        self.assertNotIn(['type', 'prod', []], self.variable_index.to_dict()['values'])
@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import Mock, patch
+
+from ansibleconnect.ansible_config_adapter import AnsibleConfig, load_ansible_config
+from ansibleconnect.ansiblehostadapter import AnsibleHostAdapter
+from ansibleconnect.inventoryadapter import SOURCE_PARSED, InventoryAdapter, \
+    SourceLoadResult, parse_inventory
+from ansibleconnect.inventorysnapshot import InventorySnapshot
+from ansibleconnect.parser import parse_vars
+from ansibleconnect.vault import VAULT_VALUE_KEY, \
+    DecryptedVariables, \
+    VaultDecryptor, \
+    VaultError, \
+    default_vault_ids, \
+    is_vault_value, \
+    vault_ciphertext
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(__file__), 'files')
+TEST_VAULT_INVENTORY_FILE = os.path.join(TEST_FILES_DIR, 'vault_inventory.yml')
+TEST_VAULT_PASSWORD_FILE = os.path.join(TEST_FILES_DIR, 'vault_password')
+TEST_GROUP_VARS_INVENTORY_FILE = os.path.join(TEST_FILES_DIR, 'group_vars_inventory',
+                                              'inventory.yml')
+
+
+@patch('ansibleconnect.ansiblehostadapter.load_ansible_config',
+       Mock(return_value=AnsibleConfig({})))
+class TestVault(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.snapshot = parse_inventory(TEST_VAULT_INVENTORY_FILE)
+
+    def test_vault_values_are_kept_encrypted_in_snapshot(self):
+        host_vars = self.snapshot.hosts['host1'].vars
+        self.assertTrue(is_vault_value(host_vars['ansible_password']))
+        cached_snapshot = InventorySnapshot.from_dict(json.loads(json.dumps(
+            self.snapshot.to_dict())))
+        self.assertDictEqual(host_vars, cached_snapshot.hosts['host1'].vars)
+
+    def test_connection_variables_are_decrypted_once_for_all_hosts(self):
+        decryptor = VaultDecryptor(vault_password_files=[TEST_VAULT_PASSWORD_FILE])
+        commands = [AnsibleHostAdapter(host, decryptor=decryptor).connection_command
+                    for host in self.snapshot.hosts.values()]
+        self.assertTrue(all(command.startswith('sshpass -p "hunter2" ') for command in commands))
+        # ansible_become_password is not read by the connection command
+        self.assertDictEqual({self.snapshot.hosts['host1'].vars['ansible_password'][
+            '__ansible_vault']: 'hunter2'}, decryptor._plaintexts)
+
+    def test_checking_variable_does_not_decrypt_it(self):
+        decryptor = Mock()
+        variables = DecryptedVariables(self.snapshot.hosts['host1'].vars, decryptor)
+        self.assertIn('ansible_password', variables)
+        decryptor.decrypt.assert_not_called()
+
+    def test_vault_value_is_not_read_without_decryptor(self):
+        with self.assertRaises(VaultError):
+            AnsibleHostAdapter(self.snapshot.hosts['host1']).connection_command
+
+    def test_missing_secrets_raise_vault_error(self):
+        decryptor = VaultDecryptor(vault_ids=['dev@' + os.path.join(TEST_FILES_DIR, 'missing')])
+        with self.assertRaises(VaultError):
+            decryptor.decrypt(self.snapshot.hosts['host1'].vars['ansible_password'])
+
+    def test_vault_id_password_file_is_used(self):
+        decryptor = VaultDecryptor(vault_ids=['dev@' + TEST_VAULT_PASSWORD_FILE])
+        self.assertEqual('hunter2', decryptor.decrypt(
+            self.snapshot.hosts['host1'].vars['ansible_password']))
+
+    def test_vault_value_of_group_vars_is_decrypted(self):
+        snapshot = parse_inventory(TEST_GROUP_VARS_INVENTORY_FILE)
+        decryptor = VaultDecryptor(vault_password_files=[TEST_VAULT_PASSWORD_FILE])
+        command = AnsibleHostAdapter(snapshot.hosts['web1'], decryptor=decryptor).connection_command
+        self.assertTrue(command.startswith('sshpass -p "hunter2" '))
+        self.assertIn('-J jump', command)
+        self.assertTrue(command.endswith('deploy@10.0.0.1'))
+
+
+class OldVaultValue:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+    def __str__(self):
+        return 'plaintext'
+
+
+class TestVaultCiphertext(unittest.TestCase):
+    def test_ciphertext_of_parsed_value_is_read(self):
+        with open(TEST_VAULT_INVENTORY_FILE) as inventory_file:
+            first_line = next(line for line in inventory_file if '$ANSIBLE_VAULT' in line)
+        ciphertext = parse_inventory(TEST_VAULT_INVENTORY_FILE).hosts['host1'].vars[
+            'ansible_password'][VAULT_VALUE_KEY]
+        self.assertTrue(ciphertext.startswith(first_line.strip() + '\n'))
+
+    @patch.dict(sys.modules, {'ansible.parsing.vault': Mock(spec=[])})
+    def test_ciphertext_attribute_is_read_before_ansible_2_19(self):
+        ciphertext = '$ANSIBLE_VAULT;1.1;AES256\n01'
+        self.assertEqual(ciphertext,
+                         vault_ciphertext(OldVaultValue(_ciphertext=ciphertext.encode())))
+        self.assertEqual('plaintext', vault_ciphertext(OldVaultValue()))
+
+
+class TestInheritedConnectionVariables(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = parse_inventory(TEST_GROUP_VARS_INVENTORY_FILE)
+
+    def test_connection_variables_follow_ansible_precedence(self):
+        hosts = self.snapshot.hosts
+        self.assertEqual(2200, hosts['web1'].get_connection_vars()['ansible_port'])
+        self.assertEqual(2222, hosts['web2'].get_connection_vars()['ansible_port'])
+        self.assertEqual('admin', hosts['db1'].get_connection_vars()['ansible_user'])
+        # Variables of groups other than connection variables are not inherited
+        self.assertNotIn('app_version', hosts['web1'].get_connection_vars())
+
+    def test_hosts_are_selected_by_their_own_variables_only(self):
+        inventory = InventoryAdapter(TEST_GROUP_VARS_INVENTORY_FILE, source_results=[
+            SourceLoadResult(TEST_GROUP_VARS_INVENTORY_FILE, SOURCE_PARSED, 0, self.snapshot)])
+        hosts = inventory.get_hosts_by_pattern('')
+        for variables in ('ansible_user:deploy', 'app_version', 'ansible_port'):
+            self.assertListEqual([], inventory.get_hosts_by_variables(
+                hosts, parse_vars(variables), []))
+        self.assertListEqual(['web1'], [host.name for host in inventory.get_hosts_by_variables(
+            hosts, parse_vars('ansible_host:10.0.0.1'), [])])
+
+    def test_inherited_variables_are_kept_in_cached_snapshot(self):
+        cached_snapshot = InventorySnapshot.from_dict(json.loads(json.dumps(
+            self.snapshot.to_dict())))
+        self.assertDictEqual(dict(self.snapshot.hosts['web2'].get_connection_vars()),
+                             dict(cached_snapshot.hosts['web2'].get_connection_vars()))
+
+
+class TestDefaultVaultIds(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.config_dir.name, 'ansible.cfg')
+        with open(self.config_path, 'w') as config_file:
+            config_file.write('[defaults]\nvault_identity_list = dev@dev_pass, prod@prompt\n'
+                              'vault_password_file = vault_pass\n')
+        load_ansible_config.cache_clear()
+
+    def tearDown(self):
+        load_ansible_config.cache_clear()
+        self.config_dir.cleanup()
+
+    def test_relative_paths_of_ansible_cfg_are_relative_to_its_directory(self):
+        with patch.dict(os.environ, {'ANSIBLE_CONFIG': self.config_path}):
+            self.assertListEqual([
+                'dev@' + os.path.join(self.config_dir.name, 'dev_pass'), 'prod@prompt',
+                os.path.join(self.config_dir.name, 'vault_pass')], default_vault_ids())
+
+    def test_environment_takes_precedence_over_ansible_cfg(self):
+        with patch.dict(os.environ, {'ANSIBLE_CONFIG': self.config_path,
+                                     'ANSIBLE_VAULT_IDENTITY_LIST': 'dev@a,prod@b',
+                                     'ANSIBLE_VAULT_PASSWORD_FILE': 'c'}):
+            self.assertListEqual(['dev@a', 'prod@b', 'c'], default_vault_ids())